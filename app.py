@@ -1,10 +1,37 @@
+import asyncio
 import os
 import random
+import functools
+import hashlib
+import json
 import re # Added for slug generation
-from flask import Flask, render_template_string, request, redirect, url_for
-# Import the Google GenAI SDK for the LLM call
-from google import genai
-from google.genai.errors import APIError
+import secrets
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from flask import Flask, Response, g, jsonify, render_template, request, redirect, stream_template, url_for
+from jinja2 import DictLoader, FileSystemBytecodeCache
+from markupsafe import Markup
+from werkzeug.datastructures import MultiDict
+# The Google GenAI SDK is imported on first use, in get_gemini_client()
+
+from canonical import QueryCanonicalizer
+from compression import CompressionMiddleware, available_encodings, choose_encoding, encoded_etag, strip_encoded_etags
+from event_loop import EventLoopThread
+from facets import (FacetIndex, add_record, facet_options, filter_key, filter_params,
+                    filter_predicates, matches, parse_filters, popcount, toggle_filter)
+from fragment_cache import FragmentCache
+from gemini_cache import GeminiResultCache
+from metrics import REGISTRY, SamplingProfiler, server_timing_header, stage
+from page_cache import PageCache
+from prewarm import Prewarmer, TrendingQueries
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, ResilientCaller, is_api_error
+from ranking import make_scorer, parse_weights
+from result_store import create_result_store
+from search_index import load_search_index
+from suggest import SearchLog, SuggestionTrie
 
 # -------------------------------------------------------------------------
 # Configuration
@@ -13,29 +40,171 @@ from google.genai.errors import APIError
 # IMPORTANT: Set your API Key as an environment variable (best practice)
 # In your terminal, use: export GEMINI_API_KEY="YOUR_API_KEY"
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Use the simulated client from fake_genai.py instead (load tests, local runs); see FakeClient.from_env for its options.
+GEMINI_FAKE = os.getenv("GEMINI_FAKE", "0") == "1"
 
 app = Flask(__name__)
 
-# Initialize the Gemini Client
+# The Gemini client is created on first use (see get_gemini_client), not here: importing the
+# SDK pulls in pydantic, httpx and google-auth, most of the app's import time.
 client = None
-GEMINI_CLIENT_READY = False
-if GEMINI_API_KEY:
-    try:
-        # client = genai.Client() is implicit when no API key is provided, but we set it here for explicit control
-        client = genai.Client()
-        GEMINI_CLIENT_READY = True
-        print("Gemini client initialized successfully.")
-    except Exception as e:
-        print(f"Error initializing Gemini client: {e}")
-else:
+GEMINI_CLIENT_READY = GEMINI_FAKE or bool(GEMINI_API_KEY)
+if not GEMINI_CLIENT_READY:
     print("Warning: GEMINI_API_KEY not found. Search will use static mock data.")
+# Warm each worker process up in the background as it starts: render every page once, prime the
+# result generators and connect to the Gemini API (see warm_up). /readyz answers 503 until that
+# is done, so the platform only routes traffic to warm instances. 0: ready at once, cold.
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+# How long warm-up waits for the Gemini connection before giving up on it (the process is ready anyway).
+WARMUP_GEMINI_TIMEOUT = float(os.getenv("WARMUP_GEMINI_TIMEOUT_SECONDS", "10"))
 
 # Global contact email
 CONTACT_EMAIL = "Mesadieujohnm01@gmail.com"
 
-# Global list to hold mock results temporarily for the /article route
-# In a real app, this would be a database or cache
-MOCK_RESULT_CACHE = {} 
+# Shared store holding generated results for the /article route.
+# 'sqlite' shares entries between every worker process on the host; 'memory' is per process.
+RESULT_STORE_BACKEND = os.getenv("RESULT_STORE_BACKEND", "sqlite")
+RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", os.path.join(tempfile.gettempdir(), "mindwork-results.sqlite3"))
+RESULT_STORE_MAX_ENTRIES = int(os.getenv("RESULT_STORE_MAX_ENTRIES", "50000"))
+RESULT_STORE_TTL = int(os.getenv("RESULT_STORE_TTL", "3600"))  # seconds
+
+RESULT_STORE = create_result_store(
+    RESULT_STORE_BACKEND,
+    path=RESULT_STORE_PATH,
+    max_entries=RESULT_STORE_MAX_ENTRIES,
+    ttl=RESULT_STORE_TTL,
+)
+
+# Seed for the generated general results (0-65535). The seed is encoded in every result slug,
+# so changing it only changes new searches; existing article links keep resolving.
+MOCK_RESULT_SEED = int(os.getenv("MOCK_RESULT_SEED", "2025")) & 0xffff
+# Number of mock general results every query has.
+MOCK_RESULT_TOTAL = 105
+
+# Search results per page (?per_page=), and the largest page a client may ask for.
+SEARCH_PER_PAGE = int(os.getenv("SEARCH_PER_PAGE", "10"))
+SEARCH_MAX_PER_PAGE = 100
+
+# Order of the mock results: 'relevance' ranks them by query overlap, source tier and recency
+# (weights as "title=3,summary=1,tier=2,recency=1"); 'shuffle' keeps the seeded per-query shuffle.
+RESULT_ORDERING = os.getenv("RESULT_ORDERING", "relevance")
+RANKING_WEIGHTS = parse_weights(os.getenv("RANKING_WEIGHTS", ""))
+
+# Search box autocomplete (/api/suggest). With SEARCH_LOG_PATH set, every worker appends searched
+# queries to that file and tails it into its own trie; without it, each worker learns from its own traffic.
+SEARCH_LOG_PATH = os.getenv("SEARCH_LOG_PATH")
+SUGGEST_TOP_N = int(os.getenv("SUGGEST_TOP_N", "10"))
+SUGGEST_REFRESH_SECONDS = float(os.getenv("SUGGEST_REFRESH_SECONDS", "5"))
+# A query is suggested to everyone only after SUGGEST_MIN_COUNT searches, so one visitor's text stays private.
+# At most SUGGEST_MAX_QUERIES queries are remembered (the most searched), and once the search log passes
+# SEARCH_LOG_MAX_BYTES it is compacted into a snapshot of the counts, which bounds memory and cold-start replay.
+SUGGEST_MIN_COUNT = int(os.getenv("SUGGEST_MIN_COUNT", "5"))
+SUGGEST_MAX_QUERIES = int(os.getenv("SUGGEST_MAX_QUERIES", "50000"))
+SEARCH_LOG_MAX_BYTES = int(os.getenv("SEARCH_LOG_MAX_BYTES", str(8 * 1024 * 1024)))
+
+SUGGESTIONS = SuggestionTrie(top_n=SUGGEST_TOP_N, min_count=SUGGEST_MIN_COUNT, max_queries=SUGGEST_MAX_QUERIES)
+SEARCH_LOG = SearchLog(SEARCH_LOG_PATH, SUGGESTIONS, SUGGEST_REFRESH_SECONDS,
+                       max_bytes=SEARCH_LOG_MAX_BYTES) if SEARCH_LOG_PATH else None
+if SEARCH_LOG is not None:
+    SEARCH_LOG.refresh(force=True)
+
+# Directory of a BM25 index built with `python search_index.py build`. When set, /search ranks
+# that local corpus instead of generating mock results. The budget caps postings read per query term.
+SEARCH_INDEX_DIR = os.getenv("SEARCH_INDEX_DIR")
+SEARCH_INDEX_POSTINGS_BUDGET = int(os.getenv("SEARCH_INDEX_POSTINGS_BUDGET", "5000"))
+SEARCH_INDEX = load_search_index(SEARCH_INDEX_DIR, SEARCH_INDEX_POSTINGS_BUDGET) if SEARCH_INDEX_DIR else None
+
+# How long Gemini results (and failures) are reused for the same query, in seconds.
+GEMINI_CACHE_TTL = int(os.getenv("GEMINI_CACHE_TTL", "600"))
+GEMINI_NEGATIVE_TTL = int(os.getenv("GEMINI_NEGATIVE_TTL", "30"))
+# Expired results are kept this much longer to fill the featured slot when Gemini misses its deadline.
+GEMINI_STALE_TTL = int(os.getenv("GEMINI_STALE_TTL", "3000"))
+# Gemini results are cached under a canonical form of the query (canonical.py: Unicode and case
+# normalized, punctuation and stopwords dropped), so "Machine Learning?" reuses "machine learning".
+# Opt-in: a new form within QUERY_NEAR_DUPLICATE_THRESHOLD trigram similarity of one seen before
+# ("introduction quantum computings") reuses that one too, unless their numbers or single letters
+# differ. 0 (the default) turns near-duplicate matching off; 0.9 is the suggested setting.
+QUERY_CANONICAL_KEYS = os.getenv("QUERY_CANONICAL_KEYS", "1") == "1"
+QUERY_NEAR_DUPLICATE_THRESHOLD = float(os.getenv("QUERY_NEAR_DUPLICATE_THRESHOLD", "0"))
+
+# /search waits at most this long for the featured Gemini result before rendering without it.
+GEMINI_DEADLINE_MS = int(os.getenv("GEMINI_DEADLINE_MS", "800"))
+# Upper bound on concurrent Gemini calls per worker process.
+GEMINI_MAX_WORKERS = int(os.getenv("GEMINI_MAX_WORKERS", "8"))
+# Async mode: Gemini calls go through the async client on one event loop per process instead of
+# GEMINI_MAX_WORKERS pool threads, so hundreds can be in flight (see gunicorn.conf.py).
+GEMINI_ASYNC = os.getenv("GEMINI_ASYNC", "0") == "1"
+GEMINI_ASYNC_MAX_CALLS = int(os.getenv("GEMINI_ASYNC_MAX_CALLS", "256"))
+
+# Stream /search pages: the general results are sent right away and the featured Gemini card follows
+# when it arrives, so a streamed page can afford a longer deadline. ?stream=1 / ?stream=0 overrides per request.
+STREAM_SEARCH = os.getenv("STREAM_SEARCH", "0") == "1"
+GEMINI_STREAM_DEADLINE_MS = int(os.getenv("GEMINI_STREAM_DEADLINE_MS", "10000"))
+
+# Gemini resilience: after GEMINI_BREAKER_FAILURES failed calls in a row, calls are skipped for
+# GEMINI_BREAKER_RESET_SECONDS; transient errors are retried GEMINI_RETRIES times with jittered backoff.
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "30"))
+GEMINI_RETRIES = int(os.getenv("GEMINI_RETRIES", "2"))
+GEMINI_RETRY_BASE_MS = int(os.getenv("GEMINI_RETRY_BASE_MS", "100"))
+GEMINI_RETRY_MAX_MS = int(os.getenv("GEMINI_RETRY_MAX_MS", "1000"))
+# Each Gemini call attempt is abandoned after this long (the client's HTTP timeout too) and counts as
+# a failure, so a hung API opens the breaker instead of holding workers and callers indefinitely.
+GEMINI_CALL_TIMEOUT_SECONDS = float(os.getenv("GEMINI_CALL_TIMEOUT_SECONDS", "20"))
+# Pre-warming: a background thread keeps the Gemini results of the PREWARM_TOP_N most searched queries
+# (recent searches weigh more) fresh, within PREWARM_CALLS_PER_MINUTE API calls. With several workers,
+# prefer running `python prewarm.py` once instead (see prewarm.py).
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "0") == "1"
+PREWARM_TOP_N = int(os.getenv("PREWARM_TOP_N", "20"))
+PREWARM_CALLS_PER_MINUTE = int(os.getenv("PREWARM_CALLS_PER_MINUTE", "30"))
+PREWARM_INTERVAL_SECONDS = float(os.getenv("PREWARM_INTERVAL_SECONDS", "30"))
+PREWARM_MARGIN_SECONDS = float(os.getenv("PREWARM_MARGIN_SECONDS", "120"))
+PREWARM_HALF_LIFE_SECONDS = float(os.getenv("PREWARM_HALF_LIFE_SECONDS", "1800"))
+
+# Start a second, identical call when one runs past this percentile of recent latencies (0 disables hedging).
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "0"))
+
+# Responses are minified and gzip/brotli compressed (bodies under COMPRESS_MIN_SIZE bytes are sent as is).
+# Pages in PRECOMPRESSED_PAGES don't vary per request, so they are rendered and compressed once at startup.
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") == "1"
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "500"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+PRECOMPRESSED_PAGES = ("/", "/login", "/register")
+
+# Full-page cache for /search (page_cache.py): a repeat search is served from memory, already minified
+# and compressed. Pages are fresh for PAGE_CACHE_TTL seconds, then served stale for up to
+# PAGE_CACHE_STALE_SECONDS more while one background render replaces them. Per process.
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "0") == "1"
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "1000"))
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", "60"))
+PAGE_CACHE_STALE_SECONDS = int(os.getenv("PAGE_CACHE_STALE_SECONDS", "600"))
+# Cache-Control of cached pages. The default makes browsers revalidate (a bodiless 304 when unchanged),
+# so every search still reaches the app and is counted; e.g. "public, max-age=60" lets CDNs serve repeats.
+PAGE_CACHE_CONTROL = os.getenv("PAGE_CACHE_CONTROL", "no-cache")
+# Bearer token for POST /api/page-cache/invalidate; the endpoint is disabled while unset.
+PAGE_CACHE_PURGE_TOKEN = os.getenv("PAGE_CACHE_PURGE_TOKEN")
+# Rendered result cards are kept (per process, least recently used dropped first) and reused by
+# every page showing the same result for the same query.
+FRAGMENT_CACHE_ENABLED = os.getenv("FRAGMENT_CACHE_ENABLED", "1") == "1"
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "20000"))
+
+# POST /api/search/batch takes at most BATCH_MAX_QUERIES queries. They are searched by a pool of
+# BATCH_WORKERS threads per process, shared by all batches. Their Gemini lookups get a pool of their
+# own, BATCH_GEMINI_WORKERS threads, so batches never hold up the featured results of interactive
+# searches; lookups still queued at the streaming deadline, or when the client leaves, are skipped.
+# Bearer token for the endpoint (every query can cost an API call); it is disabled while unset.
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "500"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))
+BATCH_GEMINI_WORKERS = int(os.getenv("BATCH_GEMINI_WORKERS", "2"))
+BATCH_TOKEN = os.getenv("BATCH_TOKEN")
+
+# Per-stage timings are sent in a Server-Timing header, and /metrics serves Prometheus-format metrics.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Stack-sample this share of requests (0 disables); profiles of requests slower than PROFILE_SLOW_MS
+# are written to PROFILE_DIR in collapsed-stack format, ready for a flame graph.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = int(os.getenv("PROFILE_SLOW_MS", "500"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "mindwork-profiles"))
 
 
 # -------------------------------------------------------------------------
@@ -90,7 +259,7 @@ BASE_FOOTER_HTML = f"""
 # Placeholder/Original content for LOGIN form. The key part is having the </body> tag.
 LOGIN_FORM_HTML = """
 <!DOCTYPE html>
-<html lang="en"><head><title>Login</title><script src="https://cdn.tailwindcss.com"></script></head>
+<html lang="en"><head><title>Login</title>{{ page_styles }}</head>
 <body class="antialiased bg-gray-100">
     <div class="min-h-screen flex items-center justify-center py-12 px-4 sm:px-6 lg:px-8">
         <div class="max-w-md w-full space-y-8 bg-white p-10 rounded-xl shadow-2xl">
@@ -114,7 +283,7 @@ LOGIN_FORM_HTML = """
 # Placeholder/Original content for REGISTER form. The key part is having the </body> tag.
 REGISTER_FORM_HTML = """
 <!DOCTYPE html>
-<html lang="en"><head><title>Register</title><script src="https://cdn.tailwindcss.com"></script></head>
+<html lang="en"><head><title>Register</title>{{ page_styles }}</head>
 <body class="antialiased bg-gray-100">
     <div class="min-h-screen flex items-center justify-center py-12 px-4 sm:px-6 lg:px-8">
         <div class="max-w-md w-full space-y-8 bg-white p-10 rounded-xl shadow-2xl">
@@ -143,23 +312,7 @@ SEARCH_RESULTS_HTML = """
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Results for {{ query }} - MindWork</title>
-    <script src="https://cdn.tailwindcss.com"></script>
-    <script>
-        tailwind.config = {
-            theme: {
-                extend: {
-                    fontFamily: {
-                        sans: ['Inter', 'sans-serif'],
-                    },
-                    colors: {
-                        'primary-blue': '#1f4e79', /* Deep Navy */
-                        'secondary-gray': '#f3f4f6',
-                        'accent-gold': '#d9a400', /* Gold for academic accent */
-                    }
-                }
-            }
-        }
-    </script>
+    {{ page_styles }}
 </head>
 <body class="antialiased">
 
@@ -200,27 +353,59 @@ SEARCH_RESULTS_HTML = """
             
             <h1 class="text-2xl font-bold text-gray-900 mb-6 border-b pb-2">Search Results for: "<span class="text-primary-blue">{{ query }}</span>"</h1>
             
-            {% if results %}
-                <div class="space-y-8">
+            {% if facets %}
+            <div class="mb-8 bg-white p-4 rounded-xl shadow-lg text-sm space-y-2">
+                {% for facet, title, choices in facet_options(facets, filters) %}
+                <div class="flex flex-wrap items-center gap-2">
+                    <span class="w-24 font-semibold text-gray-900">{{ title }}</span>
+                    {% for choice in choices %}
+                        <a href="{{ url_for('search', query=query, per_page=per_page, **filter_params(toggle_filter(filters, facet, choice.value))) }}" {% if choice.selected %}aria-current="true" class="px-3 py-1 rounded-lg bg-primary-blue text-white"{% else %}class="px-3 py-1 rounded-lg border border-gray-300 text-primary-blue hover:bg-gray-50"{% endif %}>{{ choice.label }} ({{ choice.count }})</a>
+                    {% endfor %}
+                </div>
+                {% endfor %}
+                {% if filters %}
+                    <a href="{{ url_for('search', query=query, per_page=per_page) }}" class="inline-block text-primary-blue hover:text-blue-800">Clear filters</a>
+                {% endif %}
+            </div>
+            {% endif %}
+
+            {# Cards come from the fragment cache; the markup is RESULT_CARD_HTML #}
+
+            {% if results or featured %}
+                {# When streaming, the featured card arrives last and is moved to the top with flex ordering #}
+                <div class="{% if stream %}flex flex-col gap-8{% else %}space-y-8{% endif %}">
+                    {% if featured %}{{ render_result_card(featured, query) }}{% endif %}
                     {% for result in results %}
-                        <div class="bg-white p-6 rounded-xl shadow-lg {% if result.author == 'Gemini AI' %}border-l-4 border-accent-gold{% endif %}">
-                            
-                            <h2 class="text-xl font-semibold {% if result.author == 'Gemini AI' %}text-accent-gold{% else %}text-primary-blue{% endif %} mb-1">
-                                <a href="{{ url_for('article', slug=result.slug, query=query) }}" class="hover:underline">
-                                    {{ result.title }}
-                                </a>
-                            </h2>
-                            
-                            <p class="text-gray-700 leading-relaxed">
-                                {{ result.summary }}
-                            </p>
-                        </div>
+                        {{ render_result_card(result, query) }}
                     {% endfor %}
+                    {% if stream %}
+                        {{ stream_flush }}
+                        {% set featured = await_featured() %}
+                        {% if featured %}{{ render_result_card(featured, query, 'order-first') }}{% endif %}
+                    {% endif %}
                 </div>
                 
                 <div class="mt-8 text-center text-gray-600">
-                    Displaying {{ results|length }} results. Total mock results are 105.
+                    Displaying {{ results|length + (1 if featured else 0) }} results (page {{ page }} of {{ page_count }}). {% if total_approximate %}At least {{ total }}{% else %}{{ total }}{% endif %} results in total.
                 </div>
+
+                {% if page_count > 1 %}
+                <nav class="mt-6 flex flex-wrap justify-center items-center gap-2" aria-label="Pagination">
+                    {% if page > 1 %}
+                        <a href="{{ url_for('search', query=query, page=page - 1, per_page=per_page, **filter_params(filters)) }}" class="px-4 py-2 rounded-lg border border-gray-300 bg-white text-primary-blue hover:bg-gray-50">Previous</a>
+                    {% endif %}
+                    {% for number in range([1, page - 4]|max, [page_count, page + 4]|min + 1) %}
+                        {% if number == page %}
+                            <span class="px-4 py-2 rounded-lg bg-primary-blue text-white" aria-current="page">{{ number }}</span>
+                        {% else %}
+                            <a href="{{ url_for('search', query=query, page=number, per_page=per_page, **filter_params(filters)) }}" class="px-4 py-2 rounded-lg border border-gray-300 bg-white text-primary-blue hover:bg-gray-50">{{ number }}</a>
+                        {% endif %}
+                    {% endfor %}
+                    {% if page < page_count %}
+                        <a href="{{ url_for('search', query=query, page=page + 1, per_page=per_page, **filter_params(filters)) }}" class="px-4 py-2 rounded-lg border border-gray-300 bg-white text-primary-blue hover:bg-gray-50">Next</a>
+                    {% endif %}
+                </nav>
+                {% endif %}
             {% else %}
                 <div class="text-center py-10 bg-white rounded-xl shadow-lg">
                     <p class="text-xl text-gray-600">No results found for your query. Please try searching for something else.</p>
@@ -235,6 +420,24 @@ SEARCH_RESULTS_HTML = """
 """
 
 # New HTML template for the simulated full article page.
+# One search result card, as a macro rendered on its own so it can be cached (see render_result_card)
+RESULT_CARD_HTML = """
+{% macro card(result, query, extra_class='') %}
+                        <div class="bg-white p-6 rounded-xl shadow-lg {{ extra_class }} {% if result.author == 'Gemini AI' %}border-l-4 border-accent-gold{% endif %}">
+                            
+                            <h2 class="text-xl font-semibold {% if result.author == 'Gemini AI' %}text-accent-gold{% else %}text-primary-blue{% endif %} mb-1">
+                                <a href="{{ url_for('article', slug=result.slug, query=query) }}" class="hover:underline">
+                                    {{ result.title }}
+                                </a>
+                            </h2>
+                            
+                            <p class="text-gray-700 leading-relaxed">
+                                {{ result.summary }}
+                            </p>
+                        </div>
+{% endmacro %}
+"""
+
 ARTICLE_PAGE_HTML = """
 <!DOCTYPE html>
 <html lang="en">
@@ -242,23 +445,7 @@ ARTICLE_PAGE_HTML = """
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{{ article.title }} - MindWork</title>
-    <script src="https://cdn.tailwindcss.com"></script>
-    <script>
-        tailwind.config = {
-            theme: {
-                extend: {
-                    fontFamily: {
-                        sans: ['Inter', 'sans-serif'],
-                    },
-                    colors: {
-                        'primary-blue': '#1f4e79', /* Deep Navy */
-                        'secondary-gray': '#f3f4f6',
-                        'accent-gold': '#d9a400', /* Gold for academic accent */
-                    }
-                }
-            }
-        }
-    </script>
+    {{ page_styles }}
 </head>
 <body class="antialiased bg-gray-50">
 
@@ -331,7 +518,7 @@ ARTICLE_PAGE_HTML = """
                             The author, **{{ article.author }}**, uses a didactic approach to explain the practical applications and theoretical underpinnings. For instance, the discussion on 'implementation challenges' spans over three thousand words and includes a glossary of technical terms related to **{{ original_query }}**.
                         </p>
                         <p>
-                            Furthermore, this resource is highly cited in the simulated academic community, appearing in **{{ random.randint(10, 50) }}** other mock documents generated for the MindWork platform.
+                            Furthermore, this resource is highly cited in the simulated academic community, appearing in **{{ citation_count }}** other mock documents generated for the MindWork platform.
                         </p>
                     {% endif %}
                 </div>
@@ -344,210 +531,15 @@ ARTICLE_PAGE_HTML = """
 </html>
 """
 
-# -------------------------------------------------------------------------
-# HTML Template Strings (Replacement Logic)
-# -------------------------------------------------------------------------
-
-# The replacement logic now works because the variables are defined above.
-LOGIN_FORM_HTML = LOGIN_FORM_HTML.replace("</body>", f"{BASE_FOOTER_HTML}</body>")
-REGISTER_FORM_HTML = REGISTER_FORM_HTML.replace("</body>", f"{BASE_FOOTER_HTML}</body>")
-ARTICLE_PAGE_HTML = ARTICLE_PAGE_HTML.replace("</body>", f"{BASE_FOOTER_HTML}</body>")
-# MINDWORK_HOMEPAGE_HTML and SEARCH_RESULTS_HTML will be handled in the final code block.
-
-
-# -------------------------------------------------------------------------
-# Helper Functions for Search Simulation (Updated)
-# -------------------------------------------------------------------------
-
-def generate_url_slug(title):
-    """
-    Creates a URL-friendly slug (ID) from a title.
-    """
-    # Convert to lowercase
-    s = title.lower()
-    # Remove non-word characters (except spaces and hyphens)
-    s = re.sub(r'[^\w\s-]', '', s)
-    # Replace whitespace with a single hyphen
-    s = re.sub(r'[\s]+', '-', s)
-    # Ensure it's not starting or ending with a hyphen
-    s = s.strip('-')
-    # Add a random unique 4-digit hex string to ensure uniqueness
-    unique_id = hex(random.randint(0x1000, 0xffff))[2:]
-    return f"{s}-{unique_id}"
-
-
-def generate_general_results(query, count=105):
-    """
-    Generates a large, diverse list of mock search results based on the query,
-    formatted as AI-style abstracts/summaries.
-    """
-    common_subjects = ["Photography", "Cooking", "Travel Guides", "History", "Coding Tutorials", "Fitness", "Personal Finance", "Gardening", "Science News", "Music Theory", "World Events", "Home Decor", "Gaming", "DIY Projects"]
-    common_formats = ["How to", "Best 10 Tips for", "A Deep Dive into", "The Ultimate Guide to", "Review of", "Top 5 Mistakes in", "Beginner's Guide to", "Quick Start:", "Comprehensive FAQ on"]
-    common_authors = ["Jane Doe", "John Smith", "The Daily Explorer", "Tech Guru", "Culinary Arts", "Historian Guy", "DIY Master", "Financial Freedom Blog"]
-    
-    # New list of AI-style summary starters/structures
-    ai_starters = [
-        "Research Abstract: This study investigates the inverse correlation between",
-        "Conceptual Synthesis: The key findings reveal a dependency between",
-        "Analytical Overview: We present a comprehensive examination of the factors influencing",
-        "Data-Driven Summary: A statistical analysis demonstrates the impact of",
-        "Key Insights Report: Emerging patterns suggest a shift in the traditional approach to"
-    ]
-
-    results = []
-    
-    # Store results to check for title duplicates during generation
-    generated_titles = set()
-    
-    while len(results) < count:
-        subject = random.choice(common_subjects)
-        format_type = random.choice(common_formats)
-        year = random.randint(2015, 2025)
-        
-        # Create a title that includes the query
-        if len(results) < 5:
-             # Ensure the first few results are highly relevant to the core query
-            title = f"The Essential Guide to {query}: History, Use, and Future - Entry {len(results)+1}"
-            source = f"Top-Tier Site {random.randint(1, 3)}"
-        elif len(results) % 5 == 0:
-            title = f"{format_type} {subject}: The Impact of '{query}' - Analysis {len(results)+1}"
-            source = f"Specialist Blog {random.randint(1, 10)}"
-        else:
-            title = f"{format_type} {query} in {subject} - Topic {len(results)+1}"
-            source = f"Web Source {random.randint(11, 50)}"
-
-        if title not in generated_titles:
-            generated_titles.add(title)
-            
-            slug = generate_url_slug(title)
-            
-            # Generate the new abstract-like summary
-            summary_starter = random.choice(ai_starters)
-            new_summary = f"{summary_starter} {query} within the domain of {subject}, providing condensed insights and preliminary conclusions. This is result number {len(results)+1}."
-
-            result = {
-                "title": title,
-                "author": random.choice(common_authors),
-                "year": year,
-                "source": source,
-                "summary": new_summary, # Use the new abstract-like summary
-                "slug": slug
-            }
-            results.append(result)
-            # Add to the global cache for the /article route to use
-            MOCK_RESULT_CACHE[slug] = result
-            
-    return results
-
-
-def generate_gemini_result(client, query):
-    """
-    Calls the Gemini API to generate a mock general search result.
-    The prompt is updated to reflect the request for Gemini-like research results.
-    """
-    if not client:
-        return None
-    
-    # Check if the query indicates a file/image analysis
-    if any(ext in query.lower() for ext in ['.jpg', '.png', '.pdf', '.docx', '.txt']):
-        file_name = query
-        mock_title = f"AI Research: Analysis of '{file_name}'" # Updated title
-        mock_summary = f"An initial AI-driven summary suggesting key concepts, visual elements, and potential research applications based on the content of the uploaded file/image. This is a research-style summary, providing the same results as Google Gemini for research purposes."
-        
-        # Generate slug and cache the result
-        slug = generate_url_slug(mock_title)
-        result = {
-            "title": mock_title,
-            "author": "Gemini AI",
-            "year": 2025,
-            "source": "Multimodal Analysis (AI-Generated)",
-            "summary": mock_summary,
-            "slug": slug
-        }
-        MOCK_RESULT_CACHE[slug] = result
-        return result
-
-
-    prompt = (
-        f"Generate a mock general search research result for a research platform based on the user's query: '{query}'. "
-        "The result should be highly informative, in-depth, and written in a research/analytical style, similar to a detailed Gemini summary. "
-        "The response must be in the exact format: "
-        "TITLE: [Research Summary Title]\nAUTHOR: [AI-Analyst Name]\nYEAR: [Year]\nSOURCE: [Domain/Research Type]\nSUMMARY: [In-depth research summary/abstract of the content]"
-    )
-
-    try:
-        # Using a fast model for this mock generation task
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt,
-        )
-        
-        # Parse the structured text output
-        text = response.text.strip()
-        
-        data = {}
-        for line in text.split('\n'):
-            if ':' in line:
-                key, value = line.split(':', 1)
-                data[key.strip().upper()] = value.strip()
-        
-        # Convert parsed data into the expected result format
-        if all(k in data for k in ['TITLE', 'AUTHOR', 'YEAR', 'SOURCE', 'SUMMARY']):
-            
-            slug = generate_url_slug(data['TITLE'])
-            result = {
-                "title": data['TITLE'],
-                "author": "Gemini AI", # Overriding the generated author to ensure it's always 'Gemini AI'
-                "year": data['YEAR'],
-                "source": data['SOURCE'] + " (AI-Generated)", # Mark it as AI
-                "summary": data['SUMMARY'],
-                "slug": slug
-            }
-            # Add to the global cache for the /article route to use
-            MOCK_RESULT_CACHE[slug] = result
-            return result
-            
-    except APIError as e:
-        print(f"Gemini API Error: {e}")
-        return None
-    except Exception as e:
-        print(f"General Error during Gemini call: {e}")
-        return None
-        
-    return None
-
-# -------------------------------------------------------------------------
-# Flask Routes (Updated)
-# -------------------------------------------------------------------------
-
-@app.route('/')
-def home():
-    """Renders the MindWork homepage."""
-    # Ensure MINDWORK_HOMEPAGE_HTML is defined or imported before use
-    MINDWORK_HOMEPAGE_HTML = """
+# Homepage template (previously rebuilt inside home() on every request).
+MINDWORK_HOMEPAGE_HTML = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>MindWork: General Research & Discovery Platform</title>
-    <script src="https://cdn.tailwindcss.com"></script>
-    <script>
-        tailwind.config = {
-            theme: {
-                extend: {
-                    fontFamily: {
-                        sans: ['Inter', 'sans-serif'],
-                    },
-                    colors: {
-                        'primary-blue': '#1f4e79', /* Deep Navy */
-                        'secondary-gray': '#f3f4f6',
-                        'accent-gold': '#d9a400', /* Gold for academic accent */
-                    }
-                }
-            }
-        }
-    </script>
+    {{ page_styles }}
     <style>
         body {
             font-family: 'Inter', sans-serif;
@@ -683,7 +675,8 @@ def home():
 
                                 <input type="text" id="site-search" name="query" placeholder="Search anything: general topics, media, concepts, or ask Gemini..."
                                         class="w-full py-3 pl-16 pr-16 border border-gray-300 rounded-xl shadow-xl focus:ring-primary-blue focus:border-primary-blue text-lg text-black transition duration-200"
-                                        required>
+                                        list="search-suggestions" autocomplete="off" required>
+                                <datalist id="search-suggestions"></datalist>
                                 
                                 <button type="submit" class="absolute right-0 top-0 bottom-0 px-4 flex items-center text-primary-blue hover:text-blue-800 transition duration-200">
                                     <svg class="h-6 w-6" xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24" stroke="currentColor">
@@ -806,6 +799,24 @@ def home():
             }
         }
         
+        // Suggests popular searches from /api/suggest after a short pause in typing
+        let suggestTimer = null;
+        document.getElementById('site-search').addEventListener('input', function(event) {
+            clearTimeout(suggestTimer);
+            const prefix = event.target.value;
+            if (!prefix.trim()) return;
+            suggestTimer = setTimeout(async function() {
+                const response = await fetch(`/api/suggest?q=${encodeURIComponent(prefix)}`);
+                if (!response.ok) return;
+                const data = await response.json();
+                document.getElementById('search-suggestions').replaceChildren(...data.suggestions.map(function(suggestion) {
+                    const option = document.createElement('option');
+                    option.value = suggestion;
+                    return option;
+                }));
+            }, 150);
+        });
+
         // Closes the menu if the user clicks anywhere outside of the button or the menu itself
         document.addEventListener('click', function(event) {
             const menu = document.getElementById('upload-menu');
@@ -820,110 +831,1585 @@ def home():
 </body>
 </html>
 """
-    MINDWORK_HOMEPAGE_HTML = MINDWORK_HOMEPAGE_HTML.replace("</body>", f"{BASE_FOOTER_HTML}</body>")
-    return render_template_string(MINDWORK_HOMEPAGE_HTML)
 
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    """Handles user login with form submission."""
-    if request.method == 'POST':
-        email = request.form.get('email')
-        password = request.form.get('password')
-        print(f"Attempting to log in with: {email}")
-        return redirect(url_for('home'))
-    
-    return render_template_string(LOGIN_FORM_HTML)
+# -------------------------------------------------------------------------
+# Template Registry (Pages compiled once at startup)
+# -------------------------------------------------------------------------
 
-@app.route('/register', methods=['GET', 'POST'])
-def register():
-    """Handles new user registration with form submission."""
-    if request.method == 'POST':
-        name = request.form.get('name')
-        email = request.form.get('email')
-        password = request.form.get('password')
-        print(f"Attempting to register new user: {name} ({email})")
-        return redirect(url_for('login'))
-        
-    return render_template_string(REGISTER_FORM_HTML)
+def with_footer(page_html):
+    """Merges the shared contact section and footer into a page template."""
+    return page_html.replace("</body>", f"{BASE_FOOTER_HTML}</body>")
 
-@app.route('/oauth/google')
-def google_oauth():
-    """Placeholder route for initiating the Google OAuth flow."""
-    # This now acts as the destination for the "Sign Up with Google" link
-    print("Initiating Google OAuth/Sign Up flow...")
-    return redirect(url_for('home'))
 
+# Every page template, footer already merged in, registered under the name the routes render.
+PAGE_TEMPLATES = {
+    "home.html": with_footer(MINDWORK_HOMEPAGE_HTML),
+    "login.html": with_footer(LOGIN_FORM_HTML),
+    "register.html": with_footer(REGISTER_FORM_HTML),
+    "search.html": with_footer(SEARCH_RESULTS_HTML),
+    "article.html": with_footer(ARTICLE_PAGE_HTML),
+    # Fragment, not a page: no footer
+    "result_card.html": RESULT_CARD_HTML,
+}
 
-@app.route('/search', methods=['GET'])
-def search():
+# Compiled template bytecode is shared between worker processes (and restarts) through this directory.
+# Leave TEMPLATE_CACHE_DIR unset to use Jinja's per-user default under the system temp directory.
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR")
+if TEMPLATE_CACHE_DIR:
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+
+app.jinja_loader = DictLoader(PAGE_TEMPLATES)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+
+
+def compile_page_templates():
     """
-    Handles general search queries, returning 100+ mock results and a Gemini summary.
+    Compiles every registered page template into the shared Jinja environment.
+    After this runs, a request only executes an already-compiled template.
     """
-    query = request.args.get('query', '').strip()
-    
-    if not query:
-        # Return to homepage if query is empty
-        return redirect(url_for('home'))
-    
-    # Clear the cache to prevent overflow if the app runs for a long time
-    global MOCK_RESULT_CACHE
-    MOCK_RESULT_CACHE = {} 
-
-    # --- 1. General Search Simulation (Generates 100+ Diverse Results) ---
-    all_results = generate_general_results(query, count=105)
-
-    # --- 2. Gemini Generative Result (The main, featured result) ---
-    if GEMINI_CLIENT_READY:
-        gemini_result = generate_gemini_result(client, query)
-        if gemini_result:
-            # Insert the single AI result at the very top (index 0)
-            all_results.insert(0, gemini_result)
-        
-    # Shuffle the mock results for variety (excluding the first one if it's the AI result)
-    if GEMINI_CLIENT_READY and len(all_results) > 1:
-        featured_ai = all_results[0]
-        general_results = all_results[1:]
-        random.shuffle(general_results)
-        all_results = [featured_ai] + general_results
-    else:
-        # If no Gemini, shuffle all general results
-        random.shuffle(all_results)
-    
-    # Ensure a maximum of 100 results are displayed to keep the page size manageable
-    final_results = all_results[:100]
+    for name in PAGE_TEMPLATES:
+        app.jinja_env.get_template(name)
 
-    return render_template_string(
-        SEARCH_RESULTS_HTML,
-        query=query,
-        results=final_results,
-        gemini_active=GEMINI_CLIENT_READY
-    )
 
-@app.route('/article/<slug>', methods=['GET'])
-def article(slug):
+compile_page_templates()
+
+
+# -------------------------------------------------------------------------
+# Result Card Fragments (each card rendered once, then reused)
+# -------------------------------------------------------------------------
+
+# Calling the macro directly is much cheaper than a full Template.render per card
+RESULT_CARD_MACRO = app.jinja_env.get_template("result_card.html").module.card
+# Part of every fragment key, so cards rendered from older markup are never reused
+RESULT_CARD_VERSION = hashlib.sha256(RESULT_CARD_HTML.encode("utf-8")).hexdigest()[:12]
+FRAGMENT_CACHE = FragmentCache(FRAGMENT_CACHE_MAX_ENTRIES) if FRAGMENT_CACHE_ENABLED else None
+
+
+def render_result_card(result, query, extra_class=""):
     """
-    Simulates a full article page by looking up the result in the cache.
+    Returns a result card's HTML, rendered once per (result slug, query, extra class) and then
+    served from the fragment cache. The query is part of the key because the card's article
+    link carries it.
     """
-    original_query = request.args.get('query', 'research')
-    article_data = MOCK_RESULT_CACHE.get(slug)
-    
-    if not article_data:
-        # If the slug is not found (e.g., page refresh or not generated in the current session)
-        # We can try to generate a fallback mock article based on the slug's title part
-        fallback_title = slug.rsplit('-', 1)[0].replace('-', ' ').title()
-        article_data = {
-            "title": f"Error: Article Not Found (Mock Title: {fallback_title})",
-            "author": "System Error",
-            "year": 2025,
-            "source": "Fallback Cache Miss",
-            "summary": "The full article content could not be retrieved from the cache. Please return to the search results page and click the link again to reload the content.",
+    if FRAGMENT_CACHE is None:
+        return RESULT_CARD_MACRO(result, query, extra_class)
+    return FRAGMENT_CACHE.get_or_render(
+        (result["slug"], query, extra_class, RESULT_CARD_VERSION),
+        lambda: RESULT_CARD_MACRO(result, query, extra_class),
+    )
+
+
+app.jinja_env.globals["render_result_card"] = render_result_card
+# The facet panel and the pagination links of the search page
+app.jinja_env.globals.update(facet_options=facet_options, filter_params=filter_params, toggle_filter=toggle_filter)
+
+
+# -------------------------------------------------------------------------
+# Static Assets (Built by build_assets.py, fingerprinted, cached forever)
+# -------------------------------------------------------------------------
+
+ASSET_MANIFEST_PATH = os.path.join(app.static_folder, "dist", "manifest.json")
+ASSET_MAX_AGE = 31536000  # one year; the file name changes whenever the content does
+
+# Used only when the stylesheet hasn't been built (python build_assets.py)
+TAILWIND_CDN_HTML = """<script src="https://cdn.tailwindcss.com"></script>
+    <script>
+        tailwind.config = {
+            theme: {
+                extend: {
+                    fontFamily: {
+                        sans: ['Inter', 'sans-serif'],
+                    },
+                    colors: {
+                        'primary-blue': '#1f4e79', /* Deep Navy */
+                        'secondary-gray': '#f3f4f6',
+                        'accent-gold': '#d9a400', /* Gold for academic accent */
+                    }
+                }
+            }
         }
+    </script>"""
 
-    return render_template_string(
-        ARTICLE_PAGE_HTML,
-        article=article_data,
-        original_query=original_query
-    )
+
+def load_asset_manifest():
+    """Maps logical asset names ("app.css") to their fingerprinted paths under static/."""
+    try:
+        with open(ASSET_MANIFEST_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        print(f"Warning: no asset manifest at {ASSET_MANIFEST_PATH}; using the Tailwind CDN. Run build_assets.py.")
+        return {}
+
+
+ASSET_MANIFEST = load_asset_manifest()
+
+
+def asset_url(name):
+    """URL of a built asset, e.g. asset_url("app.css") -> /static/dist/app.3f2a9c1e4b.css."""
+    return url_for("static", filename=ASSET_MANIFEST[name])
+
+
+def page_styles():
+    """The stylesheet tags every page template puts in its <head>."""
+    if "app.css" not in ASSET_MANIFEST:
+        return Markup(TAILWIND_CDN_HTML)
+    return Markup(f'<link rel="stylesheet" href="{asset_url("app.css")}">')
+
+
+app.jinja_env.globals["asset_url"] = asset_url
+
+
+@app.context_processor
+def inject_page_styles():
+    return {"page_styles": page_styles()}
+
+
+@app.after_request
+def cache_fingerprinted_assets(response):
+    """Hashed build output never changes under the same name, so browsers and CDNs may keep it for a year."""
+    if request.path.startswith("/static/dist/") and not request.path.endswith(".json") and response.status_code == 200:
+        response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    return response
+
+
+# -------------------------------------------------------------------------
+# Helper Functions for Search Simulation (Updated)
+# -------------------------------------------------------------------------
+
+# Word lists the mock general results are built from.
+COMMON_SUBJECTS = ["Photography", "Cooking", "Travel Guides", "History", "Coding Tutorials", "Fitness", "Personal Finance", "Gardening", "Science News", "Music Theory", "World Events", "Home Decor", "Gaming", "DIY Projects"]
+COMMON_FORMATS = ["How to", "Best 10 Tips for", "A Deep Dive into", "The Ultimate Guide to", "Review of", "Top 5 Mistakes in", "Beginner's Guide to", "Quick Start:", "Comprehensive FAQ on"]
+COMMON_AUTHORS = ["Jane Doe", "John Smith", "The Daily Explorer", "Tech Guru", "Culinary Arts", "Historian Guy", "DIY Master", "Financial Freedom Blog"]
+
+# AI-style summary starters/structures
+AI_STARTERS = [
+    "Research Abstract: This study investigates the inverse correlation between",
+    "Conceptual Synthesis: The key findings reveal a dependency between",
+    "Analytical Overview: We present a comprehensive examination of the factors influencing",
+    "Data-Driven Summary: A statistical analysis demonstrates the impact of",
+    "Key Insights Report: Emerging patterns suggest a shift in the traditional approach to"
+]
+
+# General result slugs end in "-<query hash:8><result index:4><seed:4>" (hex), so any worker can
+# rebuild the result from the link alone. Gemini slugs end in a random 12-digit hex id instead.
+GENERAL_SLUG_PATTERN = re.compile(r'-([0-9a-f]{8})([0-9a-f]{4})([0-9a-f]{4})$')
+# Slugs of documents from the local search index end in "-doc<document id>".
+INDEX_SLUG_PATTERN = re.compile(r'-doc(\d+)$')
+SLUG_STRIP_PATTERN = re.compile(r'[^\w\s-]')
+SLUG_SPACE_PATTERN = re.compile(r'[\s]+')
+
+
+def generate_url_slug(title, unique_id=None):
+    """
+    Creates a URL-friendly slug (ID) from a title.
+    """
+    # Convert to lowercase
+    s = title.lower()
+    # Remove non-word characters (except spaces and hyphens)
+    s = SLUG_STRIP_PATTERN.sub('', s)
+    # Replace whitespace with a single hyphen
+    s = SLUG_SPACE_PATTERN.sub('-', s)
+    # Ensure it's not starting or ending with a hyphen
+    s = s.strip('-')
+    if unique_id is None:
+        # Add a random unique 12-digit hex string to ensure uniqueness
+        unique_id = secrets.token_hex(6)
+    return f"{s}-{unique_id}"
+
+
+def query_hash(query):
+    """
+    Stable 8-digit hex hash of a query. Unlike hash(), it is the same in every worker process.
+    """
+    return hashlib.blake2b(query.encode("utf-8"), digest_size=4).hexdigest()
+
+
+def generate_general_result(query, index, seed=MOCK_RESULT_SEED):
+    """
+    Generates the mock search result at position `index` for a query.
+    The output depends only on (query, index, seed), so the same result can be rebuilt anywhere.
+    """
+    qhash = query_hash(query)
+    rng = random.Random((seed << 48) | (int(qhash, 16) << 16) | index)
+
+    subject = rng.choice(COMMON_SUBJECTS)
+    format_type = rng.choice(COMMON_FORMATS)
+    year = rng.randint(2015, 2025)
+
+    # Create a title that includes the query
+    if index < 5:
+        # Ensure the first few results are highly relevant to the core query
+        title = f"The Essential Guide to {query}: History, Use, and Future - Entry {index+1}"
+        source = f"Top-Tier Site {rng.randint(1, 3)}"
+    elif index % 5 == 0:
+        title = f"{format_type} {subject}: The Impact of '{query}' - Analysis {index+1}"
+        source = f"Specialist Blog {rng.randint(1, 10)}"
+    else:
+        title = f"{format_type} {query} in {subject} - Topic {index+1}"
+        source = f"Web Source {rng.randint(11, 50)}"
+
+    # Generate the abstract-like summary
+    summary_starter = rng.choice(AI_STARTERS)
+    new_summary = f"{summary_starter} {query} within the domain of {subject}, providing condensed insights and preliminary conclusions. This is result number {index+1}."
+
+    return {
+        "title": title,
+        "author": rng.choice(COMMON_AUTHORS),
+        "year": year,
+        "source": source,
+        "subject": subject,
+        "summary": new_summary,
+        "slug": generate_url_slug(title, unique_id=f"{qhash}{index:04x}{seed:04x}")
+    }
+
+
+@functools.lru_cache(maxsize=1024)
+def result_order(query, seed=MOCK_RESULT_SEED, total=MOCK_RESULT_TOTAL):
+    """
+    Display order of a query's mock results: a shuffle of the result indices, seeded per
+    query so every page (and every worker) sees the same order.
+    """
+    order = list(range(total))
+    random.Random((seed << 32) | int(query_hash(query), 16)).shuffle(order)
+    return tuple(order)
+
+
+@functools.lru_cache(maxsize=1024)
+def ranked_order(query, weights, current_year, seed=MOCK_RESULT_SEED, total=MOCK_RESULT_TOTAL):
+    """
+    Display order of a query's mock results under relevance ranking: the result indices by
+    score, ties in the query's shuffled order. Every result is generated and scored once per
+    query; after that a page generates only its own results. `weights` is RANKING_WEIGHTS as
+    a tuple of items, and `current_year` is part of the key so recency never goes stale.
+    """
+    score = make_scorer(query, dict(weights), current_year)
+    order = result_order(query, seed, total)
+    scores = {index: score(generate_general_result(query, index, seed)) for index in order}
+    return tuple(sorted(order, key=scores.__getitem__, reverse=True))
+
+
+@functools.lru_cache(maxsize=256)
+def result_facets(query, seed=MOCK_RESULT_SEED, total=MOCK_RESULT_TOTAL):
+    """
+    Facet bitmaps of a query's mock results, bit i for result index i (not display position).
+    """
+    return FacetIndex.from_records(generate_general_result(query, index, seed) for index in range(total))
+
+
+def generate_general_results(query, start=0, stop=MOCK_RESULT_TOTAL, seed=MOCK_RESULT_SEED):
+    """
+    Lazily generates the mock search results at display positions [start, stop) for the query,
+    formatted as AI-style abstracts/summaries. Results outside the window are never built.
+    """
+    # Titles carry the result number, so every result is unique without a duplicate check
+    for index in result_order(query, seed)[start:stop]:
+        yield generate_general_result(query, index, seed)
+
+
+def rebuild_general_result(slug, query):
+    """
+    Rebuilds a general result from its slug and the query it was generated for.
+    Returns None for Gemini slugs, malformed slugs, slugs that belong to another query, and
+    slugs of a result number no results page shows.
+    """
+    match = GENERAL_SLUG_PATTERN.search(slug)
+    if not match or match.group(1) != query_hash(query):
+        return None
+    index = int(match.group(2), 16)
+    if index >= MOCK_RESULT_TOTAL:
+        return None
+    result = generate_general_result(query, index, int(match.group(3), 16))
+    return result if result["slug"] == slug else None
+
+
+def index_result(doc_id):
+    """
+    Turns a document of the local search index into a result record.
+    """
+    record = SEARCH_INDEX.document(doc_id)
+    if record is None:
+        return None
+    return dict(record, slug=generate_url_slug(record["title"], unique_id=f"doc{doc_id}"))
+
+
+def search_index_results(query, start, stop, predicates):
+    """
+    Ranks the local corpus with BM25 and returns (total, results at positions [start, stop),
+    facet counts, whether the total is approximate), among the documents that pass the facet
+    filters. The filters are applied first, from the facet bitmaps alone, and postings are read
+    until one allowed result more than `stop` is scored, so every page up to the total has
+    results and a next page is offered whenever there are more; when postings were left unread
+    the total counts only the scored documents.
+    The facets are counted, from the index's bitmaps, over the scored documents, and only the
+    scored documents left by the filters are ranked.
+    """
+    facets = SEARCH_INDEX.facets
+    allowed = facets.filter(predicates) if predicates else None
+    scores, exact, matched = SEARCH_INDEX.score(query, stop + 1, allowed)
+    filtered = None if allowed is None else allowed & matched
+    total = len(scores) if filtered is None else popcount(filtered)
+    hits = SEARCH_INDEX.top(scores, stop, filtered)
+    results = [index_result(doc_id) for _score, doc_id in hits[start:stop]]
+    return total, results, facets.counts(predicates, matched), not exact
+
+
+def rebuild_index_result(slug):
+    """
+    Looks up a local search index document from its slug, or returns None.
+    """
+    match = INDEX_SLUG_PATTERN.search(slug)
+    if SEARCH_INDEX is None or not match:
+        return None
+    return index_result(int(match.group(1)))
+
+
+# Every Gemini API call goes through a circuit breaker, retries and (optionally) hedging.
+GEMINI_BREAKER = CircuitBreaker(
+    "Gemini", failure_threshold=GEMINI_BREAKER_FAILURES, reset_timeout=GEMINI_BREAKER_RESET_SECONDS)
+# Hedged and timed attempts need a pool of their own: they are awaited from GEMINI_EXECUTOR threads.
+GEMINI_ATTEMPT_EXECUTOR = (
+    ThreadPoolExecutor(max_workers=GEMINI_MAX_WORKERS * 2, thread_name_prefix="gemini-attempt")
+    if GEMINI_HEDGE_PERCENTILE or GEMINI_CALL_TIMEOUT_SECONDS else None
+)
+GEMINI_MODEL = 'gemini-2.5-flash'
+GEMINI_CALLER = ResilientCaller(
+    lambda client, **kwargs: client.models.generate_content(**kwargs),
+    async_func=lambda client, **kwargs: client.aio.models.generate_content(**kwargs),
+    breaker=GEMINI_BREAKER,
+    retries=GEMINI_RETRIES,
+    base_delay=GEMINI_RETRY_BASE_MS / 1000,
+    max_delay=GEMINI_RETRY_MAX_MS / 1000,
+    hedge_percentile=GEMINI_HEDGE_PERCENTILE or None,
+    executor=GEMINI_ATTEMPT_EXECUTOR,
+    timeout=GEMINI_CALL_TIMEOUT_SECONDS or None,
+)
+# Async mode: every Gemini call runs on this one event loop, at most GEMINI_ASYNC_MAX_CALLS at a time.
+GEMINI_LOOP = EventLoopThread("gemini-loop")
+GEMINI_ASYNC_SLOTS = None  # asyncio.Semaphore, created by gemini_async_slots() in the loop's thread
+GEMINI_CLIENT_LOCK = threading.Lock()
+
+
+def gemini_async_slots():
+    """The semaphore bounding async Gemini calls, created on first use so it belongs to GEMINI_LOOP."""
+    global GEMINI_ASYNC_SLOTS
+    if GEMINI_ASYNC_SLOTS is None:
+        # Only ever called on GEMINI_LOOP's one thread, so there is no race to create it
+        GEMINI_ASYNC_SLOTS = asyncio.Semaphore(GEMINI_ASYNC_MAX_CALLS)
+    return GEMINI_ASYNC_SLOTS
+
+
+def get_gemini_client():
+    """
+    Returns the Gemini client, creating it on the first call (this is where the google.genai
+    import happens). Returns None if no client is configured or it could not be created.
+    """
+    global client, GEMINI_CLIENT_READY
+    if client is not None or not GEMINI_CLIENT_READY:
+        return client
+    with GEMINI_CLIENT_LOCK:
+        if client is None and GEMINI_CLIENT_READY:
+            started = time.perf_counter()
+            try:
+                if GEMINI_FAKE:
+                    from fake_genai import FakeClient
+                    client = FakeClient.from_env()
+                    print(f"Using the fake Gemini client ({client.latency_ms:g} ms latency, {client.error_rate:.0%} errors).")
+                else:
+                    from google import genai
+                    from google.genai import types
+                    timeout_ms = int(GEMINI_CALL_TIMEOUT_SECONDS * 1000) or None
+                    client = genai.Client(http_options=types.HttpOptions(timeout=timeout_ms))
+                    print(f"Gemini client initialized successfully in {(time.perf_counter() - started) * 1000:.0f} ms.")
+            except Exception as e:
+                print(f"Error initializing Gemini client: {e}")
+                GEMINI_CLIENT_READY = False
+    return client
+
+
+def gemini_file_result(query):
+    """
+    Queries naming a file (e.g. "scan.pdf") get a canned multimodal-analysis result without
+    an API call. Returns None for every other query.
+    """
+    if not any(ext in query.lower() for ext in ['.jpg', '.png', '.pdf', '.docx', '.txt']):
+        return None
+    file_name = query
+    mock_title = f"AI Research: Analysis of '{file_name}'" # Updated title
+    mock_summary = f"An initial AI-driven summary suggesting key concepts, visual elements, and potential research applications based on the content of the uploaded file/image. This is a research-style summary, providing the same results as Google Gemini for research purposes."
+
+    # Generate slug and cache the result
+    slug = generate_url_slug(mock_title)
+    result = {
+        "title": mock_title,
+        "author": "Gemini AI",
+        "year": 2025,
+        "source": "Multimodal Analysis (AI-Generated)",
+        "summary": mock_summary,
+        "slug": slug
+    }
+    RESULT_STORE.set(slug, result)
+    return result
+
+
+def gemini_prompt(query):
+    return (
+        f"Generate a mock general search research result for a research platform based on the user's query: '{query}'. "
+        "The result should be highly informative, in-depth, and written in a research/analytical style, similar to a detailed Gemini summary. "
+        "The response must be in the exact format: "
+        "TITLE: [Research Summary Title]\nAUTHOR: [AI-Analyst Name]\nYEAR: [Year]\nSOURCE: [Domain/Research Type]\nSUMMARY: [In-depth research summary/abstract of the content]"
+    )
+
+
+def parse_gemini_response(text):
+    """
+    Turns Gemini's TITLE:/AUTHOR:/... answer into a result record and stores it for /article.
+    Returns None if a field is missing.
+    """
+    data = {}
+    for line in text.strip().split('\n'):
+        if ':' in line:
+            key, value = line.split(':', 1)
+            data[key.strip().upper()] = value.strip()
+
+    # Convert parsed data into the expected result format
+    if not all(k in data for k in ['TITLE', 'AUTHOR', 'YEAR', 'SOURCE', 'SUMMARY']):
+        return None
+    slug = generate_url_slug(data['TITLE'])
+    result = {
+        "title": data['TITLE'],
+        "author": "Gemini AI", # Overriding the generated author to ensure it's always 'Gemini AI'
+        "year": data['YEAR'],
+        "source": data['SOURCE'] + " (AI-Generated)", # Mark it as AI
+        "summary": data['SUMMARY'],
+        "slug": slug
+    }
+    # Add to the shared result store for the /article route to use
+    RESULT_STORE.set(slug, result)
+    return result
+
+
+def generate_gemini_result(client, query):
+    """
+    Calls the Gemini API to generate a mock general search result.
+    The prompt is updated to reflect the request for Gemini-like research results.
+    """
+    if not client:
+        return None
+    file_result = gemini_file_result(query)
+    if file_result is not None:
+        return file_result
+
+    try:
+        # Using a fast model for this mock generation task
+        response = GEMINI_CALLER(client, model=GEMINI_MODEL, contents=gemini_prompt(query))
+        return parse_gemini_response(response.text)
+    except CircuitOpenError:
+        # Gemini is failing; skip the call instead of making every search wait for it
+        return None
+    except Exception as e:
+        if is_api_error(e):
+            print(f"Gemini API Error: {e}")
+        else:
+            print(f"General Error during Gemini call: {e}")
+        return None
+
+
+async def generate_gemini_result_async(client, query):
+    """
+    generate_gemini_result() on the event loop, through the async client (client.aio):
+    a call in flight holds no thread.
+    """
+    if not client:
+        return None
+    file_result = gemini_file_result(query)
+    if file_result is not None:
+        return file_result
+
+    try:
+        async with gemini_async_slots():
+            response = await GEMINI_CALLER.call_async(client, model=GEMINI_MODEL, contents=gemini_prompt(query))
+        return parse_gemini_response(response.text)
+    except CircuitOpenError:
+        return None
+    except Exception as e:
+        if is_api_error(e):
+            print(f"Gemini API Error: {e}")
+        else:
+            print(f"General Error during Gemini call: {e}")
+        return None
+
+GEMINI_CALL_SECONDS = REGISTRY.histogram(
+    "mindwork_gemini_call_duration_seconds", "Latency of Gemini API calls, by outcome.", ("outcome",))
+GEMINI_ERRORS = REGISTRY.counter(
+    "mindwork_gemini_errors", "Gemini API calls that failed or returned an unusable response.")
+GEMINI_DEADLINE_MISSES = REGISTRY.counter(
+    "mindwork_gemini_deadline_misses", "Searches that stopped waiting for the featured Gemini result.")
+
+
+def fetch_gemini_result(query):
+    """
+    Calls Gemini for a query, recording the call's latency and outcome.
+    """
+    started = time.perf_counter()
+    result = generate_gemini_result(get_gemini_client(), query)
+    record_gemini_call(time.perf_counter() - started, result)
+    return result
+
+
+async def fetch_gemini_result_async(query):
+    started = time.perf_counter()
+    # Creating the client imports the SDK; that must not block the event loop
+    gemini = client if client is not None else await asyncio.get_running_loop().run_in_executor(None, get_gemini_client)
+    result = await generate_gemini_result_async(gemini, query)
+    record_gemini_call(time.perf_counter() - started, result)
+    return result
+
+
+def record_gemini_call(seconds, result):
+    GEMINI_CALL_SECONDS.observe(seconds, "ok" if result is not None else "error")
+    if result is None:
+        GEMINI_ERRORS.inc()
+
+
+QUERY_KEYS = (
+    QueryCanonicalizer(threshold=QUERY_NEAR_DUPLICATE_THRESHOLD or None) if QUERY_CANONICAL_KEYS else None
+)
+
+# Query-keyed cache in front of fetch_gemini_result(): identical concurrent searches share one API call.
+GEMINI_CACHE = GeminiResultCache(
+    fetch_gemini_result,
+    RESULT_STORE,
+    ttl=GEMINI_CACHE_TTL,
+    negative_ttl=GEMINI_NEGATIVE_TTL,
+    stale_ttl=GEMINI_STALE_TTL,
+    fetch_async=fetch_gemini_result_async,
+    key_func=QUERY_KEYS,
+)
+
+# Gemini calls run here so /search can build the general results while the API call is in flight.
+GEMINI_EXECUTOR = ThreadPoolExecutor(max_workers=GEMINI_MAX_WORKERS, thread_name_prefix="gemini")
+
+
+def start_gemini_lookup(query):
+    """
+    Starts fetching the featured Gemini result for a query: on the event loop in async mode,
+    otherwise on the Gemini thread pool. A fresh cached result comes back as an already-completed future.
+    """
+    found, result = GEMINI_CACHE.lookup(query)
+    if found:
+        future = Future()
+        future.set_result(result)
+        return future
+    if GEMINI_ASYNC:
+        return GEMINI_LOOP.submit(GEMINI_CACHE.get_async(query))
+    return GEMINI_EXECUTOR.submit(GEMINI_CACHE.get, query)
+
+
+def await_gemini_result(future, query, deadline):
+    """
+    Waits for the featured Gemini result until `deadline` (a time.monotonic() value).
+    Past the deadline, falls back to the last cached result, if any. The late call keeps
+    running and stores its result in GEMINI_CACHE for the next request.
+    """
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeoutError:
+        GEMINI_DEADLINE_MISSES.inc()
+        print(f"Gemini deadline exceeded for query: {query}")
+        return GEMINI_CACHE.lookup_stale(query)
+
+# Searches seen by this process, for pre-warming the trending ones.
+TRENDING = TrendingQueries(half_life=PREWARM_HALF_LIFE_SECONDS)
+PREWARMER = Prewarmer(
+    GEMINI_CACHE,
+    TRENDING,
+    top_n=PREWARM_TOP_N,
+    calls_per_minute=PREWARM_CALLS_PER_MINUTE,
+    margin=PREWARM_MARGIN_SECONDS,
+    interval=PREWARM_INTERVAL_SECONDS,
+    is_available=GEMINI_BREAKER.available,
+) if PREWARM_ENABLED and GEMINI_CLIENT_READY else None
+
+
+def record_search(query):
+    """
+    Counts a search towards the autocomplete suggestions and the trending queries.
+    """
+    if SEARCH_LOG is not None:
+        SEARCH_LOG.record(query)
+    else:
+        SUGGESTIONS.add(query)
+    if PREWARMER is not None:
+        TRENDING.add(query)
+        PREWARMER.ensure_running()
+
+
+# -------------------------------------------------------------------------
+# Search Core (shared by the HTML pages and the JSON API)
+# -------------------------------------------------------------------------
+
+def read_pagination():
+    """
+    Reads ?page= and ?per_page= from the request, clamped to valid values.
+    """
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = min(max(1, request.args.get('per_page', SEARCH_PER_PAGE, type=int)), SEARCH_MAX_PER_PAGE)
+    return page, per_page
+
+
+def read_facet_filters():
+    """
+    Reads the facet filters from the request: ?year_from=, ?year_to=, ?tier=, ?subject=, ?ai=.
+    """
+    return parse_filters(request.args)
+
+
+def pagination_context(page, per_page, total, total_approximate=False):
+    return {
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        # The total is a lower bound: the local index stopped reading postings (see search_index_results)
+        "total_approximate": total_approximate,
+        "page_count": max(1, -(-total // per_page)),
+    }
+
+
+def find_general_results(query, start, stop, filters=None):
+    """
+    Returns (total, results at display positions [start, stop), facet counts, whether the
+    total is approximate): the local index's BM25 ranking if one is loaded, otherwise the mock
+    results in the configured order. Only results passing the facet filters (see
+    read_facet_filters) are counted and shown.
+    """
+    predicates = filter_predicates(filters or {})
+    if SEARCH_INDEX is not None:
+        # BM25 ranking over the local corpus
+        with stage("index"):
+            return search_index_results(query, start, stop, predicates)
+    if RESULT_ORDERING == "relevance":
+        # Simulation, ranked: the query's ranking is computed once and cached like its shuffle
+        with stage("rank"):
+            order = ranked_order(query, tuple(RANKING_WEIGHTS.items()), time.localtime().tm_year)
+    else:
+        order = result_order(query)
+    with stage("facets"):
+        facets = result_facets(query)
+        counts = facets.counts(predicates)
+        if predicates:
+            matching = facets.filter(predicates)
+            order = [index for index in order if matching >> index & 1]
+    # Only the requested page is generated, in the query's ranked or seeded order
+    with stage("generate"):
+        return len(order), [generate_general_result(query, index) for index in order[start:stop]], counts, False
+
+
+def find_page(query, page, per_page, filters=None):
+    """
+    find_general_results() for one page. A page past the last one is clamped to the last page,
+    so an old or edited link still shows results. Returns (page, total, results, facet counts,
+    whether the total is approximate).
+    """
+    total, results, facets, total_approximate = find_general_results(query, (page - 1) * per_page, page * per_page, filters)
+    last_page = max(1, -(-total // per_page))
+    if page > last_page and not total_approximate:
+        page = last_page
+        total, results, facets, total_approximate = find_general_results(
+            query, (page - 1) * per_page, page * per_page, filters)
+    return page, total, results, facets, total_approximate
+
+
+def start_featured_lookup(query, page, deadline_ms):
+    """
+    Starts the featured Gemini lookup (first page only). Returns (future, deadline), or (None, None).
+    """
+    if not GEMINI_CLIENT_READY or page != 1:
+        return None, None
+    return start_gemini_lookup(query), time.monotonic() + deadline_ms / 1000
+
+
+def featured_if_matching(featured, filters):
+    """The featured result, or None if the facet filters exclude it."""
+    if featured is None or not filters or matches(featured, filter_predicates(filters)):
+        return featured
+    return None
+
+
+def run_search(query, page, per_page, deadline_ms=GEMINI_DEADLINE_MS, filters=None, lookup=None):
+    """
+    Runs one search page: the Gemini lookup starts first, the general results are found while
+    it is in flight, then the featured result is awaited until the deadline.
+    Returns the featured result (if it passes the filters), the page of results, the facet
+    counts (the featured result included), the filters, the pagination fields, and whether
+    the page is complete (see page_is_complete). A `lookup` is the (future, deadline) of a
+    featured lookup started earlier by start_featured_lookup.
+    """
+    filters = filters or {}
+    gemini_future, deadline = lookup or start_featured_lookup(query, page, deadline_ms)
+    page, total, results, facets, total_approximate = find_page(query, page, per_page, filters)
+
+    featured = None
+    if gemini_future is not None:
+        with stage("gemini"):
+            featured = await_gemini_result(gemini_future, query, deadline)
+    complete = page_is_complete(page, featured)
+    if featured is not None:
+        add_record(facets, featured, filter_predicates(filters))
+        featured = featured_if_matching(featured, filters)
+
+    return dict(featured=featured, results=results, facets=facets, filters=filters, complete=complete,
+                **pagination_context(page, per_page, total, total_approximate))
+
+
+def find_article(slug, query):
+    """
+    Resolves an article slug: general and indexed results are rebuilt from the slug itself;
+    only Gemini results need the result store. Returns None if the slug is unknown.
+    """
+    return (
+        rebuild_general_result(slug, query)
+        or rebuild_index_result(slug)
+        or RESULT_STORE.get(slug)
+    )
+
+
+# -------------------------------------------------------------------------
+# Streaming Search Pages
+# -------------------------------------------------------------------------
+
+# The search template emits this right before it blocks on the Gemini result,
+# so everything rendered up to that point reaches the browser immediately.
+STREAM_FLUSH_MARKER = Markup("<!-- flush -->")
+
+
+def chunk_at_flush_markers(pieces):
+    """
+    Joins the many small pieces a streamed Jinja template yields into one
+    chunk per STREAM_FLUSH_MARKER, instead of one network write per piece.
+    """
+    buffer = []
+    for piece in pieces:
+        if piece == STREAM_FLUSH_MARKER:
+            yield "".join(buffer)
+            buffer = []
+        else:
+            buffer.append(piece)
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_search_page(query, results, gemini_future, deadline, pagination, facets, filters, cache_key=None):
+    """
+    Streams the search page: header, search box, facet panel and general results first,
+    then the featured Gemini card once it arrives (or the deadline passes).
+    With a cache_key, the page is also stored in the page cache once sent complete.
+    The facet counts are sent before the featured result exists, so they leave it out.
+    """
+    rendered = {}
+
+    def await_featured():
+        if gemini_future is None:
+            return None
+        rendered["featured"] = await_gemini_result(gemini_future, query, deadline)
+        return featured_if_matching(rendered["featured"], filters)
+
+    pieces = stream_template(
+        "search.html",
+        query=query,
+        results=results,
+        featured=None,
+        facets=facets,
+        filters=filters,
+        gemini_active=GEMINI_CLIENT_READY,
+        stream=True,
+        stream_flush=STREAM_FLUSH_MARKER,
+        await_featured=await_featured,
+        **pagination
+    )
+    chunks = chunk_at_flush_markers(pieces)
+    if cache_key is not None:
+        chunks = cache_streamed_page(chunks, cache_key, lambda: page_is_complete(pagination["page"], rendered.get("featured")))
+    # Ask reverse proxies not to buffer the response, or the early flush is lost
+    return Response(chunks, mimetype="text/html", headers={"X-Accel-Buffering": "no"})
+
+
+# -------------------------------------------------------------------------
+# Search Page Cache (full rendered pages, stale-while-revalidate)
+# -------------------------------------------------------------------------
+
+PAGE_CACHE = PageCache(
+    # Stale pages are re-rendered here, off the request path
+    ThreadPoolExecutor(max_workers=2, thread_name_prefix="page-refresh"),
+    max_entries=PAGE_CACHE_MAX_ENTRIES,
+    ttl=PAGE_CACHE_TTL,
+    stale_ttl=PAGE_CACHE_STALE_SECONDS,
+    encodings=available_encodings() if COMPRESSION_ENABLED else (),
+    minify=COMPRESSION_ENABLED,
+    level=COMPRESS_LEVEL,
+) if PAGE_CACHE_ENABLED else None
+
+
+def normalize_query(query):
+    """Trims a query and collapses inner whitespace, so spacing variants share one cached page."""
+    return " ".join(query.split())
+
+
+def page_is_complete(page, featured):
+    """
+    Whether a rendered page may be cached: it must not be missing a featured result that
+    only missed the deadline (it would be missing from every repeat too).
+    """
+    return featured is not None or not (GEMINI_CLIENT_READY and page == 1)
+
+
+def render_search_html(query, context):
+    return render_template(
+        "search.html",
+        query=query,
+        gemini_active=GEMINI_CLIENT_READY,
+        stream=False,
+        **context
+    )
+
+
+def render_search_page(query, page, per_page, filters):
+    """
+    Renders a search page outside of a request, for a page cache refresh. With no visitor
+    waiting, the featured result gets the streaming deadline. Returns None for an incomplete page.
+    """
+    query_string = dict(query=query, page=page, per_page=per_page, **filter_params(filters))
+    with app.test_request_context("/search", query_string=query_string):
+        context = run_search(query, page, per_page, deadline_ms=GEMINI_STREAM_DEADLINE_MS, filters=filters)
+        if not context["complete"]:
+            return None
+        return render_search_html(query, context)
+
+
+def cache_streamed_page(chunks, key, is_complete):
+    """Passes a streamed page through, then stores it in the page cache if it was sent complete."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    if is_complete():
+        PAGE_CACHE.put(key, "".join(parts))
+
+
+def cached_page_response(entry):
+    """
+    Serves a page cache entry in the best encoding the client accepts, with a strong ETag
+    (304 when the client already has this version). Being encoded already, the response
+    passes through the compression middleware untouched.
+    """
+    encoding = choose_encoding(request.headers.get("Accept-Encoding"), PAGE_CACHE.encodings)
+    headers = {
+        "ETag": entry["etag"] if encoding is None else encoded_etag(entry["etag"], encoding),
+        "Vary": "Accept-Encoding",
+        "Cache-Control": PAGE_CACHE_CONTROL,
+    }
+    if entry["etag"] in strip_encoded_etags(request.headers.get("If-None-Match", "")):
+        return Response(status=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(entry["bodies"][encoding], mimetype="text/html", headers=headers)
+
+
+def invalidate_search_pages(query=None):
+    """
+    Drops this process's cached pages of a query (all of its pages and filters), or every cached page.
+    Returns how many were dropped.
+    """
+    if PAGE_CACHE is None:
+        return 0
+    if query is None:
+        return PAGE_CACHE.invalidate()
+    query = normalize_query(query)
+    return PAGE_CACHE.invalidate(lambda key: key[0] == query)
+
+
+# -------------------------------------------------------------------------
+# Request Metrics (Server-Timing, /metrics, slow-request profiles)
+# -------------------------------------------------------------------------
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "mindwork_request_duration_seconds", "Time to produce a response (streamed bodies: until the first byte).",
+    ("endpoint", "method", "status"))
+
+
+def gemini_cache_counts():
+    return {(event,): count for event, count in GEMINI_CACHE.stats.items()}
+
+
+def gemini_cache_hit_ratio():
+    """Share of Gemini lookups answered without a new API call (cache hits and coalesced waits)."""
+    stats = GEMINI_CACHE.stats
+    lookups = sum(stats.values())
+    return {(): (lookups - stats["misses"]) / lookups if lookups else 0.0}
+
+
+def result_order_cache_counts():
+    info = result_order.cache_info()
+    return {("hits",): info.hits, ("misses",): info.misses}
+
+
+REGISTRY.callback("mindwork_gemini_cache_events", "Gemini cache lookups by outcome.", "counter", ("event",),
+                  gemini_cache_counts)
+REGISTRY.callback("mindwork_gemini_cache_hit_ratio", "Share of Gemini lookups served without an API call.", "gauge", (),
+                  gemini_cache_hit_ratio)
+REGISTRY.callback("mindwork_result_order_cache_events", "Memoized result shuffles, hits and misses.", "counter", ("event",),
+                  result_order_cache_counts)
+REGISTRY.callback("mindwork_ranked_order_cache_events", "Memoized relevance rankings of mock results, hits and misses.",
+                  "counter", ("event",),
+                  lambda: {("hits",): ranked_order.cache_info().hits, ("misses",): ranked_order.cache_info().misses})
+REGISTRY.callback("mindwork_result_facets_cache_events", "Memoized facet bitmaps of mock results, hits and misses.", "counter",
+                  ("event",), lambda: {("hits",): result_facets.cache_info().hits, ("misses",): result_facets.cache_info().misses})
+REGISTRY.callback("mindwork_result_store_entries", "Entries in the result store.", "gauge", (),
+                  lambda: {(): len(RESULT_STORE)})
+
+BREAKER_STATES = (CLOSED, HALF_OPEN, OPEN)
+
+REGISTRY.callback("mindwork_gemini_breaker_state", "Gemini circuit breaker state (1 for the current state).", "gauge",
+                  ("state",), lambda: {(state,): int(GEMINI_BREAKER.state == state) for state in BREAKER_STATES})
+REGISTRY.callback("mindwork_gemini_breaker_transitions", "Gemini circuit breaker state changes, by new state.", "counter",
+                  ("state",), lambda: {(state,): GEMINI_BREAKER.transitions[state] for state in BREAKER_STATES})
+REGISTRY.callback("mindwork_gemini_call_events", "Gemini calls, retries, hedges, timeouts and calls skipped by the open circuit.",
+                  "counter", ("event",), lambda: {(event,): count for event, count in GEMINI_CALLER.stats.items()})
+
+if QUERY_KEYS is not None:
+    REGISTRY.callback("mindwork_query_key_events", "Canonical query keys: new keys, and new forms mapped onto a near duplicate.",
+                      "counter", ("event",), lambda: {(event,): count for event, count in QUERY_KEYS.stats.items()})
+
+if FRAGMENT_CACHE is not None:
+    REGISTRY.callback("mindwork_fragment_cache_events", "Result card renders served from the fragment cache (hits) or rendered.",
+                      "counter", ("event",), lambda: {(event,): count for event, count in FRAGMENT_CACHE.stats.items()})
+    REGISTRY.callback("mindwork_fragment_cache_entries", "Rendered result cards in the fragment cache.", "gauge", (),
+                      lambda: {(): len(FRAGMENT_CACHE)})
+
+if PAGE_CACHE is not None:
+    REGISTRY.callback("mindwork_page_cache_events", "Search page cache hits (fresh and stale), misses, refreshes, evictions.",
+                      "counter", ("event",), lambda: {(event,): count for event, count in PAGE_CACHE.stats.items()})
+    REGISTRY.callback("mindwork_page_cache_entries", "Pages in the search page cache.", "gauge", (),
+                      lambda: {(): len(PAGE_CACHE)})
+
+if PREWARMER is not None:
+    REGISTRY.callback("mindwork_prewarm_events", "Pre-warming of trending queries: refreshes, failures, skips.",
+                      "counter", ("event",), lambda: {(event,): count for event, count in PREWARMER.stats.items()})
+
+PROFILER = SamplingProfiler(output_dir=PROFILE_DIR) if PROFILE_SAMPLE_RATE > 0 else None
+
+
+@app.before_request
+def start_request_metrics():
+    if not METRICS_ENABLED:
+        return
+    g.request_started = time.perf_counter()
+    g.stage_timings = {}
+    if PROFILER is not None and random.random() < PROFILE_SAMPLE_RATE:
+        g.profiled_thread = threading.get_ident()
+        PROFILER.start(g.profiled_thread)
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Adds the Server-Timing header and records the request."""
+    started = g.get("request_started")
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    response.headers["Server-Timing"] = server_timing_header(g.get("stage_timings", {}), elapsed)
+    REQUEST_SECONDS.observe(elapsed, request.endpoint or "unmatched", request.method, str(response.status_code))
+    return response
+
+
+@app.teardown_request
+def stop_request_profile(error=None):
+    """
+    Stops sampling the request's thread and keeps the stack profile of a slow request. A
+    teardown handler runs even when the view raised and after_request handlers were skipped,
+    so a failed request never leaves its thread being sampled.
+    """
+    if "profiled_thread" not in g:
+        return
+    stacks = PROFILER.stop(g.pop("profiled_thread"))
+    elapsed = time.perf_counter() - g.request_started
+    if elapsed * 1000 >= PROFILE_SLOW_MS:
+        path = PROFILER.dump(stacks, request.endpoint or "unmatched")
+        print(f"Slow request ({elapsed * 1000:.0f} ms): {request.full_path} - profile written to {path}")
+
+
+# -------------------------------------------------------------------------
+# Health and Warm-up (/healthz, /readyz)
+# -------------------------------------------------------------------------
+
+WARMUP_QUERY = "machine learning"
+# This process's warm-up: status is "pending", "warming", "ready" or "failed"; steps maps each
+# finished step to its duration in ms, errors to what went wrong.
+WARMUP_STATE = {"pid": None, "status": "pending", "steps": {}, "errors": {}}
+WARMUP_LOCK = threading.Lock()
+
+
+def prime_results():
+    """
+    Runs the search path once (ordering, generation or index lookup, slugs, article rebuild),
+    so the first real search doesn't pay for first-call setup.
+    """
+    _total, results, _facets, _approximate = find_general_results(WARMUP_QUERY, 0, SEARCH_PER_PAGE)
+    if results:
+        find_article(results[0]["slug"], WARMUP_QUERY)
+
+
+def render_every_page():
+    """
+    Renders each page template once with representative content (compiling it if the
+    bytecode cache didn't have it), outside of any real request.
+    """
+    with app.test_request_context(f"/search?query={WARMUP_QUERY}"):
+        total, results, facets, _approximate = find_general_results(WARMUP_QUERY, 0, SEARCH_PER_PAGE)
+        render_template("home.html")
+        render_template("login.html")
+        render_template("register.html")
+        render_search_html(WARMUP_QUERY, dict(featured=None, results=results, facets=facets, filters={},
+                                              **pagination_context(1, SEARCH_PER_PAGE, total)))
+        if results:
+            render_template("article.html", article=results[0], original_query=WARMUP_QUERY, citation_count=10)
+
+
+def preconnect_gemini():
+    """
+    Creates the Gemini client and makes one cheap call (listing a single model), so the TLS
+    handshake is paid here and the client's pooled connection is open for the first search.
+    In async mode the async client's connection is opened too, on the event loop.
+    """
+    gemini = get_gemini_client()
+    if gemini is None:
+        return
+    GEMINI_EXECUTOR.submit(gemini.models.list, config={"page_size": 1}).result(timeout=WARMUP_GEMINI_TIMEOUT)
+    if GEMINI_ASYNC:
+        GEMINI_LOOP.submit(gemini.aio.models.list(config={"page_size": 1})).result(timeout=WARMUP_GEMINI_TIMEOUT)
+
+
+# (step name, function, whether the process may serve traffic if it fails).
+# Searches work without Gemini, so a failed connection doesn't keep the process out of rotation.
+WARMUP_STEPS = (
+    ("results", prime_results, False),
+    ("templates", render_every_page, False),
+    ("gemini", preconnect_gemini, True),
+)
+
+
+def warm_up():
+    """
+    Runs every warm-up step, timing each into WARMUP_STATE, then marks the process ready
+    (or failed, if a required step raised).
+    """
+    status = "ready"
+    for name, step, optional in WARMUP_STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            WARMUP_STATE["errors"][name] = f"{type(e).__name__}: {e}"
+            print(f"Warm-up step '{name}' failed: {e}")
+            if not optional:
+                status = "failed"
+        WARMUP_STATE["steps"][name] = round((time.perf_counter() - started) * 1000, 1)
+    WARMUP_STATE["status"] = status
+    print(f"Worker {os.getpid()} warm-up {status}: {WARMUP_STATE['steps']}")
+
+
+def start_warm_up():
+    """
+    Starts warm_up() on a background thread, once per process. gunicorn.conf.py calls this
+    as each worker starts; under other servers the first request does.
+    """
+    if WARMUP_STATE["pid"] == os.getpid():
+        return
+    with WARMUP_LOCK:
+        if WARMUP_STATE["pid"] == os.getpid():
+            return
+        WARMUP_STATE.update(pid=os.getpid(), status="warming" if WARMUP_ENABLED else "ready", steps={}, errors={})
+        if WARMUP_ENABLED:
+            threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+@app.before_request
+def start_warm_up_on_first_request():
+    # Not for the pages precompressed at import: a thread started then would still be
+    # running in the gunicorn master while it forks the workers.
+    if not request.environ.get("compression.precompress"):
+        start_warm_up()
+
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """
+    Liveness: the process is up and serving requests.
+    """
+    return Response("ok\n", mimetype="text/plain", headers={"Cache-Control": "no-store"})
+
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """
+    Readiness: 200 once this process has warmed up, 503 while it is warming (or if warm-up failed).
+    """
+    response = jsonify(
+        status=WARMUP_STATE["status"],
+        pid=os.getpid(),
+        steps=WARMUP_STATE["steps"],
+        errors=WARMUP_STATE["errors"],
+    )
+    response.status_code = 200 if WARMUP_STATE["status"] == "ready" else 503
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+# -------------------------------------------------------------------------
+# Flask Routes (Updated)
+# -------------------------------------------------------------------------
+
+@app.route('/')
+def home():
+    """Renders the MindWork homepage."""
+    return render_template("home.html")
+
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    """Handles user login with form submission."""
+    if request.method == 'POST':
+        email = request.form.get('email')
+        password = request.form.get('password')
+        print(f"Attempting to log in with: {email}")
+        return redirect(url_for('home'))
+    
+    return render_template("login.html")
+
+@app.route('/register', methods=['GET', 'POST'])
+def register():
+    """Handles new user registration with form submission."""
+    if request.method == 'POST':
+        name = request.form.get('name')
+        email = request.form.get('email')
+        password = request.form.get('password')
+        print(f"Attempting to register new user: {name} ({email})")
+        return redirect(url_for('login'))
+        
+    return render_template("register.html")
+
+@app.route('/oauth/google')
+def google_oauth():
+    """Placeholder route for initiating the Google OAuth flow."""
+    # This now acts as the destination for the "Sign Up with Google" link
+    print("Initiating Google OAuth/Sign Up flow...")
+    return redirect(url_for('home'))
+
+
+@app.route('/search', methods=['GET'])
+def search():
+    """
+    Handles general search queries, returning one page (?page=, ?per_page=) of the
+    local index's BM25 ranking (or of the 105 mock results), plus a Gemini summary on the first page.
+    Facet filters (see read_facet_filters) narrow the results; the page shows the facet counts.
+    """
+    query = normalize_query(request.args.get('query', ''))
+    
+    if not query:
+        # Return to homepage if query is empty
+        return redirect(url_for('home'))
+    
+    stream = request.args.get('stream', '1' if STREAM_SEARCH else '0') == '1'
+    page, per_page = read_pagination()
+    filters = read_facet_filters()
+
+    if page == 1:
+        record_search(query)
+
+    cache_key = (query, page, per_page, filter_key(filters))
+    if PAGE_CACHE is not None:
+        with stage("page_cache"):
+            entry, fresh = PAGE_CACHE.get(cache_key)
+        if entry is not None:
+            if not fresh:
+                PAGE_CACHE.refresh(cache_key, functools.partial(render_search_page, query, page, per_page, filters))
+            return cached_page_response(entry)
+
+    if stream:
+        gemini_future, deadline = start_featured_lookup(query, page, GEMINI_STREAM_DEADLINE_MS)
+        page, total, results, facets, total_approximate = find_page(query, page, per_page, filters)
+        return stream_search_page(query, results, gemini_future, deadline,
+                                  pagination_context(page, per_page, total, total_approximate),
+                                  facets, filters, cache_key=cache_key if PAGE_CACHE is not None else None)
+
+    context = run_search(query, page, per_page, filters=filters)
+    with stage("render"):
+        html = render_search_html(query, context)
+    if PAGE_CACHE is not None and context["complete"]:
+        return cached_page_response(PAGE_CACHE.put(cache_key, html))
+    return html
+
+@app.route('/api/suggest', methods=['GET'])
+def suggest():
+    """
+    Returns the most searched queries starting with ?q= (at most ?limit=) for the search box.
+    """
+    prefix = request.args.get('q', '')
+    limit = min(max(1, request.args.get('limit', SUGGEST_TOP_N, type=int)), SUGGEST_TOP_N)
+    if SEARCH_LOG is not None:
+        SEARCH_LOG.refresh()
+
+    response = jsonify(query=prefix, suggestions=SUGGESTIONS.complete(prefix, limit))
+    response.headers["Cache-Control"] = "public, max-age=60"
+    return response
+
+# -------------------------------------------------------------------------
+# JSON API
+# -------------------------------------------------------------------------
+
+# Fields of a result record; ?fields= selects a subset of them.
+RESULT_FIELDS = ("title", "author", "year", "source", "subject", "summary", "slug")
+
+
+def read_fields():
+    """
+    Reads ?fields=title,slug into a tuple of result fields. Raises ValueError on unknown fields.
+    """
+    return parse_fields(request.args.get('fields'))
+
+
+def parse_fields(requested):
+    """
+    Turns "title,slug" (or a list of field names) into a tuple of result fields; all of them
+    if nothing is requested. Raises ValueError on unknown fields.
+    """
+    if not requested:
+        return RESULT_FIELDS
+    if isinstance(requested, str):
+        requested = requested.split(',')
+    fields = tuple(field.strip() for field in requested if isinstance(field, str) and field.strip())
+    unknown = [field for field in fields if field not in RESULT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(RESULT_FIELDS)}")
+    return fields
+
+
+def select_fields(result, fields):
+    if result is None:
+        return None
+    return {field: result.get(field) for field in fields}
+
+
+def json_response(payload, cache_control):
+    """
+    Serializes a payload as compact JSON with a strong ETag; answers 304 Not Modified
+    when the client's If-None-Match already has this exact body.
+    """
+    body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    response = Response(body, mimetype="application/json")
+    response.set_etag(hashlib.sha256(body).hexdigest()[:32])
+    response.headers["Cache-Control"] = cache_control
+    return response.make_conditional(request)
+
+
+def json_error(message, status):
+    response = jsonify(error=message)
+    response.status_code = status
+    return response
+
+
+@app.route('/api/search', methods=['GET'])
+def api_search():
+    """
+    JSON version of /search: the same result records (?fields= to select), paginated and
+    filtered the same way, with the facet counts ({facet: {value: count}}).
+    """
+    query = normalize_query(request.args.get('query', ''))
+    if not query:
+        return json_error("Missing 'query' parameter.", 400)
+    try:
+        fields = read_fields()
+    except ValueError as e:
+        return json_error(str(e), 400)
+
+    page, per_page = read_pagination()
+    filters = read_facet_filters()
+    if page == 1:
+        record_search(query)
+    data = run_search(query, page, per_page, filters=filters)
+    # Clients may keep the response but must revalidate it; an unchanged page costs a bodiless 304
+    return json_response(search_payload(query, data, fields), "no-cache")
+
+
+def search_payload(query, data, fields):
+    """The JSON form of a run_search() page, with `fields` of each result record."""
+    return {
+        "query": query,
+        "page": data["page"],
+        "per_page": data["per_page"],
+        "total": data["total"],
+        "total_approximate": data["total_approximate"],
+        "page_count": data["page_count"],
+        "filters": filter_params(data["filters"]),
+        "facets": data["facets"],
+        "featured": select_fields(data["featured"], fields),
+        "results": [select_fields(result, fields) for result in data["results"]],
+    }
+
+
+@app.route('/api/article/<slug>', methods=['GET'])
+def api_article(slug):
+    """
+    JSON version of /article/<slug>. General results need the ?query= they were found for.
+    """
+    try:
+        fields = read_fields()
+    except ValueError as e:
+        return json_error(str(e), 400)
+
+    article_data = find_article(slug, request.args.get('query', 'research'))
+    if article_data is None:
+        return json_error("Article not found.", 404)
+    return json_response(select_fields(article_data, fields), "public, max-age=300")
+
+# -------------------------------------------------------------------------
+# Batch Search (POST /api/search/batch, NDJSON)
+# -------------------------------------------------------------------------
+
+# Searches of every batch run here, so concurrent batches can't take more than BATCH_WORKERS threads
+BATCH_EXECUTOR = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch-search")
+# ... and their Gemini lookups here, apart from GEMINI_EXECUTOR and GEMINI_LOOP
+BATCH_GEMINI_EXECUTOR = ThreadPoolExecutor(max_workers=BATCH_GEMINI_WORKERS, thread_name_prefix="batch-gemini")
+BATCH_QUERIES = REGISTRY.counter(
+    "mindwork_batch_queries", "Queries received in search batches: searched, answered by a duplicate in the batch, or failed; "
+    "and Gemini lookups skipped (past the deadline, or the batch abandoned).",
+    ("outcome",))
+
+
+def batch_filter_args(filters):
+    """
+    The /api/search parameters (a MultiDict of strings) for a batch's JSON "filters": years as
+    integers (or digit strings), "tier" and "subject" as a string or a list of strings, "ai" as
+    a boolean, 1 or 0 (or "1" or "0"). Raises ValueError for anything else, so that a filter
+    is never silently dropped.
+    """
+    args = MultiDict()
+    for name, value in filters.items():
+        if name in ("year_from", "year_to"):
+            if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+                value = int(value)
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise ValueError(f'Filter "{name}" must be a year (an integer).')
+            args[name] = str(value)
+        elif name in ("tier", "subject"):
+            values = [value] if isinstance(value, str) else value
+            if not isinstance(values, list) or not all(isinstance(item, str) for item in values):
+                raise ValueError(f'Filter "{name}" must be a string or a list of strings.')
+            args.setlist(name, values)
+        elif name == "ai":
+            if value not in (True, False, "1", "0") or isinstance(value, float):
+                raise ValueError('Filter "ai" must be true or false (or 1 or 0).')
+            args[name] = "1" if value in (True, "1") else "0"
+        else:
+            raise ValueError(f'Unknown filter "{name}".')
+    return args
+
+
+def read_batch():
+    """
+    Reads a batch request body: {"queries": [...], "page": 1, "per_page": 10, "fields": [...],
+    "filters": {"year_from": 2020, "tier": ["top"], ...}}; all but "queries" are optional and
+    apply to every query. Returns (queries, page, per_page, fields, filters); raises ValueError.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get("queries"), list):
+        raise ValueError('Expected a JSON object with a "queries" list.')
+    queries = body["queries"]
+    if not queries or len(queries) > BATCH_MAX_QUERIES:
+        raise ValueError(f"A batch needs between 1 and {BATCH_MAX_QUERIES} queries.")
+    if not all(isinstance(query, str) and query.strip() for query in queries):
+        raise ValueError("Every query must be a non-empty string.")
+
+    try:
+        page = max(1, int(body.get("page", 1)))
+        per_page = min(max(1, int(body.get("per_page", SEARCH_PER_PAGE))), SEARCH_MAX_PER_PAGE)
+    except (TypeError, ValueError):
+        raise ValueError('"page" and "per_page" must be integers.') from None
+    filters = body.get("filters") or {}
+    if not isinstance(filters, dict):
+        raise ValueError('"filters" must be an object of /api/search filter parameters.')
+    return queries, page, per_page, parse_fields(body.get("fields")), parse_filters(batch_filter_args(filters))
+
+
+def batch_gemini_lookup(query, deadline, cancelled):
+    """
+    Fetches a batch query's featured result once a BATCH_GEMINI_EXECUTOR thread is free. A lookup
+    whose turn comes after the deadline, or after the batch was abandoned, makes no API call and
+    returns the stale result, if any.
+    """
+    if cancelled.is_set() or time.monotonic() >= deadline:
+        BATCH_QUERIES.inc("gemini_skipped")
+        return GEMINI_CACHE.lookup_stale(query)
+    return GEMINI_CACHE.get(query)
+
+
+def start_batch_lookup(query, page, cancelled):
+    """start_featured_lookup() for a batch query: (future, deadline) on BATCH_GEMINI_EXECUTOR, or (None, None)."""
+    if not GEMINI_CLIENT_READY or page != 1:
+        return None, None
+    # A batch has no page to render, so the featured results get the streaming deadline
+    deadline = time.monotonic() + GEMINI_STREAM_DEADLINE_MS / 1000
+    found, result = GEMINI_CACHE.lookup(query)
+    if found:
+        future = Future()
+        future.set_result(result)
+    else:
+        future = BATCH_GEMINI_EXECUTOR.submit(batch_gemini_lookup, query, deadline, cancelled)
+    return future, deadline
+
+
+def stream_batch(queries, page, per_page, fields, filters):
+    """
+    Searches each distinct query of a batch once, on BATCH_EXECUTOR, and yields an NDJSON
+    line per query of the batch ({"index": position in the batch, ...}) as soon as its search
+    is done, then a summary line. The Gemini lookups are all queued before the first search,
+    so they wait on the API BATCH_GEMINI_WORKERS at a time rather than one after another.
+    """
+    started = time.monotonic()
+    positions = {}
+    for index, query in enumerate(queries):
+        positions.setdefault(normalize_query(query), []).append(index)
+    BATCH_QUERIES.inc("deduplicated", amount=len(queries) - len(positions))
+
+    cancelled = threading.Event()
+    lookups = {query: start_batch_lookup(query, page, cancelled) for query in positions}
+    futures = {
+        BATCH_EXECUTOR.submit(run_search, query, page, per_page, filters=filters, lookup=lookups[query]): query
+        for query in positions
+    }
+    failed = 0
+    try:
+        for future in as_completed(futures):
+            query = futures[future]
+            try:
+                line = search_payload(query, future.result(), fields)
+                BATCH_QUERIES.inc("searched")
+            except Exception as e:
+                print(f"Batch search failed for query {query!r}: {e}")
+                line = {"query": query, "error": "Search failed."}
+                BATCH_QUERIES.inc("failed")
+                failed += 1
+            for index in positions[query]:
+                yield json.dumps({"index": index, **line}, separators=(",", ":"), ensure_ascii=False) + "\n"
+        yield json.dumps({"done": True, "queries": len(queries), "distinct": len(positions), "failed": failed,
+                          "elapsed_ms": round((time.monotonic() - started) * 1000, 1)}) + "\n"
+    finally:
+        # Done, or the client went away mid-batch: searches and lookups that haven't started are
+        # dropped, and lookups already handed a thread make no API call
+        cancelled.set()
+        for future in futures:
+            future.cancel()
+        for future, _deadline in lookups.values():
+            if future is not None:
+                future.cancel()
+
+
+@app.route('/api/search/batch', methods=['POST'])
+def api_search_batch():
+    """
+    Runs many searches in one request and streams the /api/search payload of each query as a
+    line of NDJSON, in completion order (each line has the query's "index" in the batch).
+    Identical queries are searched once. Batch queries don't count towards suggestions or trending.
+    Needs "Authorization: Bearer <BATCH_TOKEN>".
+    """
+    if not BATCH_TOKEN:
+        return json_error("Not found.", 404)
+    if not secrets.compare_digest(request.headers.get("Authorization", ""), f"Bearer {BATCH_TOKEN}"):
+        return json_error("Invalid or missing token.", 403)
+    try:
+        queries, page, per_page, fields, filters = read_batch()
+    except ValueError as e:
+        return json_error(str(e), 400)
+    return Response(stream_batch(queries, page, per_page, fields, filters), mimetype="application/x-ndjson",
+                    headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"})
+
+
+@app.route('/api/page-cache/invalidate', methods=['POST'])
+def invalidate_page_cache():
+    """
+    Drops cached search pages (?query= for one query's, otherwise all) in the worker process
+    that handles the request. Needs "Authorization: Bearer <PAGE_CACHE_PURGE_TOKEN>".
+    """
+    if not PAGE_CACHE_PURGE_TOKEN:
+        return json_error("Not found.", 404)
+    if not secrets.compare_digest(request.headers.get("Authorization", ""), f"Bearer {PAGE_CACHE_PURGE_TOKEN}"):
+        return json_error("Invalid or missing token.", 403)
+    return jsonify(invalidated=invalidate_search_pages(request.args.get('query')), pid=os.getpid())
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus scrape endpoint for this worker process.
+    """
+    if not METRICS_ENABLED:
+        return Response("Metrics are disabled.\n", status=404, mimetype="text/plain")
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/article/<slug>', methods=['GET'])
+def article(slug):
+    """
+    Simulates a full article page by looking up the result in the shared result store.
+    """
+    original_query = request.args.get('query', 'research')
+    with stage("lookup"):
+        article_data = find_article(slug, original_query)
+    status = 200
+
+    if not article_data:
+        status = 404
+        # If the slug is not found (e.g., page refresh or not generated in the current session)
+        # We can try to generate a fallback mock article based on the slug's title part
+        fallback_title = slug.rsplit('-', 1)[0].replace('-', ' ').title()
+        article_data = {
+            "title": f"Error: Article Not Found (Mock Title: {fallback_title})",
+            "author": "System Error",
+            "year": 2025,
+            "source": "Fallback Cache Miss",
+            "summary": "The full article content could not be retrieved from the cache. Please return to the search results page and click the link again to reload the content.",
+        }
+
+    with stage("render"):
+        return render_template(
+            "article.html",
+            article=article_data,
+            original_query=original_query,
+            # Stable per article, so every worker shows the same mock citation count
+            citation_count=10 + zlib.crc32(slug.encode("utf-8")) % 41
+        ), status
+
+
+# -------------------------------------------------------------------------
+# Response Compression
+# -------------------------------------------------------------------------
+
+def record_precompressed_request(path, method, status, seconds):
+    """
+    Precompressed pages are answered by the middleware without entering Flask, so they are
+    recorded here under their endpoint, as record_request_metrics() would have.
+    """
+    if METRICS_ENABLED:
+        endpoint = PRECOMPRESSED_ENDPOINTS.get(path, "unmatched")
+        REQUEST_SECONDS.observe(seconds, endpoint, method, status.split(" ", 1)[0])
+
+
+PRECOMPRESSED_ENDPOINTS = {path: app.url_map.bind("localhost").match(path)[0] for path in PRECOMPRESSED_PAGES}
+
+if COMPRESSION_ENABLED:
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, min_size=COMPRESS_MIN_SIZE, level=COMPRESS_LEVEL,
+                                         on_precompressed=record_precompressed_request)
+    for path in PRECOMPRESSED_PAGES:
+        if not app.wsgi_app.precompress(path):
+            print(f"Warning: {path} could not be precompressed; it will be compressed per request.")
 
 
 # -------------------------------------------------------------------------
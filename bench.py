@@ -0,0 +1,258 @@
+"""
+Micro-benchmarks for the MindWork hot paths.
+
+Run from the project root, for example:
+    python bench.py templates --number 500
+"""
+import argparse
+import heapq
+import threading
+import time
+import timeit
+from concurrent.futures import wait
+
+from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+from flask import render_template, render_template_string
+
+import app as mindwork
+from facets import FacetIndex, add_record, bitmap_from_flags, bitmap_positions, filter_predicates, matches
+from fake_genai import FakeClient
+from fragment_cache import FragmentCache
+from ranking import make_scorer
+
+
+# -------------------------------------------------------------------------
+# Helpers
+# -------------------------------------------------------------------------
+
+def report(label, seconds, number):
+    """Prints the per-call cost of a timed loop in microseconds."""
+    print(f"  {label:<36} {seconds / number * 1e6:10.1f} us/call")
+
+
+def best_of(func, number, repeat):
+    """Returns the fastest total time of `repeat` runs of `number` calls."""
+    return min(timeit.repeat(func, number=number, repeat=repeat))
+
+
+# -------------------------------------------------------------------------
+# Benchmarks
+# -------------------------------------------------------------------------
+
+def bench_templates(number, repeat):
+    """
+    Compares the old render path (parse the template string on every request)
+    with the template registry (execute the template compiled at startup).
+    """
+    query = "machine learning"
+    results = list(mindwork.generate_general_results(query, 0, 100))
+
+    pages = [
+        ("home", "/", mindwork.MINDWORK_HOMEPAGE_HTML, "home.html", {}),
+        ("search", f"/search?query={query}", mindwork.SEARCH_RESULTS_HTML, "search.html",
+         {"query": query, "results": results, "featured": None, "gemini_active": False, "stream": False,
+          "page": 1, "per_page": 100, "total": mindwork.MOCK_RESULT_TOTAL, "page_count": 2}),
+    ]
+
+    print(f"Template render cost (best of {repeat} x {number} calls)")
+    for label, path, raw_html, name, context in pages:
+        with mindwork.app.test_request_context(path):
+            def old_path():
+                return render_template_string(raw_html.replace("</body>", f"{mindwork.BASE_FOOTER_HTML}</body>"), **context)
+
+            def new_path():
+                return render_template(name, **context)
+
+            old = best_of(old_path, number, repeat)
+            new = best_of(new_path, number, repeat)
+            report(f"{label}: render_template_string", old, number)
+            report(f"{label}: precompiled registry", new, number)
+            print(f"  {label}: speedup {old / new:.1f}x")
+
+
+def bench_ranking(number, repeat):
+    """
+    Cost of picking a ranked page of 10 out of 10^3-10^5 candidates: scoring every
+    candidate, then heap selection of the top 10 versus a full sort of the scores.
+    """
+    query = "machine learning"
+    print(f"Ranking cost for the first page of 10 (best of {repeat} x {number} calls)")
+    for size in (1_000, 10_000, 100_000):
+        candidates = [mindwork.generate_general_result(query, index % 105) for index in range(size)]
+        score = make_scorer(query)
+        scored = [(score(result), position) for position, result in enumerate(candidates)]
+        print(f"  {size} candidates")
+
+        def score_all():
+            return [score(result) for result in candidates]
+
+        def heap_select():
+            return heapq.nlargest(10, scored)
+
+        def full_sort():
+            return sorted(scored, reverse=True)[:10]
+
+        report("score every candidate", best_of(score_all, number, repeat), number)
+        report("heap select top 10", best_of(heap_select, number, repeat), number)
+        report("full sort, take 10", best_of(full_sort, number, repeat), number)
+
+
+def bench_facets(number, repeat):
+    """
+    Facet filtering and counting over 10^3-10^5 candidates: with the bitmap index versus
+    testing and counting every candidate record. Half of the records are candidates (as
+    if matched by a query), and three of the four facets are filtered.
+    """
+    query = "machine learning"
+    filters = {"year": (2018, 2022), "tier": ("specialist", "web"), "subject": ("Cooking", "History", "Gaming")}
+    predicates = filter_predicates(filters)
+    print(f"Facet filter + counts (best of {repeat} x {number} calls)")
+    for size in (1_000, 10_000, 100_000):
+        records = [mindwork.generate_general_result(query, index % 105, index // 105) for index in range(size)]
+        started = time.perf_counter()
+        index = FacetIndex.from_records(records)
+        built = time.perf_counter() - started
+        positions = range(0, size, 2)
+        print(f"  {size} records (index built in {built * 1000:.1f} ms)")
+
+        # As SearchIndex.score(): one byte marked per scored document, packed once per query
+        flags = bytearray((size + 7) & ~7)
+        for position in positions:
+            flags[position] = 1
+        candidates = bitmap_from_flags(flags)
+        scores = {position: float(position % 97) for position in positions}
+
+        def candidate_bitmap():
+            return bitmap_from_flags(flags)
+
+        def with_bitmaps():
+            # As search_index_results(): filter from the facet bitmaps alone, count over the candidates
+            return index.filter(predicates) & candidates, index.counts(predicates, candidates)
+
+        def top_of_filtered():
+            # As SearchIndex.top(): rank only the candidates left by the filters
+            hits = index.filter(predicates) & candidates
+            return heapq.nlargest(10, ((scores[doc], doc) for doc in bitmap_positions(hits, size)))
+
+        def scan_records():
+            counts = {}
+            matching = []
+            for position in positions:
+                record = records[position]
+                add_record(counts, record, predicates)
+                if matches(record, predicates):
+                    matching.append(position)
+            return matching, counts
+
+        assert sum(with_bitmaps()[1]["year"].values()) == sum(scan_records()[1]["year"].values())
+        report("candidate bitmap (once per query)", best_of(candidate_bitmap, number, repeat), number)
+        report("bitmap filter + counts", best_of(with_bitmaps, number, repeat), number)
+        report("top 10 of the filtered candidates", best_of(top_of_filtered, number, repeat), number)
+        report("scan every record", best_of(scan_records, max(1, number // 10), repeat), max(1, number // 10))
+
+
+def bench_fragments(number, repeat):
+    """
+    Search page render cost with every card rendered (no fragment cache) vs assembled from
+    cached card fragments, at 10 and 100 results per page, plus the cache's hit/miss counts.
+    """
+    cache = mindwork.FRAGMENT_CACHE or FragmentCache()
+    query = "machine learning"
+    print(f"Search page render cost (best of {repeat} x {number} calls)")
+    for per_page in (10, 100):
+        results = list(mindwork.generate_general_results(query, 0, per_page))
+        context = {"query": query, "results": results, "featured": None, "gemini_active": False, "stream": False,
+                   "page": 1, "per_page": per_page, "total": mindwork.MOCK_RESULT_TOTAL, "page_count": 2}
+        with mindwork.app.test_request_context(f"/search?query={query}&per_page={per_page}"):
+            mindwork.FRAGMENT_CACHE = None
+            uncached = best_of(lambda: render_template("search.html", **context), number, repeat)
+            mindwork.FRAGMENT_CACHE = cache
+            cached = best_of(lambda: render_template("search.html", **context), number, repeat)
+        report(f"{per_page} cards: every card rendered", uncached, number)
+        report(f"{per_page} cards: cached fragments", cached, number)
+        print(f"  {per_page} cards: speedup {uncached / cached:.1f}x")
+    print(f"Fragment cache: {cache.stats}")
+
+
+def fetch(wsgi_app, path, accept_encoding=None):
+    """Runs one GET through a WSGI app and returns (response headers, body bytes)."""
+    headers = {"Accept-Encoding": accept_encoding} if accept_encoding else {}
+    environ = EnvironBuilder(path=path, headers=headers).get_environ()
+    app_iter, _status, response_headers = run_wsgi_app(wsgi_app, environ, buffered=True)
+    return response_headers, b"".join(app_iter)
+
+
+def bench_wire(number, repeat):
+    """
+    Bytes on the wire per route: the app's raw output, after HTML minification, and compressed
+    with each encoding the middleware can produce, plus what the compression layer costs per request.
+    """
+    middleware = mindwork.app.wsgi_app
+    if not hasattr(middleware, "precompress"):
+        print("Compression is disabled (COMPRESSION_ENABLED=0); nothing to measure.")
+        return
+    raw_app = middleware.app
+    routes = ["/", "/login", "/register", "/search?query=machine+learning",
+              "/search?query=machine+learning&per_page=100", "/api/search?query=machine+learning&per_page=100",
+              "/static/" + mindwork.ASSET_MANIFEST.get("app.css", "")]
+
+    encodings = middleware.encodings
+    print(f"{'route':<50} {'raw':>8} {'minified':>9} " + " ".join(f"{e:>8}" for e in encodings) + "  saved")
+    for path in routes:
+        _headers, raw = fetch(raw_app, path)
+        _headers, minified = fetch(middleware, path)
+        sizes = [len(fetch(middleware, path, encoding)[1]) for encoding in encodings]
+        print(f"{path[:50]:<50} {len(raw):>8} {len(minified):>9} " + " ".join(f"{size:>8}" for size in sizes)
+              + f"  {1 - min(sizes) / len(raw):6.1%}")
+
+    print(f"Per-request cost (best of {repeat} x {number} calls)")
+    for path in ("/", "/search?query=machine+learning&per_page=100"):
+        report(f"{path[:24]} uncompressed app", best_of(lambda: fetch(raw_app, path), number, repeat), number)
+        report(f"{path[:24]} via middleware, gzip", best_of(lambda: fetch(middleware, path, "gzip"), number, repeat), number)
+
+
+def bench_gemini_io(number, repeat):
+    """
+    Burst of concurrent searches with cold queries against a fake Gemini client (500 ms per
+    call): how many get their featured result within the deadline, and with how many threads,
+    in sync mode (Gemini thread pool) vs async mode (one event loop). `number` is ignored.
+    """
+    mindwork.client = FakeClient(latency_ms=500, jitter_ms=0)
+    mindwork.GEMINI_CLIENT_READY = True
+    modes = {
+        "sync (thread pool)": lambda query: mindwork.GEMINI_EXECUTOR.submit(mindwork.GEMINI_CACHE.get, query),
+        "async (event loop)": lambda query: mindwork.GEMINI_LOOP.submit(mindwork.GEMINI_CACHE.get_async(query)),
+    }
+    deadline = mindwork.GEMINI_DEADLINE_MS / 1000
+    print(f"{'mode':<20} {'in flight':>9} {'featured in deadline':>21} {'all done (s)':>13} {'threads':>8}")
+    for burst in (50, 200, 500):
+        for label, start in modes.items():
+            run = f"{time.time():.6f}"
+            started = time.perf_counter()
+            futures = [start(f"bench {label} {run} {index}") for index in range(burst)]
+            done, _pending = wait(futures, timeout=deadline)
+            threads = threading.active_count()
+            wait(futures)
+            elapsed = time.perf_counter() - started
+            print(f"{label:<20} {burst:>9} {len(done) / burst:>21.0%} {elapsed:>13.2f} {threads:>8}")
+
+
+BENCHMARKS = {
+    "templates": bench_templates,
+    "ranking": bench_ranking,
+    "facets": bench_facets,
+    "fragments": bench_fragments,
+    "wire": bench_wire,
+    "gemini_io": bench_gemini_io,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run MindWork micro-benchmarks.")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS), help="Benchmark to run.")
+    parser.add_argument("--number", type=int, default=200, help="Calls per timing run.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs; the best one is reported.")
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](args.number, args.repeat)
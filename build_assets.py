@@ -0,0 +1,336 @@
+"""
+Builds MindWork's stylesheet offline, replacing the Tailwind CDN script.
+
+The page templates are scanned for class names, and CSS is generated only for the
+utilities actually used (a small, dependency-free subset of Tailwind v3 plus the
+theme's custom colors). The result is written with a content hash in its name,
+e.g. static/dist/app.3f2a9c1e.css, and recorded in static/dist/manifest.json so
+the app can link it and serve it with immutable far-future cache headers.
+
+    python build_assets.py            # build, warn about unsupported classes
+    python build_assets.py --strict   # fail on unsupported classes
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+
+# -------------------------------------------------------------------------
+# Theme (Tailwind v3 defaults plus the colors from the old inline tailwind.config)
+# -------------------------------------------------------------------------
+
+COLORS = {
+    "white": "#fff",
+    "black": "#000",
+    "transparent": "transparent",
+    "primary-blue": "#1f4e79",
+    "secondary-gray": "#f3f4f6",
+    "accent-gold": "#d9a400",
+    "gray-50": "#f9fafb", "gray-100": "#f3f4f6", "gray-200": "#e5e7eb", "gray-300": "#d1d5db",
+    "gray-400": "#9ca3af", "gray-500": "#6b7280", "gray-600": "#4b5563", "gray-700": "#374151",
+    "gray-800": "#1f2937", "gray-900": "#111827",
+    "blue-50": "#eff6ff", "blue-100": "#dbeafe", "blue-200": "#bfdbfe", "blue-300": "#93c5fd",
+    "blue-400": "#60a5fa", "blue-500": "#3b82f6", "blue-600": "#2563eb", "blue-700": "#1d4ed8",
+    "blue-800": "#1e40af", "blue-900": "#1e3a8a",
+}
+
+FONT_SIZES = {
+    "xs": ("0.75rem", "1rem"), "sm": ("0.875rem", "1.25rem"), "base": ("1rem", "1.5rem"),
+    "lg": ("1.125rem", "1.75rem"), "xl": ("1.25rem", "1.75rem"), "2xl": ("1.5rem", "2rem"),
+    "3xl": ("1.875rem", "2.25rem"), "4xl": ("2.25rem", "2.5rem"), "5xl": ("3rem", "1"),
+    "6xl": ("3.75rem", "1"), "7xl": ("4.5rem", "1"),
+}
+FONT_WEIGHTS = {"normal": "400", "medium": "500", "semibold": "600", "bold": "700", "extrabold": "800"}
+LINE_HEIGHTS = {"none": "1", "tight": "1.25", "snug": "1.375", "normal": "1.5", "relaxed": "1.625", "loose": "2"}
+TRACKING = {"tight": "-0.025em", "normal": "0em", "wide": "0.025em"}
+MAX_WIDTHS = {
+    "none": "none", "xs": "20rem", "sm": "24rem", "md": "28rem", "lg": "32rem", "xl": "36rem",
+    "2xl": "42rem", "3xl": "48rem", "4xl": "56rem", "5xl": "64rem", "6xl": "72rem", "7xl": "80rem",
+    "full": "100%",
+}
+RADII = {"none": "0px", "sm": "0.125rem", "": "0.25rem", "md": "0.375rem", "lg": "0.5rem", "xl": "0.75rem", "2xl": "1rem", "full": "9999px"}
+SHADOWS = {
+    "sm": "0 1px 2px 0 rgb(0 0 0 / 0.05)",
+    "": "0 1px 3px 0 rgb(0 0 0 / 0.1), 0 1px 2px -1px rgb(0 0 0 / 0.1)",
+    "md": "0 4px 6px -1px rgb(0 0 0 / 0.1), 0 2px 4px -2px rgb(0 0 0 / 0.1)",
+    "lg": "0 10px 15px -3px rgb(0 0 0 / 0.1), 0 4px 6px -4px rgb(0 0 0 / 0.1)",
+    "xl": "0 20px 25px -5px rgb(0 0 0 / 0.1), 0 8px 10px -6px rgb(0 0 0 / 0.1)",
+    "2xl": "0 25px 50px -12px rgb(0 0 0 / 0.25)",
+}
+SCREENS = {"sm": "640px", "md": "768px", "lg": "1024px", "xl": "1280px"}
+EASINGS = {"linear": "linear", "in": "cubic-bezier(0.4, 0, 1, 1)", "out": "cubic-bezier(0, 0, 0.2, 1)", "in-out": "cubic-bezier(0.4, 0, 0.2, 1)"}
+
+SPACING_PATTERN = r"(px|\d+(?:\.5)?)"
+SIDES = {"": ("",), "x": ("-left", "-right"), "y": ("-top", "-bottom"), "t": ("-top",), "r": ("-right",), "b": ("-bottom",), "l": ("-left",)}
+SIBLINGS = " > :not([hidden]) ~ :not([hidden])"
+
+
+def spacing(value, negative=False):
+    """Tailwind spacing scale: 1 unit = 0.25rem."""
+    if value == "px":
+        size = "1px"
+    elif value == "0":
+        size = "0px"
+    else:
+        size = f"{float(value) / 4:g}rem"
+    return f"-{size}" if negative and size != "0px" else size
+
+
+def ring_shadow(width):
+    return [
+        ("--tw-ring-offset-shadow", "var(--tw-ring-inset) 0 0 0 var(--tw-ring-offset-width) var(--tw-ring-offset-color)"),
+        ("--tw-ring-shadow", f"var(--tw-ring-inset) 0 0 0 calc({width} + var(--tw-ring-offset-width)) var(--tw-ring-color)"),
+        ("box-shadow", "var(--tw-ring-offset-shadow), var(--tw-ring-shadow), var(--tw-shadow, 0 0 #0000)"),
+    ]
+
+
+def color_value(name, opacity_var=None):
+    value = COLORS[name]
+    if opacity_var and value.startswith("#"):
+        hex_value = value.lstrip("#")
+        if len(hex_value) == 3:
+            hex_value = "".join(c * 2 for c in hex_value)
+        r, g, b = (int(hex_value[i:i + 2], 16) for i in (0, 2, 4))
+        return f"rgb({r} {g} {b} / var({opacity_var}, 1))"
+    return value
+
+
+# -------------------------------------------------------------------------
+# Utilities
+# -------------------------------------------------------------------------
+# Each rule maps a class-name pattern to [(selector suffix, [(property, value)])].
+# Rules are emitted in this order, so later families override earlier ones as in Tailwind
+# (e.g. `rounded-none rounded-t-md`, `p-6 pt-4`).
+
+def _static(declarations):
+    return lambda match: [("", declarations)]
+
+
+UTILITIES = [
+    (r"sr-only", _static([("position", "absolute"), ("width", "1px"), ("height", "1px"), ("padding", "0"), ("margin", "-1px"),
+                          ("overflow", "hidden"), ("clip", "rect(0, 0, 0, 0)"), ("white-space", "nowrap"), ("border-width", "0")])),
+    (r"(static|fixed|absolute|relative|sticky)", lambda m: [("", [("position", m[1])])]),
+    (r"(top|right|bottom|left)-(0|auto)", lambda m: [("", [(m[1], "0px" if m[2] == "0" else "auto")])]),
+    (r"z-(\d+)", lambda m: [("", [("z-index", m[1])])]),
+    (r"order-(first|last|none)", lambda m: [("", [("order", {"first": "-9999", "last": "9999", "none": "0"}[m[1]])])]),
+    (r"(-?)m([xytrbl]?)-(auto|" + SPACING_PATTERN[1:-1] + ")",
+     lambda m: [("", [(f"margin{side}", "auto" if m[3] == "auto" else spacing(m[3], m[1] == "-")) for side in SIDES[m[2]]])]),
+    (r"(block|inline-block|inline|flex|inline-flex|grid|hidden)",
+     lambda m: [("", [("display", "none" if m[1] == "hidden" else m[1])])]),
+    (r"h-(full|screen|" + SPACING_PATTERN[1:-1] + ")",
+     lambda m: [("", [("height", {"full": "100%", "screen": "100vh"}.get(m[1]) or spacing(m[1]))])]),
+    (r"max-h-(full|screen|" + SPACING_PATTERN[1:-1] + ")",
+     lambda m: [("", [("max-height", {"full": "100%", "screen": "100vh"}.get(m[1]) or spacing(m[1]))])]),
+    (r"min-h-(full|screen|0)", lambda m: [("", [("min-height", {"full": "100%", "screen": "100vh", "0": "0px"}[m[1]])])]),
+    (r"w-(full|screen|auto|" + SPACING_PATTERN[1:-1] + ")",
+     lambda m: [("", [("width", {"full": "100%", "screen": "100vw", "auto": "auto"}.get(m[1]) or spacing(m[1]))])]),
+    (r"max-w-(" + "|".join(MAX_WIDTHS) + ")", lambda m: [("", [("max-width", MAX_WIDTHS[m[1]])])]),
+    (r"flex-1", _static([("flex", "1 1 0%")])),
+    (r"origin-(center|top-left|top|top-right)", lambda m: [("", [("transform-origin", m[1].replace("-", " "))])]),
+    (r"transform", _static([("transform", "var(--tw-transform, none)")])),
+    (r"rotate-(\d+)", lambda m: [("", [("--tw-transform", f"rotate({m[1]}deg)"), ("transform", "rotate(" + m[1] + "deg)")])]),
+    (r"appearance-none", _static([("appearance", "none")])),
+    (r"grid-cols-(\d+)", lambda m: [("", [("grid-template-columns", f"repeat({m[1]}, minmax(0, 1fr))")])]),
+    (r"flex-(row|col|row-reverse|col-reverse)", lambda m: [("", [("flex-direction", m[1].replace("col", "column"))])]),
+    (r"flex-(wrap|nowrap)", lambda m: [("", [("flex-wrap", m[1])])]),
+    (r"items-(start|end|center|baseline|stretch)",
+     lambda m: [("", [("align-items", {"start": "flex-start", "end": "flex-end"}.get(m[1], m[1]))])]),
+    (r"justify-(start|end|center|between|around)",
+     lambda m: [("", [("justify-content", {"start": "flex-start", "end": "flex-end", "between": "space-between", "around": "space-around"}.get(m[1], m[1]))])]),
+    (r"gap-" + SPACING_PATTERN, lambda m: [("", [("gap", spacing(m[1]))])]),
+    (r"gap-x-" + SPACING_PATTERN, lambda m: [("", [("column-gap", spacing(m[1]))])]),
+    (r"gap-y-" + SPACING_PATTERN, lambda m: [("", [("row-gap", spacing(m[1]))])]),
+    (r"(-?)space-x-" + SPACING_PATTERN,
+     lambda m: [(SIBLINGS, [("margin-right", "0px"), ("margin-left", spacing(m[2], m[1] == "-"))])]),
+    (r"(-?)space-y-" + SPACING_PATTERN,
+     lambda m: [(SIBLINGS, [("margin-top", spacing(m[2], m[1] == "-")), ("margin-bottom", "0px")])]),
+    (r"divide-y(?:-(\d+))?",
+     lambda m: [(SIBLINGS, [("border-top-width", f"{m[1] or 1}px"), ("border-bottom-width", "0px")])]),
+    (r"divide-(" + "|".join(COLORS) + ")", lambda m: [(SIBLINGS, [("border-color", COLORS[m[1]])])]),
+    (r"overflow-(hidden|auto|scroll|visible)", lambda m: [("", [("overflow", m[1])])]),
+    (r"whitespace-(nowrap|normal|pre|pre-wrap)", lambda m: [("", [("white-space", m[1])])]),
+    (r"rounded(?:-(none|sm|md|lg|xl|2xl|full))?", lambda m: [("", [("border-radius", RADII[m[1] or ""])])]),
+    (r"rounded-(t|b|l|r)(?:-(none|sm|md|lg|xl|2xl|full))?",
+     lambda m: [("", [(f"border-{corner}-radius", RADII[m[2] or ""]) for corner in {
+         "t": ("top-left", "top-right"), "b": ("bottom-right", "bottom-left"),
+         "l": ("top-left", "bottom-left"), "r": ("top-right", "bottom-right")}[m[1]]])]),
+    (r"border(?:-(\d+))?", lambda m: [("", [("border-width", f"{m[1] or 1}px")])]),
+    (r"border-([trbl])(?:-(\d+))?",
+     lambda m: [("", [(f"border-{ {'t': 'top', 'r': 'right', 'b': 'bottom', 'l': 'left'}[m[1]] }-width", f"{m[2] or 1}px")])]),
+    (r"border-(" + "|".join(COLORS) + ")", lambda m: [("", [("border-color", COLORS[m[1]])])]),
+    (r"bg-(" + "|".join(COLORS) + ")", lambda m: [("", [("background-color", COLORS[m[1]])])]),
+    (r"p([xytrbl]?)-" + SPACING_PATTERN,
+     lambda m: [("", [(f"padding{side}", spacing(m[2])) for side in SIDES[m[1]]])]),
+    (r"text-(left|center|right)", lambda m: [("", [("text-align", m[1])])]),
+    (r"text-(" + "|".join(FONT_SIZES) + ")",
+     lambda m: [("", [("font-size", FONT_SIZES[m[1]][0]), ("line-height", FONT_SIZES[m[1]][1])])]),
+    (r"font-(" + "|".join(FONT_WEIGHTS) + ")", lambda m: [("", [("font-weight", FONT_WEIGHTS[m[1]])])]),
+    (r"uppercase", _static([("text-transform", "uppercase")])),
+    (r"leading-(\d+)", lambda m: [("", [("line-height", spacing(m[1]))])]),
+    (r"leading-(" + "|".join(LINE_HEIGHTS) + ")", lambda m: [("", [("line-height", LINE_HEIGHTS[m[1]])])]),
+    (r"tracking-(" + "|".join(TRACKING) + ")", lambda m: [("", [("letter-spacing", TRACKING[m[1]])])]),
+    (r"text-(" + "|".join(COLORS) + ")", lambda m: [("", [("color", COLORS[m[1]])])]),
+    (r"underline", _static([("text-decoration-line", "underline")])),
+    (r"antialiased", _static([("-webkit-font-smoothing", "antialiased"), ("-moz-osx-font-smoothing", "grayscale")])),
+    (r"placeholder-(" + "|".join(COLORS) + ")", lambda m: [("::placeholder", [("color", COLORS[m[1]])])]),
+    (r"opacity-(\d+)", lambda m: [("", [("opacity", f"{int(m[1]) / 100:g}")])]),
+    (r"shadow(?:-(sm|md|lg|xl|2xl))?",
+     lambda m: [("", [("--tw-shadow", SHADOWS[m[1] or ""]),
+                      ("box-shadow", "var(--tw-ring-offset-shadow, 0 0 #0000), var(--tw-ring-shadow, 0 0 #0000), var(--tw-shadow)")])]),
+    (r"outline-none", _static([("outline", "2px solid transparent"), ("outline-offset", "2px")])),
+    (r"ring(?:-(\d+))?", lambda m: [("", ring_shadow(f"{m[1] or 3}px"))]),
+    (r"ring-inset", _static([("--tw-ring-inset", "inset")])),
+    (r"ring-(" + "|".join(COLORS) + ")",
+     lambda m: [("", [("--tw-ring-color", color_value(m[1], "--tw-ring-opacity"))])]),
+    (r"ring-opacity-(\d+)", lambda m: [("", [("--tw-ring-opacity", f"{int(m[1]) / 100:g}")])]),
+    (r"ring-offset-(\d+)", lambda m: [("", [("--tw-ring-offset-width", f"{m[1]}px")])]),
+    (r"transition", _static([
+        ("transition-property", "color, background-color, border-color, text-decoration-color, fill, stroke, opacity, box-shadow, transform, filter, backdrop-filter"),
+        ("transition-timing-function", EASINGS["in-out"]), ("transition-duration", "150ms")])),
+    (r"transition-all", _static([("transition-property", "all"), ("transition-timing-function", EASINGS["in-out"]), ("transition-duration", "150ms")])),
+    (r"duration-(\d+)", lambda m: [("", [("transition-duration", f"{m[1]}ms")])]),
+    (r"ease-(linear|in|out|in-out)", lambda m: [("", [("transition-timing-function", EASINGS[m[1]])])]),
+]
+UTILITIES = [(re.compile(pattern + r"$"), handler) for pattern, handler in UTILITIES]
+
+VARIANT_PSEUDO = {"hover": ":hover", "focus": ":focus"}
+
+# Classes that are hooks for page scripts, icons or the inline <style> block, not utilities.
+# (`prose` is the typography plugin, which the CDN build never loaded either.)
+NON_UTILITY_CLASSES = {"group", "prose", "hero-background-pattern"}
+NON_UTILITY_PREFIXES = ("lucide",)
+
+# Condensed Tailwind preflight, plus the theme font and the ring/shadow variable defaults.
+BASE_CSS = """
+*,::before,::after{box-sizing:border-box;border-width:0;border-style:solid;border-color:#e5e7eb;--tw-ring-inset: ;--tw-ring-offset-width:0px;--tw-ring-offset-color:#fff;--tw-ring-color:rgb(59 130 246 / 0.5);--tw-ring-offset-shadow:0 0 #0000;--tw-ring-shadow:0 0 #0000;--tw-shadow:0 0 #0000}
+html{line-height:1.5;-webkit-text-size-adjust:100%;tab-size:4;font-family:Inter,sans-serif}
+body{margin:0;line-height:inherit}
+hr{height:0;color:inherit;border-top-width:1px}
+h1,h2,h3,h4,h5,h6{font-size:inherit;font-weight:inherit}
+a{color:inherit;text-decoration:inherit}
+b,strong{font-weight:bolder}
+button,input,optgroup,select,textarea{font-family:inherit;font-size:100%;font-weight:inherit;line-height:inherit;color:inherit;margin:0;padding:0}
+button,select{text-transform:none}
+button,[type='button'],[type='reset'],[type='submit']{-webkit-appearance:button;background-color:transparent;background-image:none}
+blockquote,dl,dd,h1,h2,h3,h4,h5,h6,hr,figure,p,pre{margin:0}
+ol,ul{list-style:none;margin:0;padding:0}
+input::placeholder,textarea::placeholder{opacity:1;color:#9ca3af}
+button,[role="button"]{cursor:pointer}
+img,svg,video,canvas,audio,iframe,embed,object{display:block;vertical-align:middle}
+img,video{max-width:100%;height:auto}
+[hidden]{display:none}
+"""
+
+
+# -------------------------------------------------------------------------
+# Build
+# -------------------------------------------------------------------------
+
+def escape_class(name):
+    return re.sub(r"([:/.\[\]])", r"\\\1", name)
+
+
+def generate_rule(class_name):
+    """Returns (rule order, media query or None, CSS rule text) for a class name, or None if unsupported."""
+    *variants, utility = class_name.split(":")
+    media, pseudo = None, ""
+    for variant in variants:
+        if variant in SCREENS and media is None:
+            media = variant
+        elif variant in VARIANT_PSEUDO:
+            pseudo += VARIANT_PSEUDO[variant]
+        else:
+            return None
+    for order, (pattern, handler) in enumerate(UTILITIES):
+        match = pattern.match(utility)
+        if match:
+            rules = []
+            for suffix, declarations in handler(match):
+                body = ";".join(f"{prop}:{value}" for prop, value in declarations)
+                rules.append(f".{escape_class(class_name)}{pseudo}{suffix}{{{body}}}")
+            return order, media, "".join(rules)
+    return None
+
+
+def extract_class_names(sources):
+    """
+    Candidate class names: every word in a class attribute, plus every quoted string
+    token elsewhere (class names passed through Jinja macros or JS classList calls).
+    Returns (candidates, names found in class attributes).
+    """
+    in_attributes = set()
+    candidates = set()
+    for source in sources:
+        for value in re.findall(r'class="([^"]*)"', source):
+            # Keep the literal class names inside {% if %}...{% endif %} branches
+            in_attributes.update(re.sub(r"\{[{%].*?[%}]\}", " ", value).split())
+        for quoted in re.findall(r"'([^'\n]*)'", source):
+            candidates.update(quoted.split())
+    candidates |= in_attributes
+    return candidates, in_attributes
+
+
+def build_css(class_names):
+    """Generates the stylesheet for a set of class names. Returns (css, unsupported class names)."""
+    base, responsive, unsupported = [], {screen: [] for screen in SCREENS}, []
+    for name in class_names:
+        rule = generate_rule(name)
+        if rule is None:
+            unsupported.append(name)
+            continue
+        order, media, text = rule
+        # Hover/focus rules sort after plain ones of the same family so they win
+        (responsive[media] if media else base).append((order, ":" in name, name, text))
+    parts = [re.sub(r"\n", "", BASE_CSS)]
+    parts.extend(text for *_key, text in sorted(base))
+    for screen, rules in responsive.items():
+        if rules:
+            parts.append(f"@media (min-width:{SCREENS[screen]}){{" + "".join(text for *_key, text in sorted(rules)) + "}")
+    return "".join(parts), sorted(unsupported)
+
+
+def build(sources, strict=False):
+    """Writes the hashed stylesheet and the manifest. Returns the manifest."""
+    candidates, in_attributes = extract_class_names(sources)
+    css, unsupported = build_css(candidates)
+    # Only names used as classes count as unsupported; other quoted strings are just text
+    unsupported = [name for name in unsupported if name in in_attributes
+                   and name not in NON_UTILITY_CLASSES and not name.startswith(NON_UTILITY_PREFIXES)]
+    if unsupported:
+        print(f"Warning: no CSS generated for {len(unsupported)} classes: {' '.join(unsupported)}")
+        if strict:
+            sys.exit(1)
+
+    digest = hashlib.sha256(css.encode("utf-8")).hexdigest()[:10]
+    filename = f"app.{digest}.css"
+    os.makedirs(DIST_DIR, exist_ok=True)
+    for stale in glob.glob(os.path.join(DIST_DIR, "app.*.css")):
+        if os.path.basename(stale) != filename:
+            os.remove(stale)
+    with open(os.path.join(DIST_DIR, filename), "w", encoding="utf-8") as f:
+        f.write(css)
+
+    manifest = {"app.css": f"dist/{filename}"}
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    print(f"Wrote static/dist/{filename} ({len(css)} bytes, {len(candidates) - len(unsupported)} class candidates).")
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the MindWork stylesheet from the page templates.")
+    parser.add_argument("--strict", action="store_true", help="Fail if a class has no generated CSS.")
+    args = parser.parse_args()
+
+    # Page templates are defined in app.py
+    import app as mindwork
+    build(mindwork.PAGE_TEMPLATES.values(), strict=args.strict)
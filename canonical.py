@@ -0,0 +1,237 @@
+"""
+Query canonicalization, so that variants of one query share a cache entry.
+
+canonical_form() undoes differences in how a query is written: Unicode NFKC (full-width
+letters, ligatures, ...), case folding, punctuation dropped and whitespace collapsed.
+canonical_key() also drops stopwords, so "What is machine learning?" and "Machine
+Learning" get the same key. QueryCanonicalizer can also map a new key that is nearly
+identical to one it has already seen ("introduction quantum computings") onto that key:
+MinHash signatures bucketed by locality-sensitive hashing find the candidates quickly, and
+the exact Jaccard similarity of their character trigrams decides. That is opt-in, since one
+character can change what a query means: keys whose numbers or single letters differ
+("world war 1" and "world war 2", "vitamin b" and "vitamin d") are never merged.
+
+Replay a search log (one query per line, as SearchLog writes it) to see what each step
+does to the cache hit rate; without --log a synthetic log of typical variants is used:
+
+    python canonical.py --log /var/lib/mindwork/searches.log
+"""
+import argparse
+import random
+import re
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+
+# Punctuation separates words. "+" and "#" are kept, so "c++" and "c#" stay apart from "c".
+PUNCTUATION = re.compile(r"[^\w\s+#]|_")
+STOPWORDS = frozenset("""
+    a about an and are as at be by can do does for from how i in is it me of on or
+    the to was what when where which who why with
+""".split())
+
+SHINGLE_SIZE = 3
+# Near-duplicate matching is off unless a threshold is given; this one is the suggested setting
+NEAR_DUPLICATE_THRESHOLD = 0.9
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def canonical_form(query):
+    """NFKC-normalized, case-folded, punctuation dropped, single-spaced."""
+    text = unicodedata.normalize("NFKC", query).casefold()
+    return " ".join(PUNCTUATION.sub(" ", text).split())
+
+
+def canonical_key(query):
+    """canonical_form() without stopwords (kept when the query is nothing but stopwords, e.g. "the who")."""
+    words = canonical_form(query).split()
+    return " ".join([word for word in words if word not in STOPWORDS] or words)
+
+
+def shingles(key):
+    """The set of character trigrams of a key, padded so single short words still have some."""
+    padded = f" {key} "
+    return {padded[index:index + SHINGLE_SIZE] for index in range(max(1, len(padded) - SHINGLE_SIZE + 1))}
+
+
+def distinguishing_tokens(key):
+    """
+    The words of a key that one changed character gives a different meaning: words with a
+    digit ("2", "win11", "b12") and single letters, "+" and "#" aside ("b", "c", "c#").
+    Near-duplicates must have the same ones.
+    """
+    return frozenset(word for word in key.split()
+                     if len(word.strip("+#")) <= 1 or any(char.isdigit() for char in word))
+
+
+def jaccard(first, second):
+    return len(first & second) / len(first | second) if first or second else 1.0
+
+
+class MinHasher:
+    """`num_perm` seeded hash functions; a signature holds each one's minimum over a set."""
+
+    def __init__(self, num_perm=32, seed=1):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(MERSENNE_PRIME)) for _ in range(num_perm)]
+
+    def signature(self, items):
+        hashes = [zlib.crc32(item.encode("utf-8")) for item in items]
+        return [min((a * value + b) % MERSENNE_PRIME for value in hashes) for a, b in self.params]
+
+
+class QueryCanonicalizer:
+    """
+    Maps queries to cache keys: canonical_key(), or, when a `threshold` is given (e.g.
+    NEAR_DUPLICATE_THRESHOLD), a key seen before with the same distinguishing_tokens() whose
+    trigram similarity is at least `threshold`. The LSH index splits signatures into `bands`
+    bands of `rows` values: two keys become candidates if any band matches, which finds keys
+    at similarity 0.9 over 99.9% of the time with the defaults. At most `max_keys` keys are
+    remembered (least recent go first).
+    """
+
+    def __init__(self, threshold=None, max_keys=50000, bands=8, rows=4, seed=1):
+        self.threshold = threshold
+        self.max_keys = max_keys
+        self.bands = bands
+        self.rows = rows
+        self.hasher = MinHasher(bands * rows, seed)
+        self.stats = {"new_keys": 0, "near_duplicates": 0}
+        self._resolved = OrderedDict()  # key -> the key it maps to (itself, or a near-duplicate seen earlier)
+        self._indexed = {}  # key -> (trigrams, band hashes), for keys that map to themselves
+        self._buckets = {}  # (band number, band hash) -> set of keys
+        self._lock = threading.Lock()
+
+    def __call__(self, query):
+        """The cache key for a query."""
+        key = canonical_key(query)
+        if self.threshold is None:
+            return key
+        with self._lock:
+            target = self._resolved.get(key)
+            if target is not None:
+                self._resolved.move_to_end(key)
+                return target
+
+        trigrams = shingles(key)
+        tokens = distinguishing_tokens(key)
+        signature = self.hasher.signature(trigrams)
+        bands = [(band, hash(tuple(signature[band * self.rows:(band + 1) * self.rows]))) for band in range(self.bands)]
+        with self._lock:
+            target = self._nearest(trigrams, tokens, bands)
+            if target is None:
+                target = key
+                self._indexed[key] = (trigrams, tokens, bands)
+                for bucket in bands:
+                    self._buckets.setdefault(bucket, set()).add(key)
+                self.stats["new_keys"] += 1
+            else:
+                self.stats["near_duplicates"] += 1
+            self._resolved[key] = target
+            while len(self._resolved) > self.max_keys:
+                self._forget(*self._resolved.popitem(last=False))
+        return target
+
+    def _nearest(self, trigrams, tokens, bands):
+        candidates = set()
+        for bucket in bands:
+            candidates.update(self._buckets.get(bucket, ()))
+        best, best_similarity = None, self.threshold
+        for candidate in candidates:
+            candidate_trigrams, candidate_tokens, _bands = self._indexed[candidate]
+            if candidate_tokens != tokens:
+                continue
+            similarity = jaccard(trigrams, candidate_trigrams)
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        return best
+
+    def _forget(self, key, target):
+        if key != target or key not in self._indexed:
+            return
+        _trigrams, _tokens, bands = self._indexed.pop(key)
+        for bucket in bands:
+            keys = self._buckets.get(bucket)
+            keys.discard(key)
+            if not keys:
+                del self._buckets[bucket]
+
+
+# -------------------------------------------------------------------------
+# Replay
+# -------------------------------------------------------------------------
+
+VARIANTS = (
+    lambda q: q,
+    lambda q: q.title(),
+    lambda q: q.upper(),
+    lambda q: q + "?",
+    lambda q: q.replace(" ", "  "),
+    lambda q: f"what is {q}",
+    lambda q: f"the {q}",
+    lambda q: q + "s",
+    lambda q: q.replace(" ", "-"),
+    lambda q: unicodedata.normalize("NFKC", q).translate({code: code + 0xFEE0 for code in range(0x21, 0x7F)}),
+)
+
+
+def synthetic_log(queries, length=5000, variant_rate=0.4, seed=1):
+    """
+    Searches drawn with Zipf-like popularity; a share of them typed as a variant (case,
+    punctuation, spacing, stopwords, plural, full-width characters).
+    """
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(queries))]
+    log = []
+    for query in rng.choices(queries, weights, k=length):
+        log.append(rng.choice(VARIANTS[1:])(query) if rng.random() < variant_rate else query)
+    return log
+
+
+def replay(log, key_func, cache_size=None):
+    """Hit rate of an LRU cache (unbounded by default) keyed by key_func over the log; returns (hits, distinct keys)."""
+    cache = OrderedDict()
+    hits = 0
+    for query in log:
+        key = key_func(query)
+        if key in cache:
+            hits += 1
+            cache.move_to_end(key)
+        else:
+            cache[key] = True
+            if cache_size is not None and len(cache) > cache_size:
+                cache.popitem(last=False)
+    return hits, len(set(map(key_func, log)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay a search log and compare cache hit rates per keying.")
+    parser.add_argument("--log", help="Search log, one query per line (default: a synthetic log of variants).")
+    parser.add_argument("--threshold", type=float, default=NEAR_DUPLICATE_THRESHOLD, help="Near-duplicate trigram similarity.")
+    parser.add_argument("--cache-size", type=int, help="LRU capacity in entries (default: unbounded).")
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log, encoding="utf-8", errors="replace") as log_file:
+            log = [line.strip() for line in log_file if line.strip()]
+    else:
+        from loadtest import QUERIES
+        log = synthetic_log(QUERIES)
+
+    keyings = [
+        ("exact (strip)", str.strip),
+        ("canonical form", canonical_form),
+        ("+ stopwords", canonical_key),
+        (f"+ near-duplicates >= {args.threshold:g}", QueryCanonicalizer(args.threshold)),
+    ]
+    print(f"Replaying {len(log)} searches" + (f" through an LRU of {args.cache_size}" if args.cache_size else ""))
+    print(f"{'keying':<30} {'keys':>7} {'hits':>7} {'hit rate':>9} {'misses':>7}")
+    baseline_misses = None
+    for label, key_func in keyings:
+        hits, keys = replay(log, key_func, args.cache_size)
+        misses = len(log) - hits
+        baseline_misses = baseline_misses or misses
+        print(f"{label:<30} {keys:>7} {hits:>7} {hits / len(log):>9.1%} {misses:>7}"
+              + (f"  ({1 - misses / baseline_misses:.0%} fewer misses)" if misses != baseline_misses else ""))
@@ -0,0 +1,270 @@
+"""
+Response compression for the MindWork WSGI app.
+
+CompressionMiddleware minifies HTML and gzips (or brotli-compresses, when the
+optional `brotli` package is installed) buffered text responses, according to the
+client's Accept-Encoding. Pages that never change between requests can be rendered
+and compressed once at startup with precompress(), then served straight from memory.
+Streamed responses (no Content-Length) pass through untouched so they keep flushing.
+"""
+import gzip
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+# Headers of the startup render that describe that one response, not the page; never replayed
+PER_REQUEST_HEADERS = ("Content-Length", "ETag", "Date", "Server-Timing")
+
+# Blocks whose whitespace is significant (or is code) are left exactly as written
+PRESERVED_BLOCK = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.IGNORECASE | re.DOTALL)
+HTML_COMMENT = re.compile(r"<!--(?!\[if|\s*flush).*?-->", re.DOTALL)
+# Both start with a literal character, so the regex engine can skip ahead with a fast search
+BLANK_LINES = re.compile(r"\n\n+")
+SPACE_RUN = re.compile(r"  +")
+# Not str.strip(): a literal no-break space is content, not indentation
+INDENTATION = " \t\r\f\v"
+
+
+def minify_html(html):
+    """
+    Strips comments, indentation and blank lines from an HTML document and collapses runs of
+    spaces. Some whitespace always remains wherever there was any, so inline text renders as before.
+    """
+    parts = PRESERVED_BLOCK.split(html)
+    out = []
+    # split() with two groups yields [text, block, tag name, text, block, tag name, ...]
+    for index in range(0, len(parts), 3):
+        text = HTML_COMMENT.sub("", parts[index])
+        text = "\n".join([line.strip(INDENTATION) for line in text.split("\n")])
+        out.append(SPACE_RUN.sub(" ", BLANK_LINES.sub("\n", text)))
+        if index + 1 < len(parts):
+            out.append(parts[index + 1])
+    return "".join(out)
+
+
+def compress(body, encoding, level=6):
+    if encoding == "br":
+        return brotli.compress(body, quality=min(level + 3, 11))
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def available_encodings():
+    """Content-Encodings this process can produce, preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding, encodings):
+    """Picks the first of `encodings` the client accepts (q > 0), or None for identity."""
+    if not accept_encoding:
+        return None
+    accepted = parse_accept_header(accept_encoding)
+    for encoding in encodings:
+        if accepted.quality(encoding) > 0:
+            return encoding
+    return None
+
+
+def encoded_etag(etag, encoding):
+    """A compressed body is a different representation, so it gets its own strong ETag."""
+    if etag.endswith('"') and not etag.startswith("W/"):
+        return f'{etag[:-1]}-{encoding}"'
+    return etag
+
+
+def strip_encoded_etags(if_none_match):
+    """Maps ETags we handed out for compressed bodies back to the app's own ETags."""
+    return re.sub(r'-(?:gzip|br)"', '"', if_none_match)
+
+
+def held_etag(etag, if_none_match, encoding):
+    """
+    The ETag a 304 for the app's `etag` should carry: the one the client sent, which has the
+    encoding suffix when the 200 it holds was compressed (the current encoding's first).
+    """
+    for candidate in (encoding, "gzip", "br"):
+        if candidate is not None and encoded_etag(etag, candidate) in if_none_match:
+            return encoded_etag(etag, candidate)
+    return etag
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware compressing buffered responses of at least `min_size` bytes.
+    Compressed bodies of responses with a strong ETag are kept in a small LRU,
+    so repeat requests for the same content skip recompression.
+    """
+
+    def __init__(self, app, min_size=500, level=6, minify=True, cache_entries=256, on_precompressed=None):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.minify = minify
+        self.encodings = available_encodings()
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()  # (etag, encoding) -> compressed body
+        self._lock = threading.Lock()
+        self.precompressed = {}  # path -> (status, headers, {encoding or None: body}, etag)
+        # Precompressed pages never reach the app; on_precompressed(path, method, status, seconds)
+        # is called for each one served, so the app can still count them
+        self.on_precompressed = on_precompressed
+
+    # -- Startup -----------------------------------------------------------
+
+    def precompress(self, path):
+        """
+        Renders a static page once through the app, minifies it and stores every encoding.
+        Pages that set cookies or don't return 200 are skipped (returns False). The request
+        carries "compression.precompress" in its environ, so the app can tell it from real traffic.
+        """
+        environ = EnvironBuilder(path=path, method="GET", environ_overrides={"compression.precompress": True}).get_environ()
+        app_iter, status, headers = run_wsgi_app(self.app, environ, buffered=True)
+        try:
+            body = b"".join(app_iter)
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+        if not status.startswith("200") or "Set-Cookie" in headers:
+            return False
+
+        if self.minify and headers.get("Content-Type", "").startswith("text/html"):
+            body = minify_html(body.decode("utf-8")).encode("utf-8")
+        bodies = {None: body}
+        for encoding in self.encodings:
+            bodies[encoding] = compress(body, encoding, level=9)
+
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        headers = Headers([(k, v) for k, v in headers if k not in PER_REQUEST_HEADERS])
+        headers.add("Vary", "Accept-Encoding")
+        self.precompressed[path] = (status, headers, bodies, etag)
+        return True
+
+    # -- Request path ------------------------------------------------------
+
+    def __call__(self, environ, start_response):
+        method = environ.get("REQUEST_METHOD")
+        encoding = choose_encoding(environ.get("HTTP_ACCEPT_ENCODING"), self.encodings)
+
+        path = environ.get("PATH_INFO")
+        page = self.precompressed.get(path)
+        if page is not None and method in ("GET", "HEAD") and not environ.get("QUERY_STRING"):
+            started = time.perf_counter()
+            response = self._serve_precompressed(page, encoding, environ, start_response)
+            if self.on_precompressed is not None:
+                self.on_precompressed(path, method, response[0], time.perf_counter() - started)
+            return response[1]
+
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+        if if_none_match is not None:
+            environ["HTTP_IF_NONE_MATCH"] = strip_encoded_etags(if_none_match)
+        if method == "HEAD":
+            def start_head(status, headers, exc_info=None):
+                if status.startswith("304"):
+                    headers = self._not_modified_headers(headers, if_none_match, encoding)
+                return start_response(status, headers, exc_info)
+
+            return self.app(environ, start_head)
+
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured["status"], captured["headers"] = status, headers
+            # Deliberately not returning start_response's write(); Flask never uses it
+            return lambda data: None
+
+        app_iter = self.app(environ, capture)
+        headers = Headers(captured["headers"])
+        if not self._should_compress(captured["status"], headers):
+            # Streamed or not compressible: hand the iterator through so it stays lazy
+            if captured["status"].startswith("304"):
+                captured["headers"] = self._not_modified_headers(captured["headers"], if_none_match, encoding)
+            start_response(captured["status"], captured["headers"])
+            return app_iter
+
+        try:
+            body = b"".join(app_iter)
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+
+        if self.minify and headers.get("Content-Type", "").startswith("text/html"):
+            body = minify_html(body.decode("utf-8")).encode("utf-8")
+        headers.add("Vary", "Accept-Encoding")
+        if encoding is not None and len(body) >= self.min_size:
+            body = self._compressed_body(body, encoding, headers)
+        headers["Content-Length"] = str(len(body))
+        start_response(captured["status"], headers.to_wsgi_list())
+        return [body]
+
+    def _should_compress(self, status, headers):
+        return (
+            status.startswith("200")
+            and "Content-Encoding" not in headers
+            and "Content-Length" in headers  # buffered; streamed responses have none
+            and headers.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES)
+        )
+
+    def _not_modified_headers(self, headers, if_none_match, encoding):
+        """
+        Headers of a 304 from the app, made to match the 200 the client holds: the app compared
+        against If-None-Match without encoding suffixes, so the suffix is put back on its ETag,
+        and Vary is sent as the 200 sent it.
+        """
+        headers = Headers(headers)
+        etag = headers.get("ETag")
+        if etag is not None and if_none_match:
+            headers["ETag"] = held_etag(etag, if_none_match, encoding)
+        if "accept-encoding" not in headers.get("Vary", "").lower():
+            headers.add("Vary", "Accept-Encoding")
+        return headers.to_wsgi_list()
+
+    def _compressed_body(self, body, encoding, headers):
+        etag = headers.get("ETag")
+        key = (etag, encoding)
+        cacheable = etag is not None and not etag.startswith("W/")
+        if cacheable:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+        else:
+            cached = None
+        if cached is None:
+            cached = compress(body, encoding, self.level)
+            if cacheable:
+                with self._lock:
+                    self._cache[key] = cached
+                    while len(self._cache) > self.cache_entries:
+                        self._cache.popitem(last=False)
+        headers["Content-Encoding"] = encoding
+        if etag is not None:
+            headers["ETag"] = encoded_etag(etag, encoding)
+        return cached
+
+    def _serve_precompressed(self, page, encoding, environ, start_response):
+        """Sends a stored page (or 304 when the client has it); returns (status, body iterable)."""
+        status, headers, bodies, etag = page
+        headers = headers.copy()
+        body = bodies[encoding]
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            etag = encoded_etag(etag, encoding)
+        headers["ETag"] = etag
+        if etag in environ.get("HTTP_IF_NONE_MATCH", ""):
+            start_response("304 NOT MODIFIED", [(k, v) for k, v in headers.to_wsgi_list() if k != "Content-Type"])
+            return "304 NOT MODIFIED", []
+        headers["Content-Length"] = str(len(body))
+        start_response(status, headers.to_wsgi_list())
+        return status, [] if environ.get("REQUEST_METHOD") == "HEAD" else [body]
@@ -0,0 +1,39 @@
+"""
+A single asyncio event loop on a background thread, shared by all request threads.
+
+Coroutines submitted from any thread run on that loop and come back as
+concurrent.futures.Future objects, so synchronous code (Flask views) can start async
+I/O and wait on it with a timeout. Hundreds of calls can be in flight on the one loop
+thread, where a thread pool would need a thread per call.
+"""
+import asyncio
+import os
+import threading
+
+
+class EventLoopThread:
+    def __init__(self, name="event-loop"):
+        self.name = name
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        """The running loop, started on first use in each process (threads don't survive a fork)."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._loop = asyncio.new_event_loop()
+                    threading.Thread(target=self._run, args=(self._loop,), name=self.name, daemon=True).start()
+                    self._pid = os.getpid()
+        return self._loop
+
+    @staticmethod
+    def _run(loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def submit(self, coroutine):
+        """Schedules a coroutine on the loop; returns a concurrent.futures.Future for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
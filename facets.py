@@ -0,0 +1,388 @@
+"""
+Faceted filtering of search results with bitmap indexes.
+
+A FacetIndex covers a numbered set of records: the mock results of one query, or every
+document of the local search index. For each value of each facet it holds a bitmap (a
+Python int whose bit i is set when record i has that value). Filtering is then an AND over
+facets of ORs over accepted values, and counting a facet value is one popcount, so neither
+touches a record once the index is built. At 10^5 records a bitmap is 12.5 kB, so facets
+with many values are capped (MAX_VALUES): the most frequent values keep a bitmap of their
+own and the rest share one, "Other".
+
+Facets:
+    year     the publication year, filtered by range (?year_from=, ?year_to=)
+    tier     the kind of source: top, specialist, web or other (?tier=)
+    subject  the result's subject, "General" when it has none (?subject=)
+    ai       "yes" for AI-generated results, "no" for the rest (?ai=1 or ?ai=0)
+"""
+import json
+import os
+import re
+from array import array
+from functools import reduce
+from itertools import chain
+
+
+FACETS = ("year", "tier", "subject", "ai")
+FACET_TITLES = {"year": "Year", "tier": "Source", "subject": "Subject", "ai": "AI-generated"}
+# Source name prefixes of each tier, as the mock results and most corpora name them
+SOURCE_TIERS = (("Top-Tier Site", "top"), ("Specialist Blog", "specialist"), ("Web Source", "web"))
+VALUE_LABELS = {
+    "tier": {"top": "Top-tier sites", "specialist": "Specialist blogs", "web": "Web sources", "other": "Other sources"},
+    "ai": {"yes": "AI-generated", "no": "Not AI-generated"},
+}
+DEFAULT_SUBJECT = "General"
+# Bitmaps kept per facet, at most; rarer values are merged into OTHER_VALUES[facet]
+MAX_VALUES = {"subject": 50}
+OTHER_VALUES = {"subject": "Other"}
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(bitmap):
+        return bin(bitmap).count("1")
+
+
+def record_year(value):
+    """The year of a record as an int, or None when it has none ("" or not a number)."""
+    try:
+        return int(str(value).strip()[:4])
+    except ValueError:
+        return None
+
+
+def source_tier(source):
+    for prefix, tier in SOURCE_TIERS:
+        if source.startswith(prefix):
+            return tier
+    return "other"
+
+
+def is_ai_generated(record):
+    return record.get("author") == "Gemini AI" or record.get("source", "").endswith("(AI-Generated)")
+
+
+def facet_values(record):
+    """{facet: value} of a result record; a None value matches no filter on that facet."""
+    return {
+        "year": record_year(record.get("year", "")),
+        "tier": source_tier(record.get("source") or ""),
+        "subject": record.get("subject") or DEFAULT_SUBJECT,
+        "ai": "yes" if is_ai_generated(record) else "no",
+    }
+
+
+def bitmap_from_positions(positions, size):
+    """The bitmap of `size` bits with the given positions set."""
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+
+def bitmap_from_flags(flags):
+    """
+    The bitmap of a bytearray with one byte per position, 1 where the position is set (its
+    length a multiple of 8). Packs eight strided slices, so no Python loop runs per position.
+    """
+    bitmap = 0
+    for bit in range(8):
+        bitmap |= int.from_bytes(flags[bit::8], "little") << bit
+    return bitmap
+
+
+_NONZERO_BYTE = re.compile(rb"[^\x00]")
+_BYTE_POSITIONS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+def bitmap_positions(bitmap, size):
+    """The set positions of a bitmap in ascending order; empty bytes are skipped without a Python loop."""
+    data = bitmap_bytes(bitmap, size)
+    return [(match.start() << 3) + bit
+            for match in _NONZERO_BYTE.finditer(data)
+            for bit in _BYTE_POSITIONS[data[match.start()]]]
+
+
+def bitmap_bytes(bitmap, size):
+    """A bitmap as bytes, for testing many positions: position p is set if bits[p >> 3] >> (p & 7) & 1."""
+    return bitmap.to_bytes((size + 7) // 8, "little")
+
+
+# -------------------------------------------------------------------------
+# Filters (parsed request parameters)
+# -------------------------------------------------------------------------
+
+def parse_filters(args):
+    """
+    Reads facet filters from request arguments (a MultiDict): ?year_from= and ?year_to=,
+    ?tier= and ?subject= (repeated or comma-separated, any of the values), ?ai=1 or ?ai=0.
+    Returns {facet: selection} for the facets given; invalid years and ai values are ignored.
+    """
+    filters = {}
+    year_from = args.get("year_from", type=int)
+    year_to = args.get("year_to", type=int)
+    if year_from is not None or year_to is not None:
+        filters["year"] = (year_from, year_to)
+    for facet in ("tier", "subject"):
+        values = {value.strip() for given in args.getlist(facet) for value in given.split(",") if value.strip()}
+        if values:
+            filters[facet] = tuple(sorted(values))
+    ai = args.get("ai")
+    if ai in ("1", "0"):
+        filters["ai"] = "yes" if ai == "1" else "no"
+    return filters
+
+
+def filter_params(filters):
+    """The request arguments that select `filters` (the inverse of parse_filters), for building links."""
+    params = {}
+    if "year" in filters:
+        year_from, year_to = filters["year"]
+        if year_from is not None:
+            params["year_from"] = year_from
+        if year_to is not None:
+            params["year_to"] = year_to
+    for facet in ("tier", "subject"):
+        if facet in filters:
+            params[facet] = list(filters[facet])
+    if "ai" in filters:
+        params["ai"] = "1" if filters["ai"] == "yes" else "0"
+    return params
+
+
+def filter_key(filters):
+    """A hashable form of `filters`, for cache keys."""
+    return tuple(sorted(filters.items()))
+
+
+def filter_predicates(filters):
+    """{facet: accept(value)} for the facets `filters` restricts."""
+    predicates = {}
+    if "year" in filters:
+        year_from, year_to = filters["year"]
+        predicates["year"] = lambda year: (year_from is None or year >= year_from) and (year_to is None or year <= year_to)
+    for facet in ("tier", "subject"):
+        if facet in filters:
+            predicates[facet] = frozenset(filters[facet]).__contains__
+    if "ai" in filters:
+        predicates["ai"] = filters["ai"].__eq__
+    return predicates
+
+
+def toggle_filter(filters, facet, value):
+    """
+    The filters after clicking a facet value: a year selects that year alone (or clears the
+    year range it is in), a source tier or subject is added or removed, ai is set or cleared.
+    """
+    filters = dict(filters)
+    if facet == "year":
+        if "year" in filters and filter_predicates({"year": filters["year"]})["year"](value):
+            del filters["year"]
+        else:
+            filters["year"] = (value, value)
+    elif facet == "ai":
+        if filters.get("ai") == value:
+            del filters["ai"]
+        else:
+            filters["ai"] = value
+    else:
+        selected = set(filters.get(facet, ())) ^ {value}
+        if selected:
+            filters[facet] = tuple(sorted(selected))
+        else:
+            filters.pop(facet, None)
+    return filters
+
+
+def matches(record, predicates):
+    """Whether a single record passes every filter."""
+    values = facet_values(record)
+    return all(values[facet] is not None and accept(values[facet]) for facet, accept in predicates.items())
+
+
+def add_record(counts, record, predicates):
+    """Counts one more record (outside any index) into facet counts, as FacetIndex.counts() would."""
+    values = facet_values(record)
+    for facet, value in values.items():
+        if value is None:
+            continue
+        if all(values[other] is not None and accept(values[other])
+               for other, accept in predicates.items() if other != facet):
+            facet_counts = counts.setdefault(facet, {})
+            facet_counts[value] = facet_counts.get(value, 0) + 1
+    return counts
+
+
+def facet_options(counts, filters):
+    """
+    The choices to show, as [(facet, title, [{"value", "label", "count", "selected"}, ...])]:
+    years newest first, other values most frequent first. Selected values are listed even
+    when nothing matches them, so they can be cleared.
+    """
+    predicates = filter_predicates(filters)
+    options = []
+    for facet in FACETS:
+        values = dict(counts.get(facet, {}))
+        if facet in filters and facet != "year":
+            selected = (filters[facet],) if facet == "ai" else filters[facet]
+            for value in selected:
+                values.setdefault(value, 0)
+        if facet == "year":
+            ordered = sorted(values, reverse=True)
+        else:
+            ordered = sorted(values, key=lambda value: (-values[value], str(value)))
+        choices = [{
+            "value": value,
+            "label": VALUE_LABELS.get(facet, {}).get(value, str(value)),
+            "count": values[value],
+            "selected": facet in predicates and predicates[facet](value),
+        } for value in ordered]
+        if choices:
+            options.append((facet, FACET_TITLES[facet], choices))
+    return options
+
+
+# -------------------------------------------------------------------------
+# Bitmap Index
+# -------------------------------------------------------------------------
+
+def capped_values(values, facet, limit, frequency, merge):
+    """
+    `values` ({value: positions or bitmap}) with only the `limit` - 1 most frequent values kept
+    and the rest merged (merge([positions or bitmap, ...])) into OTHER_VALUES[facet].
+    Unchanged when there are at most `limit` values.
+    """
+    if limit is None or len(values) <= limit:
+        return values
+    ranked = sorted(values, key=lambda value: -frequency(values[value]))
+    kept = {value: values[value] for value in ranked[:limit - 1]}
+    rest = [values[value] for value in ranked[limit - 1:]]
+    other = OTHER_VALUES[facet]
+    if other in kept:
+        rest.append(kept[other])
+    kept[other] = merge(rest)
+    return kept
+
+
+class FacetIndexBuilder:
+    """
+    Collects the facet values of records 0, 1, 2, ... in turn; build() makes the FacetIndex,
+    with at most `max_values[facet]` bitmaps per facet.
+    """
+
+    def __init__(self, max_values=MAX_VALUES):
+        self.size = 0
+        self.max_values = max_values
+        self.positions = {facet: {} for facet in FACETS}
+
+    def add(self, record):
+        for facet, value in facet_values(record).items():
+            if value is not None:
+                positions = self.positions[facet].get(value)
+                if positions is None:
+                    positions = self.positions[facet][value] = array("I")
+                positions.append(self.size)
+        self.size += 1
+
+    def build(self):
+        bitmaps = {}
+        for facet, values in self.positions.items():
+            values = capped_values(values, facet, self.max_values.get(facet), len,
+                                   lambda rest: array("I", chain.from_iterable(rest)))
+            bitmaps[facet] = {value: bitmap_from_positions(positions, self.size) for value, positions in values.items()}
+        return FacetIndex(self.size, bitmaps)
+
+
+class FacetIndex:
+    """
+    One bitmap per facet value over `size` records. `predicates` arguments are the
+    {facet: accept(value)} mappings of filter_predicates(); `candidates` bitmaps restrict
+    an operation to some of the records (all of them by default). Filtering intersects the
+    facets' bitmaps directly, so it needs no candidates: the result can restrict a search
+    before it runs.
+    """
+
+    def __init__(self, size, bitmaps):
+        self.size = size
+        self.bitmaps = bitmaps  # facet -> {value: bitmap}
+        self.everything = (1 << size) - 1
+
+    @classmethod
+    def from_records(cls, records):
+        builder = FacetIndexBuilder()
+        for record in records:
+            builder.add(record)
+        return builder.build()
+
+    def accepted(self, facet, accept):
+        """The OR of the bitmaps of the facet's values that accept(value) admits."""
+        bitmap = 0
+        for value, value_bitmap in self.bitmaps[facet].items():
+            if accept(value):
+                bitmap |= value_bitmap
+        return bitmap
+
+    def filter(self, predicates, candidates=None):
+        """The bitmap of the candidates that pass every filter."""
+        bitmap = candidates
+        for facet, accept in predicates.items():
+            accepted = self.accepted(facet, accept)
+            bitmap = accepted if bitmap is None else bitmap & accepted
+        return self.everything if bitmap is None else bitmap
+
+    def counts(self, predicates, candidates=None):
+        """
+        {facet: {value: count}} over the candidates, leaving out zero counts. Each facet is
+        counted with the other facets' filters applied but not its own, so its counts say
+        how many results choosing another of its values would give.
+        """
+        accepted = {facet: self.accepted(facet, accept) for facet, accept in predicates.items()}
+        base = self.everything if candidates is None else candidates
+        counts = {}
+        for facet, values in self.bitmaps.items():
+            scope = base
+            for other, bitmap in accepted.items():
+                if other != facet:
+                    scope &= bitmap
+            facet_counts = {}
+            for value, bitmap in values.items():
+                count = popcount(scope & bitmap)
+                if count:
+                    facet_counts[value] = count
+            counts[facet] = facet_counts
+        return counts
+
+    def save(self, directory):
+        """
+        Writes facets.json (record count and the values of each facet) and facets.bin (the
+        bitmaps in the same order, each (size + 7) // 8 bytes, little-endian).
+        """
+        stride = (self.size + 7) // 8
+        values = {}
+        with open(os.path.join(directory, "facets.bin"), "wb") as f:
+            for facet, bitmaps in self.bitmaps.items():
+                values[facet] = list(bitmaps)
+                for bitmap in bitmaps.values():
+                    f.write(bitmap.to_bytes(stride, "little"))
+        with open(os.path.join(directory, "facets.json"), "w") as f:
+            json.dump({"size": self.size, "values": values}, f)
+
+    @classmethod
+    def load(cls, directory, max_values=MAX_VALUES):
+        """Reads an index written by save(), capping its facets to `max_values` like a new build."""
+        with open(os.path.join(directory, "facets.json")) as f:
+            meta = json.load(f)
+        size = meta["size"]
+        stride = (size + 7) // 8
+        with open(os.path.join(directory, "facets.bin"), "rb") as f:
+            data = f.read()
+        bitmaps = {}
+        offset = 0
+        for facet, values in meta["values"].items():
+            bitmaps[facet] = {}
+            for value in values:
+                bitmaps[facet][value] = int.from_bytes(data[offset:offset + stride], "little")
+                offset += stride
+            bitmaps[facet] = capped_values(bitmaps[facet], facet, max_values.get(facet), popcount,
+                                           lambda rest: reduce(int.__or__, rest))
+        return cls(size, bitmaps)
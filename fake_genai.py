@@ -0,0 +1,110 @@
+"""
+A stand-in for google.genai.Client for load tests and local runs without an API key.
+
+It answers generate_content() with a well-formed TITLE/AUTHOR/YEAR/SOURCE/SUMMARY
+response after a simulated latency, and fails a configurable share of calls with the
+same ServerError the real client raises. Enable it in the app with GEMINI_FAKE=1.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModels:
+    """Mirrors client.models: a synchronous generate_content()."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model, contents, config=None):
+        delay, fail = self._client._next_call()
+        time.sleep(delay)
+        return self._client._respond(model, contents, fail)
+
+    def list(self, config=None):
+        return []
+
+
+class FakeAsyncModels:
+    """Mirrors client.aio.models: generate_content() as a coroutine."""
+
+    def __init__(self, client):
+        self._client = client
+
+    async def generate_content(self, model, contents, config=None):
+        delay, fail = self._client._next_call()
+        await asyncio.sleep(delay)
+        return self._client._respond(model, contents, fail)
+
+    async def list(self, config=None):
+        return []
+
+
+class FakeAio:
+    def __init__(self, client):
+        self.models = FakeAsyncModels(client)
+
+
+class FakeClient:
+    """
+    Simulated Gemini client. Each call takes latency_ms +/- jitter_ms (uniform) and fails
+    with probability error_rate, raising the API error for error_code (503 outage, 429 rate
+    limit, ...). Pass a seed to get the same sequence of delays and failures. The attributes
+    can be changed while the app runs, e.g. `client.error_rate = 1.0` to simulate an outage.
+    """
+
+    def __init__(self, latency_ms=300, jitter_ms=100, error_rate=0.0, error_code=503, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.models = FakeModels(self)
+        self.aio = FakeAio(self)
+        self.calls = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Reads FAKE_GEMINI_LATENCY_MS, _JITTER_MS, _ERROR_RATE, _ERROR_CODE and _SEED."""
+        seed = os.getenv("FAKE_GEMINI_SEED")
+        return cls(
+            latency_ms=float(os.getenv("FAKE_GEMINI_LATENCY_MS", "300")),
+            jitter_ms=float(os.getenv("FAKE_GEMINI_JITTER_MS", "100")),
+            error_rate=float(os.getenv("FAKE_GEMINI_ERROR_RATE", "0")),
+            error_code=int(os.getenv("FAKE_GEMINI_ERROR_CODE", "503")),
+            seed=int(seed) if seed else None,
+        )
+
+    def _next_call(self):
+        with self._lock:
+            self.calls += 1
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.failures += 1
+        return max(0.0, self.latency_ms + jitter) / 1000, fail
+
+    def _respond(self, model, contents, fail):
+        if fail:
+            # Imported here so the fake client, like the app, doesn't load the SDK until needed
+            from google.genai.errors import ClientError, ServerError
+            error = ServerError if self.error_code >= 500 else ClientError
+            raise error(self.error_code, {"error": {"code": self.error_code, "message": "Simulated failure (fake client).", "status": "UNAVAILABLE"}})
+        # The prompt quotes the user's query: "...based on the user's query: '<query>'."
+        query = contents.split("query: '", 1)[-1].split("'.", 1)[0] if "query: '" in contents else contents[:60]
+        return FakeResponse(
+            f"TITLE: Research Summary: {query.title()}\n"
+            f"AUTHOR: Fake Analyst\n"
+            f"YEAR: 2025\n"
+            f"SOURCE: Simulated Research ({model})\n"
+            f"SUMMARY: A simulated in-depth summary of {query}, returned by the fake Gemini client for load testing."
+        )
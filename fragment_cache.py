@@ -0,0 +1,37 @@
+"""
+LRU cache of rendered HTML fragments, such as the search result cards.
+
+A page is assembled from the cached HTML of its fragments; only fragments that haven't been
+rendered before are rendered. A key must cover everything a fragment's HTML depends on,
+including a version of its template, so changed markup never reuses old fragments.
+"""
+import threading
+from collections import OrderedDict
+
+
+class FragmentCache:
+    def __init__(self, max_entries=20000):
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_render(self, key, render):
+        """Returns the fragment stored under key, or calls render() and stores what it returns."""
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return html
+        html = render()
+        with self._lock:
+            self._entries[key] = html
+            self.stats["misses"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return html
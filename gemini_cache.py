@@ -0,0 +1,224 @@
+"""
+Query-keyed cache in front of the Gemini call, with negative caching and single-flight.
+
+Entries live in a result store (see result_store.py), so with the SQLite backend a
+result fetched by one worker is served by every other worker on the host.
+"""
+import asyncio
+import threading
+import time
+
+
+class _Flight:
+    """
+    One in-progress fetch that concurrent callers for the same key wait on: threads with
+    done.wait(), coroutines with wait_async(), whether the fetch runs in a thread or on a loop.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self._waiters = []  # (loop, future) of each waiting coroutine
+        self._lock = threading.Lock()
+
+    def finish(self, result):
+        with self._lock:
+            self.result = result
+            self.done.set()
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future, result)
+            except RuntimeError:  # the waiter's loop has been closed
+                pass
+
+    async def wait_async(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.done.is_set():
+                return self.result
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        return await future
+
+
+def _resolve(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+class GeminiResultCache:
+    """
+    Wraps `fetch(query) -> result dict or None`:
+      * successful results are served for `ttl` seconds,
+      * failures (None) are remembered for `negative_ttl` seconds so an outage is not hammered,
+      * concurrent misses for the same query share one in-flight call,
+      * expired successes are kept `stale_ttl` seconds longer as a fallback (see lookup_stale).
+    `fetch` is any callable, so tests and benchmarks can pass one built on a fake client.
+    `fetch_async`, its coroutine version, serves get_async() on an event loop.
+    `key_func` maps a query to the key it is cached under (e.g. a canonical form, so that
+    variants of a query share one entry and one call); by default the query itself.
+    """
+
+    KEY_PREFIX = "gemini:"
+
+    def __init__(self, fetch, store, ttl=600, negative_ttl=30, stale_ttl=3000, fetch_async=None, key_func=None):
+        self.fetch = fetch
+        self.fetch_async = fetch_async
+        self.store = store
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.key_func = key_func
+        self._in_flight = {}  # key -> _Flight, shared by get(), get_async() and refresh()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "coalesced": 0}
+
+    def _key(self, query):
+        return self.KEY_PREFIX + (self.key_func(query) if self.key_func is not None else query)
+
+    def _state(self, entry):
+        """Classifies a stored entry as 'fresh', 'failed' (recent failure) or None (expired/missing)."""
+        if entry is None:
+            return None
+        now = time.time()
+        if entry["failed_at"] is not None and now - entry["failed_at"] <= self.negative_ttl:
+            return "failed"
+        if entry["result"] is not None and now - entry["fetched_at"] <= self.ttl:
+            return "fresh"
+        return None
+
+    def lookup(self, query):
+        """
+        Returns (found, result) without calling Gemini. `found` is True for a fresh result and
+        for a recently failed query; the latter returns the stale result, if any, or None.
+        """
+        entry = self.store.get(self._key(query))
+        state = self._state(entry)
+        if state is None:
+            return False, None
+        self._count("hits" if state == "fresh" else "negative_hits")
+        return True, entry["result"]
+
+    def lookup_stale(self, query):
+        """Returns the last successful result for a query, however old, or None."""
+        entry = self.store.get(self._key(query))
+        return entry["result"] if entry is not None else None
+
+    def get(self, query):
+        """Returns the Gemini result for a query, calling `fetch` at most once per key at a time."""
+        key = self._key(query)
+        entry = self.store.get(key)
+        state = self._state(entry)
+        if state is not None:
+            self._count("hits" if state == "fresh" else "negative_hits")
+            return entry["result"]
+
+        return self._fetch_shared(key, query)
+
+    async def get_async(self, query):
+        """
+        Coroutine version of get(): concurrent misses share one `fetch_async` call, and a miss
+        for a key that get() or refresh() is already fetching waits for that call. The store is
+        read and written in a worker thread, so a slow store never blocks the event loop.
+        """
+        key = self._key(query)
+        entry = await asyncio.to_thread(self.store.get, key)
+        state = self._state(entry)
+        if state is not None:
+            self._count("hits" if state == "fresh" else "negative_hits")
+            return entry["result"]
+
+        flight, leader = self._join_flight(key)
+        if not leader:
+            return await flight.wait_async()
+
+        result = None
+        try:
+            result = await self.fetch_async(query)
+        except Exception as e:
+            print(f"Gemini fetch failed for cached query: {e}")
+        finally:
+            await asyncio.to_thread(self._store, key, result)
+            self._leave_flight(key, flight, result)
+        return result
+
+    def refresh(self, query):
+        """
+        Fetches a query's result now, even if the cached one is still fresh (used to pre-warm
+        popular queries). Shares the in-flight call with concurrent searches; not counted in stats.
+        """
+        return self._fetch_shared(self._key(query), query, counted=False)
+
+    def needs_refresh(self, query, margin):
+        """
+        Whether a query's result is missing or goes stale within `margin` seconds.
+        A recently failed query waits out its negative_ttl first.
+        """
+        entry = self.store.get(self._key(query))
+        state = self._state(entry)
+        if state == "failed":
+            return False
+        if state is None:
+            return True
+        return time.time() - entry["fetched_at"] > self.ttl - margin
+
+    def _fetch_shared(self, key, query, counted=True):
+        """Calls `fetch` for a query, or waits for the call already in flight for it."""
+        flight, leader = self._join_flight(key, counted)
+        if not leader:
+            flight.done.wait()
+            return flight.result
+
+        result = None
+        try:
+            result = self.fetch(query)
+        except Exception as e:
+            print(f"Gemini fetch failed for cached query: {e}")
+        finally:
+            self._store(key, result)
+            self._leave_flight(key, flight, result)
+        return result
+
+    def _join_flight(self, key, counted=True):
+        """Returns (flight, leader): the fetch in flight for a key, or a new one the caller must make."""
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+            if counted:
+                self.stats["misses" if leader else "coalesced"] += 1
+        return flight, leader
+
+    def _leave_flight(self, key, flight, result):
+        with self._lock:
+            del self._in_flight[key]
+        flight.finish(result)
+
+    def put(self, query, result):
+        """Stores a result for a query, or records a failure (result None) next to any stale result."""
+        self._store(self._key(query), result)
+
+    def _store(self, key, result):
+        now = time.time()
+        if result is not None:
+            self.store.set(key, {"result": result, "fetched_at": now, "failed_at": None}, ttl=self.ttl + self.stale_ttl)
+            return
+
+        previous = self.store.get(key)
+        if previous is not None and previous["result"] is not None:
+            # Keep the previous success around as the stale fallback while the failure is cached
+            entry = dict(previous, failed_at=now)
+            ttl = max(self.negative_ttl, previous["fetched_at"] + self.ttl + self.stale_ttl - now)
+        else:
+            entry = {"result": None, "fetched_at": now, "failed_at": now}
+            ttl = self.negative_ttl
+        self.store.set(key, entry, ttl=ttl)
+
+    def invalidate(self, query):
+        self.store.delete(self._key(query))
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
@@ -0,0 +1,46 @@
+"""
+Gunicorn settings for MindWork. Gunicorn reads this file automatically when started from
+this directory, so the start command is just:
+
+    gunicorn app:app
+
+Serving model: a few processes ("gthread" workers), each with a pool of request threads.
+A search's Gemini call doesn't occupy any of them: with GEMINI_ASYNC=1 (the default here)
+every Gemini call runs on one asyncio event loop per process through the async genai
+client, so hundreds of calls can be in flight while a request thread only waits for its
+result up to the deadline (GEMINI_DEADLINE_MS), then renders. Everything else on the
+request path is CPU-bound work in the ~1-10 ms range, which plain threads handle well.
+
+Every value can be overridden with the environment variables below or on the command line.
+"""
+import multiprocessing
+import os
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+
+worker_class = "gthread"
+# One process per core (capped): processes give CPU parallelism, threads cover waiting.
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count(), 4))))
+threads = int(os.getenv("GUNICORN_THREADS", "64"))
+
+# Import the app once in the master, then fork: templates, the search index (mmap'd) and the
+# precompressed pages are shared copy-on-write, and workers start instantly. Background
+# threads (Gemini event loop, pre-warmer, profiler) start lazily in each worker.
+preload_app = True
+
+# Streamed search pages may wait up to GEMINI_STREAM_DEADLINE_MS (10 s) for their last chunk.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 20
+keepalive = 5
+
+raw_env = [f"GEMINI_ASYNC={os.getenv('GEMINI_ASYNC', '1')}"]
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG")  # e.g. "-" for stdout; off by default
+
+
+def post_worker_init(worker):
+    # Each worker warms up in the background as soon as it starts (pages rendered once,
+    # Gemini SDK imported and connected); /readyz reports when it's done.
+    import app
+    app.start_warm_up()
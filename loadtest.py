@@ -0,0 +1,333 @@
+"""
+Load test for the MindWork routes, with Gemini replaced by the fake client (fake_genai.py).
+
+Each route is driven in turn by --concurrency threads for --duration seconds, and the
+throughput and p50/p95/p99 latencies are reported. The app runs either in this process
+(Flask test client) or as a real server over sockets:
+
+    python loadtest.py                                  # in-process
+    python loadtest.py --server gunicorn --workers 2    # or --server waitress
+    python loadtest.py --output run.json --compare baseline.json
+    python loadtest.py --server gunicorn --routes /search --cold --env GEMINI_ASYNC=0   # vs =1
+
+With --compare, routes whose p95 latency or throughput got worse by more than --threshold
+are listed and the exit status is 1, so a run can gate a change.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+
+QUERIES = [
+    "machine learning", "climate change", "quantum computing", "renaissance art", "black holes",
+    "crispr gene editing", "stoic philosophy", "supply chain", "neural networks", "roman empire",
+    "ocean acidification", "behavioral economics", "protein folding", "jazz history", "urban planning",
+    "dark matter", "sleep science", "blockchain", "microbiome", "game theory",
+]
+
+FAKE_GEMINI_DEFAULTS = {"FAKE_GEMINI_LATENCY_MS": "300", "FAKE_GEMINI_JITTER_MS": "100", "FAKE_GEMINI_ERROR_RATE": "0"}
+
+
+# -------------------------------------------------------------------------
+# Clients (one per worker thread)
+# -------------------------------------------------------------------------
+
+class InProcessClient:
+    """Sends requests through the Flask test client; measures the app without any network."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path):
+        response = self.client.get(path, headers={"Accept-Encoding": "gzip"})
+        return response.status_code, response.get_data()
+
+    def close(self):
+        pass
+
+
+class SocketClient:
+    """Keep-alive HTTP/1.1 connection to a running server; reconnects after errors."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.connection = None
+
+    def get(self, path):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            self.connection.request("GET", path, headers={"Accept-Encoding": "gzip"})
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+# -------------------------------------------------------------------------
+# Servers
+# -------------------------------------------------------------------------
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, port, workers, threads, env):
+    """Starts gunicorn or waitress serving app:app and waits until it answers."""
+    if kind == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", "--workers", str(workers),
+                   "--worker-class", "gthread", "--threads", str(threads), "--log-level", "warning", "app:app"]
+    else:
+        command = [sys.executable, "-m", "waitress", f"--listen=127.0.0.1:{port}", f"--threads={threads}", "app:app"]
+    process = subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{kind} exited during startup:\n{process.stderr.read().decode(errors='replace')}")
+        try:
+            status, _body = SocketClient("127.0.0.1", port).get("/")
+            if status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{kind} did not start within 60 seconds")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# -------------------------------------------------------------------------
+# Load generation
+# -------------------------------------------------------------------------
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+
+def drive(make_client, paths, concurrency, duration):
+    """
+    Runs `concurrency` threads, each requesting paths round-robin (from its own offset)
+    for `duration` seconds. Returns the latency list (seconds), error count and elapsed time.
+    """
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker(offset):
+        client = make_client()
+        local, local_errors = [], 0
+        index = offset
+        while time.perf_counter() < stop_at:
+            path = paths[index % len(paths)]
+            index += 1
+            started = time.perf_counter()
+            try:
+                status, _body = client.get(path)
+                ok = status < 500
+            except (OSError, http.client.HTTPException):
+                ok = False
+            if ok:
+                local.append(time.perf_counter() - started)
+            else:
+                local_errors += 1
+        client.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(offset * 7,)) for offset in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.perf_counter() - started
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else None,
+    }
+
+
+def build_scenarios(make_client, query_count, seed, cold=False):
+    """
+    Path lists per route. Queries repeat with a skewed (Zipf-like) frequency, as real
+    traffic does, so the caches see a realistic hit rate; with `cold`, every search is a
+    query never seen before, so each one needs its own Gemini call. Article slugs come from /api/search.
+    """
+    rng = random.Random(seed)
+    queries = QUERIES[:query_count]
+    weights = [1 / (rank + 1) for rank in range(len(queries))]
+    if cold:
+        run = f"{time.time():.0f}"
+        searches = [f"/search?query={q.replace(' ', '+')}+{run}x{i}" for i, q in enumerate(rng.choices(queries, k=100000))]
+    else:
+        searches = [f"/search?query={q.replace(' ', '+')}" for q in rng.choices(queries, weights, k=500)]
+
+    client = make_client()
+    articles = []
+    for query in queries[:5]:
+        status, body = client.get(f"/api/search?query={query.replace(' ', '+')}&fields=slug&per_page=20")
+        if status == 200:
+            if body[:2] == b"\x1f\x8b":
+                import gzip
+                body = gzip.decompress(body)
+            articles.extend(f"/article/{result['slug']}" for result in json.loads(body)["results"])
+    client.close()
+    rng.shuffle(articles)
+
+    return {"/": ["/"], "/search": searches, "/article/<slug>": articles or ["/"]}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Prints per-route changes against a baseline run. Returns the list of regressions."""
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('revision') or 'baseline'} ({baseline['meta'].get('timestamp')}):")
+    if baseline["meta"].get("server") != results["meta"]["server"]:
+        print(f"  Note: the baseline ran on {baseline['meta'].get('server')}, this run on {results['meta']['server']}.")
+    for route, now in results["routes"].items():
+        before = baseline["routes"].get(route)
+        if not before:
+            continue
+        for metric, higher_is_worse in (("throughput_rps", False), ("p50_ms", True), ("p95_ms", True), ("p99_ms", True)):
+            old, new = before.get(metric), now.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change > threshold if higher_is_worse else change < -threshold
+            marker = "  REGRESSION" if worse and metric in ("throughput_rps", "p95_ms") else ""
+            print(f"  {route:<18} {metric:<15} {old:>10} -> {new:>10}  {change:+7.1%}{marker}")
+            if marker:
+                regressions.append((route, metric, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the MindWork routes with a fake Gemini client.")
+    parser.add_argument("--server", choices=("inprocess", "gunicorn", "waitress"), default="inprocess")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes.")
+    parser.add_argument("--threads", type=int, default=8, help="Threads per server worker.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client threads.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per route.")
+    parser.add_argument("--routes", default="/,/search,/article/<slug>", help="Comma-separated routes to drive.")
+    parser.add_argument("--queries", type=int, default=len(QUERIES), help="Distinct search queries.")
+    parser.add_argument("--latency-ms", type=float, help="Fake Gemini latency (FAKE_GEMINI_LATENCY_MS).")
+    parser.add_argument("--jitter-ms", type=float, help="Fake Gemini latency jitter (FAKE_GEMINI_JITTER_MS).")
+    parser.add_argument("--error-rate", type=float, help="Share of fake Gemini calls that fail (FAKE_GEMINI_ERROR_RATE).")
+    parser.add_argument("--cold", action="store_true", help="Every search is a new query (a Gemini call each).")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="Extra app setting, e.g. --env GEMINI_ASYNC=1 (repeatable).")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the query mix and fake client.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression.")
+    args = parser.parse_args()
+
+    env = dict(os.environ, GEMINI_FAKE="1", FAKE_GEMINI_SEED=str(args.seed))
+    env.update(setting.split("=", 1) for setting in args.env)
+    for name, default in FAKE_GEMINI_DEFAULTS.items():
+        env.setdefault(name, default)
+    for name, value in (("FAKE_GEMINI_LATENCY_MS", args.latency_ms), ("FAKE_GEMINI_JITTER_MS", args.jitter_ms),
+                        ("FAKE_GEMINI_ERROR_RATE", args.error_rate)):
+        if value is not None:
+            env[name] = str(value)
+
+    process = None
+    if args.server == "inprocess":
+        os.environ.update(env)
+        import app as mindwork
+        make_client = lambda: InProcessClient(mindwork.app)
+    else:
+        port = free_port()
+        process = start_server(args.server, port, args.workers, args.threads, env)
+        make_client = lambda: SocketClient("127.0.0.1", port)
+
+    try:
+        scenarios = build_scenarios(make_client, args.queries, args.seed, cold=args.cold)
+        results = {
+            "meta": {
+                "server": args.server,
+                "workers": args.workers if args.server == "gunicorn" else 1,
+                "threads": args.threads,
+                "concurrency": args.concurrency,
+                "duration_s": args.duration,
+                "fake_gemini": {name: env[name] for name in FAKE_GEMINI_DEFAULTS},
+                "cold": args.cold,
+                "env": args.env,
+                "revision": git_revision(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "routes": {},
+        }
+        print(f"Load test: {args.server}, {args.concurrency} clients, {args.duration:g}s per route, "
+              f"fake Gemini {env['FAKE_GEMINI_LATENCY_MS']} ms / {float(env['FAKE_GEMINI_ERROR_RATE']):.0%} errors")
+        print(f"  {'route':<18} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for route in filter(None, (r.strip() for r in args.routes.split(","))):
+            summary = summarize(*drive(make_client, scenarios[route], args.concurrency, args.duration))
+            results["routes"][route] = summary
+            print(f"  {route:<18} {summary['throughput_rps']:>8} {summary['p50_ms']:>8} {summary['p95_ms']:>8} "
+                  f"{summary['p99_ms']:>8} {summary['errors']:>7}")
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}.")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
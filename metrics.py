@@ -0,0 +1,232 @@
+"""
+In-process metrics for MindWork: stage timers, Prometheus-format counters and histograms,
+and a sampling profiler for slow requests.
+
+Metrics are per process; under gunicorn each worker exposes its own /metrics, which a
+Prometheus scrape of every worker (or the `instance` label) sums up as usual.
+"""
+import bisect
+import collections
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+
+# Seconds; covers sub-millisecond cache hits up to calls that blow the streaming deadline
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# -------------------------------------------------------------------------
+# Metric types
+# -------------------------------------------------------------------------
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.type = "counter"
+        self._values = collections.defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name + "_total", self.labelnames, labels, value
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.type = "histogram"
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [count per bucket..., count above the last bucket, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 3)
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        names = self.labelnames + ("le",)
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-2]):
+                cumulative += count
+                yield self.name + "_bucket", names, labels + (_format_value(bound),), cumulative
+            yield self.name + "_sum", self.labelnames, labels, values[-2]
+            yield self.name + "_count", self.labelnames, labels, values[-1]
+
+
+class CallbackMetric:
+    """A counter or gauge read at scrape time from `read()`, which returns {label values tuple: value}."""
+
+    def __init__(self, name, help, type, labelnames, read):
+        self.name, self.help, self.type, self.labelnames = name, help, type, tuple(labelnames)
+        self.read = read
+
+    def samples(self):
+        suffix = "_total" if self.type == "counter" else ""
+        for labels, value in sorted(self.read().items()):
+            yield self.name + suffix, self.labelnames, labels, value
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, type, labelnames, read):
+        return self._add(CallbackMetric(name, help, type, labelnames, read))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labelnames, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# -------------------------------------------------------------------------
+# Stage timing
+# -------------------------------------------------------------------------
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "mindwork_stage_duration_seconds", "Time spent in each stage of a request.", ("stage",))
+
+
+@contextmanager
+def stage(name):
+    """
+    Times a block as a named request stage: recorded in the stage histogram and, inside
+    a request, added to that request's Server-Timing header.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, name)
+        if has_request_context():
+            timings = g.setdefault("stage_timings", {})
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def server_timing_header(timings, total=None):
+    """Formats {stage: seconds} as a Server-Timing header value (durations in ms)."""
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+# -------------------------------------------------------------------------
+# Sampling profiler (slow requests)
+# -------------------------------------------------------------------------
+
+class SamplingProfiler:
+    """
+    Samples the stacks of registered threads every `interval` seconds from one background
+    thread (sys._current_frames), so a profiled request runs at full speed. A request whose
+    stacks are worth keeping is written out in collapsed ("folded") format, which flame graph
+    tools (flamegraph.pl, speedscope) read directly.
+    """
+
+    def __init__(self, interval=0.005, output_dir=None):
+        self.interval = interval
+        self.output_dir = output_dir
+        self._stacks = {}  # thread id -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._stacks[thread_id] = collections.Counter()
+            # The sampler thread doesn't survive a fork (gunicorn workers), so each process starts its own
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id):
+        """Stops sampling a thread and returns its Counter of collapsed stacks."""
+        with self._lock:
+            return self._stacks.pop(thread_id, collections.Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._stacks:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self._stacks.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[_collapse(frame)] += 1
+
+    def dump(self, stacks, label):
+        """Writes collapsed stacks to output_dir; returns the file path (None if nothing to write)."""
+        if not stacks or not self.output_dir:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() else "_" for c in label)[:60]
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{safe_label}.folded")
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
@@ -0,0 +1,107 @@
+"""
+Full-page cache for rendered search pages.
+
+Each entry holds a page already minified and in every compressed encoding, so serving a
+repeat search is a dictionary lookup and a memory copy. An entry is fresh for `ttl`
+seconds; for `stale_ttl` seconds after that it is still served at once, while a single
+background refresh rebuilds it. At most `max_entries` entries are kept (least recently
+used go first). The cache is per process.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from compression import compress, minify_html
+
+
+class PageCache:
+    def __init__(self, executor, max_entries=1000, ttl=60.0, stale_ttl=600.0, encodings=(), minify=True, level=6,
+                 clock=time.monotonic):
+        self.executor = executor
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.encodings = encodings
+        self.minify = minify
+        self.level = level
+        self.clock = clock
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "stores": 0, "refreshes": 0, "refresh_failures": 0,
+                      "evictions": 0, "invalidations": 0}
+        self._entries = OrderedDict()  # key -> {"bodies": {encoding or None: bytes}, "etag": str, "stored": float}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Returns (entry, fresh): fresh is False for a stale entry, which should be refreshed.
+        Returns (None, False) if there is no entry, or it is past its stale period.
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now >= entry["stored"] + self.ttl + self.stale_ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None, False
+            self._entries.move_to_end(key)
+            fresh = now < entry["stored"] + self.ttl
+            self.stats["hits" if fresh else "stale_hits"] += 1
+            return entry, fresh
+
+    def put(self, key, html):
+        """Minifies and compresses a rendered page and stores it under key. Returns the new entry."""
+        body = (minify_html(html) if self.minify else html).encode("utf-8")
+        bodies = {None: body}
+        for encoding in self.encodings:
+            bodies[encoding] = compress(body, encoding, self.level)
+        entry = {"bodies": bodies, "etag": '"' + hashlib.sha256(body).hexdigest()[:32] + '"', "stored": self.clock()}
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return entry
+
+    def refresh(self, key, render):
+        """
+        Rebuilds an entry on the executor: render() returns the page's HTML, or None to keep
+        the current entry. Does nothing if a refresh of this key is already running.
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self.executor.submit(self._refresh, key, render)
+
+    def _refresh(self, key, render):
+        outcome = None
+        try:
+            html = render()
+            if html is not None:
+                self.put(key, html)
+                outcome = "refreshes"
+        except Exception as e:
+            outcome = "refresh_failures"
+            print(f"Page cache refresh failed for {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+                if outcome is not None:
+                    self.stats[outcome] += 1
+
+    def invalidate(self, predicate=None):
+        """Drops the entries whose key satisfies predicate(key), or every entry. Returns how many were dropped."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate is None or predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            self.stats["invalidations"] += len(keys)
+        return len(keys)
@@ -0,0 +1,182 @@
+"""
+Keeps the Gemini results of trending queries warm, so their searches never pay the cold call.
+
+TrendingQueries counts searches with exponential decay (recent searches weigh more).
+Prewarmer periodically refreshes the cached Gemini result of each of the top-N queries
+shortly before it goes stale, spending at most `calls_per_minute` API calls.
+
+It runs as a background thread in the app (PREWARM_ENABLED=1), warming the queries that
+process sees, or as a single separate process reading the shared search log (this avoids
+duplicate work across gunicorn workers):
+
+    SEARCH_LOG_PATH=/var/lib/mindwork/searches.log python prewarm.py --top 20 --calls-per-minute 30
+"""
+import argparse
+import heapq
+import math
+import os
+import random
+import threading
+import time
+
+
+class TrendingQueries:
+    """
+    Query counts that halve every `half_life` seconds. Rather than decaying every count,
+    new searches are weighted up by 2**(age of the tracker / half_life); the weights are
+    rescaled once they grow large. At most `max_queries` queries are tracked.
+    """
+
+    def __init__(self, half_life=1800.0, max_queries=5000, clock=time.monotonic):
+        self.half_life = half_life
+        self.max_queries = max_queries
+        self.clock = clock
+        self.scores = {}
+        self._epoch = clock()
+        self._lock = threading.Lock()
+
+    def add(self, query, increment=1):
+        """Counts a search (same signature as SuggestionTrie.add, so a SearchLog can feed it)."""
+        query = query.strip()
+        if not query:
+            return
+        with self._lock:
+            exponent = (self.clock() - self._epoch) / self.half_life
+            if exponent > 50:
+                self._rescale(exponent)
+                exponent = 0.0
+            self.scores[query] = self.scores.get(query, 0.0) + increment * math.pow(2.0, exponent)
+            if len(self.scores) > 2 * self.max_queries:
+                self.scores = dict(heapq.nlargest(self.max_queries, self.scores.items(), key=lambda item: item[1]))
+
+    def _rescale(self, exponent):
+        factor = math.pow(2.0, -exponent)
+        self.scores = {query: score * factor for query, score in self.scores.items() if score * factor > 1e-9}
+        self._epoch = self.clock()
+
+    def top(self, n):
+        """The n queries with the highest decayed counts, most popular first."""
+        with self._lock:
+            return [query for query, _score in heapq.nlargest(n, self.scores.items(), key=lambda item: item[1])]
+
+
+class CallBudget:
+    """Token bucket allowing `per_minute` calls a minute, in bursts of at most `per_minute`."""
+
+    def __init__(self, per_minute, clock=time.monotonic):
+        self.per_minute = per_minute
+        self.clock = clock
+        self.tokens = float(per_minute)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.per_minute, self.tokens + (now - self._updated) * self.per_minute / 60)
+            self._updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Prewarmer:
+    """
+    Every `interval` seconds, refreshes the cached result of each top-N trending query that
+    is missing or goes stale within `margin` seconds. `cache` is a GeminiResultCache;
+    `source`, if given, is refreshed first (a SearchLog feeding `trending`); `is_available`
+    lets a cycle be skipped (e.g. while the Gemini circuit breaker is open).
+    """
+
+    def __init__(self, cache, trending, top_n=20, calls_per_minute=30, margin=120.0, interval=30.0,
+                 source=None, is_available=None):
+        self.cache = cache
+        self.trending = trending
+        self.top_n = top_n
+        self.budget = CallBudget(calls_per_minute)
+        self.margin = margin
+        self.interval = interval
+        self.source = source
+        self.is_available = is_available or (lambda: True)
+        self.stats = {"refreshed": 0, "failed": 0, "already_warm": 0, "over_budget": 0, "skipped_cycles": 0}
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def run_once(self):
+        """One warming pass over the trending queries. Returns the number of API calls made."""
+        if self.source is not None:
+            self.source.refresh(force=True)
+        if not self.is_available():
+            self.stats["skipped_cycles"] += 1
+            return 0
+        calls = 0
+        for query in self.trending.top(self.top_n):
+            if not self.cache.needs_refresh(query, self.margin):
+                self.stats["already_warm"] += 1
+                continue
+            if not self.budget.try_acquire():
+                self.stats["over_budget"] += 1
+                break
+            calls += 1
+            result = self.cache.refresh(query)
+            self.stats["refreshed" if result is not None else "failed"] += 1
+        return calls
+
+    def ensure_running(self):
+        """Starts the warming thread in this process, if it isn't running (threads don't survive a fork)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self.run_forever, name="gemini-prewarm", daemon=True).start()
+
+    def run_forever(self):
+        while True:
+            # Jittered, so workers sharing the result store don't all check at the same moment
+            time.sleep(self.interval * random.uniform(0.8, 1.2))
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Pre-warming pass failed: {e}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Keep the Gemini results of trending searches warm.")
+    parser.add_argument("--top", type=int, default=int(os.getenv("PREWARM_TOP_N", "20")), help="Queries to keep warm.")
+    parser.add_argument("--calls-per-minute", type=int, default=int(os.getenv("PREWARM_CALLS_PER_MINUTE", "30")),
+                        help="Gemini API call budget.")
+    parser.add_argument("--interval", type=float, default=float(os.getenv("PREWARM_INTERVAL_SECONDS", "30")),
+                        help="Seconds between warming passes.")
+    parser.add_argument("--margin", type=float, default=float(os.getenv("PREWARM_MARGIN_SECONDS", "120")),
+                        help="Refresh results this many seconds before they go stale.")
+    parser.add_argument("--once", action="store_true", help="Run a single pass and exit.")
+    args = parser.parse_args()
+
+    # This process is the only warmer; the app must not start its own thread
+    os.environ["PREWARM_ENABLED"] = "0"
+    import app as mindwork
+    from suggest import SearchLog
+
+    if not mindwork.SEARCH_LOG_PATH:
+        parser.error("SEARCH_LOG_PATH must point at the search log the app workers write.")
+    if mindwork.RESULT_STORE_BACKEND != "sqlite":
+        parser.error("A separate warmer needs the shared sqlite result store (RESULT_STORE_BACKEND=sqlite).")
+    if not mindwork.GEMINI_CLIENT_READY:
+        parser.error("No Gemini client (set GEMINI_API_KEY, or GEMINI_FAKE=1).")
+
+    trending = TrendingQueries(half_life=float(os.getenv("PREWARM_HALF_LIFE_SECONDS", "1800")))
+    prewarmer = Prewarmer(
+        mindwork.GEMINI_CACHE, trending, top_n=args.top, calls_per_minute=args.calls_per_minute,
+        margin=args.margin, interval=args.interval,
+        source=SearchLog(mindwork.SEARCH_LOG_PATH, trending, refresh_seconds=0),
+        is_available=lambda: mindwork.GEMINI_BREAKER.state != "open",
+    )
+    while True:
+        calls = prewarmer.run_once()
+        print(f"Pre-warmed {calls} queries; totals: {prewarmer.stats}")
+        if args.once:
+            break
+        time.sleep(args.interval)
@@ -0,0 +1,92 @@
+"""
+Relevance ranking for search result records.
+
+A result's score is a weighted sum of four signals, each scaled to 0..1:
+  * title   - share of the query terms that appear in the title
+  * summary - share of the query terms that appear in the summary
+  * tier    - how trusted the source is ("Top-Tier Site" > "Specialist Blog" > "Web Source")
+  * recency - how recent the `year` is, fading out over RECENCY_HORIZON years
+Only the top `stop` candidates are ordered (heap selection), never the whole candidate list.
+"""
+import heapq
+import re
+import time
+
+from search_index import tokenize
+
+
+DEFAULT_WEIGHTS = {"title": 3.0, "summary": 1.0, "tier": 2.0, "recency": 1.0}
+
+# Source prefixes and their trust score; anything else scores DEFAULT_TIER_SCORE.
+SOURCE_TIERS = (
+    ("Top-Tier Site", 1.0),
+    ("Specialist Blog", 0.6),
+    ("Web Source", 0.3),
+)
+DEFAULT_TIER_SCORE = 0.3
+
+RECENCY_HORIZON = 10  # years
+
+
+def parse_weights(spec):
+    """
+    Parses "title=3,summary=1,tier=2,recency=1" into a weights dict.
+    Signals left out keep their default weight.
+    """
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if name not in weights:
+            raise ValueError(f"Unknown ranking signal {name!r}; expected one of {sorted(weights)}")
+        weights[name] = float(value)
+    return weights
+
+
+def source_tier_score(source):
+    for prefix, score in SOURCE_TIERS:
+        if source.startswith(prefix):
+            return score
+    return DEFAULT_TIER_SCORE
+
+
+def recency_score(year, current_year):
+    try:
+        age = current_year - int(year)
+    except (TypeError, ValueError):
+        return 0.0
+    return max(0.0, 1.0 - max(age, 0) / RECENCY_HORIZON)
+
+
+def make_scorer(query, weights=DEFAULT_WEIGHTS, current_year=None):
+    """Returns a function scoring a result record for this query."""
+    query_terms = sorted(set(tokenize(query)))
+    term_count = len(query_terms) or 1
+    # One C-level scan per field finds which query terms occur as whole words
+    term_pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, query_terms)) + r")\b") if query_terms else None
+    current_year = current_year or time.localtime().tm_year
+    w_title, w_summary = weights["title"], weights["summary"]
+    w_tier, w_recency = weights["tier"], weights["recency"]
+
+    def overlap(text):
+        if term_pattern is None:
+            return 0.0
+        return len(set(term_pattern.findall(text.lower()))) / term_count
+
+    def score(result):
+        return (
+            w_title * overlap(result["title"])
+            + w_summary * overlap(result["summary"])
+            + w_tier * source_tier_score(result["source"])
+            + w_recency * recency_score(result["year"], current_year)
+        )
+
+    return score
+
+
+def rank_window(candidates, query, start, stop, weights=DEFAULT_WEIGHTS):
+    """
+    Returns the results at ranked positions [start, stop) from an iterable of candidates.
+    Uses a size-`stop` heap, so the cost is O(n log stop); ties keep candidate order.
+    """
+    return heapq.nlargest(stop, candidates, key=make_scorer(query, weights))[start:stop]
@@ -0,0 +1,305 @@
+"""
+Resilience wrappers for calls to an unreliable upstream (the Gemini API).
+
+  * CircuitBreaker: after `failure_threshold` consecutive failures the circuit opens and
+    calls fail fast for `reset_timeout` seconds; then one probe call is let through
+    (half-open), and its outcome closes or reopens the circuit.
+  * Retries: transient errors (429, 5xx, network) are retried a bounded number of times
+    with "full jitter" exponential backoff, so clients don't retry in lockstep.
+  * Hedging: if a call is slower than the recent `hedge_percentile` latency, a second,
+    identical call is started and whichever finishes first wins.
+  * Timeouts: an attempt still running after `timeout` seconds is abandoned with a
+    TimeoutError, a transient failure like any other, so a hung upstream opens the circuit.
+
+ResilientCaller combines the three around one callable, and around its coroutine twin
+(call_async) with the same breaker, so sync and async calls share one view of the upstream.
+"""
+import asyncio
+import collections
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit is open."""
+
+
+def is_api_error(error):
+    """
+    Whether an error is a google.genai APIError. Checked without importing the SDK: if it
+    hasn't been imported yet, nothing can have raised one.
+    """
+    errors = sys.modules.get("google.genai.errors")
+    return errors is not None and isinstance(error, errors.APIError)
+
+
+def is_transient(error):
+    """Errors worth retrying (and counting against the breaker): rate limits, server errors, network failures."""
+    if is_api_error(error):
+        return error.code == 429 or error.code >= 500
+    return isinstance(error, (OSError, TimeoutError)) or type(error).__module__.startswith(("httpx", "httpcore"))
+
+
+class CircuitBreaker:
+    def __init__(self, name="upstream", failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.transitions = collections.Counter()  # new state -> count
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go ahead now. In the half-open state only one probe call is allowed."""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    return False
+                self._move(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def available(self):
+        """
+        Whether allow() would let a call through now, without moving the breaker or taking the
+        probe: closed, half-open with no probe out, or open for at least reset_timeout.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                return self.clock() - self.opened_at >= self.reset_timeout
+            return not (self.state == HALF_OPEN and self._probing)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._move(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+                if self.state != OPEN:
+                    self._move(OPEN)
+
+    def release(self):
+        """Ends a call that neither succeeded nor failed transiently (e.g. a bad request)."""
+        with self._lock:
+            self._probing = False
+
+    def _move(self, state):
+        print(f"{self.name} circuit breaker: {self.state} -> {state}")
+        self.state = state
+        self.transitions[state] += 1
+
+
+def backoff_delay(attempt, base_delay, max_delay, rng=random):
+    """Full-jitter backoff: uniform in [0, min(max_delay, base_delay * 2**attempt)]."""
+    return rng.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+class LatencyTracker:
+    """Recent call latencies, for picking the hedging delay."""
+
+    def __init__(self, window=200):
+        self._samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p, min_samples=20):
+        """The p-th percentile of recent latencies, or None until there are min_samples of them."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+
+class ResilientCaller:
+    """
+    Calls `func(*args, **kwargs)` behind a circuit breaker, with retries, optional hedging
+    and an optional per-attempt `timeout` in seconds. Hedging and timeouts need `executor` (a
+    pool the caller itself does not run on, or hedges could starve it); without one, calls run
+    directly in the calling thread and only `func`'s own timeouts apply. A timed-out call can't
+    be stopped in its thread, so `func` should still have a timeout of its own. `async_func` is
+    the coroutine version of `func`, used by call_async (hedges there are just more tasks, and
+    a timed-out attempt is cancelled).
+    """
+
+    def __init__(self, func, breaker=None, retries=2, base_delay=0.1, max_delay=1.0,
+                 hedge_percentile=None, executor=None, is_transient=is_transient, sleep=time.sleep,
+                 async_func=None, timeout=None):
+        self.func = func
+        self.async_func = async_func
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_percentile = hedge_percentile
+        self.executor = executor
+        self.timeout = timeout
+        self.is_transient = is_transient
+        self.sleep = sleep
+        self.latencies = LatencyTracker()
+        self.stats = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "timeouts": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError(f"{self.breaker.name} circuit is open; skipping the call.")
+        self._count("calls")
+
+        for attempt in range(self.retries + 1):
+            try:
+                result = self._attempt(args, kwargs)
+            except Exception as e:
+                if not self.is_transient(e):
+                    self.breaker.release()
+                    raise
+                if attempt == self.retries:
+                    self.breaker.record_failure()
+                    raise
+                self._count("retries")
+                self.sleep(backoff_delay(attempt, self.base_delay, self.max_delay))
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def call_async(self, *args, **kwargs):
+        """Coroutine version of calling the caller: same breaker, retries and hedging policy."""
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError(f"{self.breaker.name} circuit is open; skipping the call.")
+        self._count("calls")
+
+        for attempt in range(self.retries + 1):
+            try:
+                result = await self._attempt_async(args, kwargs)
+            except Exception as e:
+                if not self.is_transient(e):
+                    self.breaker.release()
+                    raise
+                if attempt == self.retries:
+                    self.breaker.record_failure()
+                    raise
+                self._count("retries")
+                await asyncio.sleep(backoff_delay(attempt, self.base_delay, self.max_delay))
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def _attempt_async(self, args, kwargs):
+        if self.timeout is None:
+            return await self._hedged_async(args, kwargs)
+        try:
+            return await asyncio.wait_for(self._hedged_async(args, kwargs), self.timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out() from None
+
+    async def _hedged_async(self, args, kwargs):
+        hedge_after = self.latencies.percentile(self.hedge_percentile) if self.hedge_percentile is not None else None
+        primary = asyncio.ensure_future(self._timed_async(args, kwargs))
+        pending = {primary}
+        error = None
+        try:
+            if hedge_after is None:
+                return await primary
+            done, pending = await asyncio.wait(pending, timeout=hedge_after)
+            if done:
+                return primary.result()
+
+            self._count("hedges")
+            hedge = asyncio.ensure_future(self._timed_async(args, kwargs))
+            pending.add(hedge)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The loser's result is not needed (nor a timed-out attempt's); cancelling frees its connection
+            for task in pending:
+                task.cancel()
+
+    async def _timed_async(self, args, kwargs):
+        started = time.perf_counter()
+        result = await self.async_func(*args, **kwargs)
+        self.latencies.add(time.perf_counter() - started)
+        return result
+
+    def _attempt(self, args, kwargs):
+        hedge_after = None
+        if self.hedge_percentile is not None and self.executor is not None:
+            hedge_after = self.latencies.percentile(self.hedge_percentile)
+        if self.executor is None or (hedge_after is None and self.timeout is None):
+            return self._timed(args, kwargs)
+
+        started = time.monotonic()
+        deadline = None if self.timeout is None else started + self.timeout
+        hedge_at = None if hedge_after is None else started + hedge_after
+        primary = self.executor.submit(self._timed, args, kwargs)
+        pending = {primary}
+        error = None
+        try:
+            while pending:
+                wake = min([t for t in (deadline, hedge_at) if t is not None], default=None)
+                done, pending = wait(pending, timeout=None if wake is None else max(0.0, wake - time.monotonic()),
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is not primary:
+                            self._count("hedge_wins")
+                        return future.result()
+                    error = future.exception()
+                if not pending:
+                    break
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    raise self._timed_out()
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    self._count("hedges")
+                    pending.add(self.executor.submit(self._timed, args, kwargs))
+            raise error
+        finally:
+            # Drops calls still queued for a thread; one already running is left to finish on its own
+            for future in pending:
+                future.cancel()
+
+    def _timed(self, args, kwargs):
+        started = time.perf_counter()
+        result = self.func(*args, **kwargs)
+        self.latencies.add(time.perf_counter() - started)
+        return result
+
+    def _timed_out(self):
+        self._count("timeouts")
+        return TimeoutError(f"{self.breaker.name} call timed out after {self.timeout:g} s.")
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
@@ -0,0 +1,203 @@
+"""
+Result stores used to look up search results by slug (e.g. from the /article route).
+
+Two backends share one small interface:
+  * MemoryResultStore - in-process, LRU-bounded with per-entry TTL.
+  * SQLiteResultStore - a WAL-mode SQLite file shared by every worker process on the box.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+# -------------------------------------------------------------------------
+# Interface
+# -------------------------------------------------------------------------
+
+class ResultStore(ABC):
+    """
+    Key/value store for result records (plain JSON-serializable dicts).
+    Entries expire after `ttl` seconds and the store never holds more than `max_entries`.
+    """
+
+    def __init__(self, max_entries=10000, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    @abstractmethod
+    def get(self, key):
+        """Returns the stored value, or None if it is missing or expired."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        """Stores a value; `ttl` overrides the store's default lifetime."""
+        self.set_many([(key, value)], ttl=ttl)
+
+    @abstractmethod
+    def set_many(self, items, ttl=None):
+        """Stores several (key, value) pairs at once."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key):
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def __len__(self):
+        raise NotImplementedError
+
+    def _expiry(self, ttl):
+        return time.time() + (self.ttl if ttl is None else ttl)
+
+
+# -------------------------------------------------------------------------
+# In-process backend
+# -------------------------------------------------------------------------
+
+class MemoryResultStore(ResultStore):
+    """
+    Thread-safe LRU + TTL store. Only visible to the process that owns it.
+    """
+
+    def __init__(self, max_entries=10000, ttl=3600):
+        super().__init__(max_entries, ttl)
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set_many(self, items, ttl=None):
+        expires_at = self._expiry(ttl)
+        with self._lock:
+            for key, value in items:
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+# -------------------------------------------------------------------------
+# Cross-process backend
+# -------------------------------------------------------------------------
+
+class SQLiteResultStore(ResultStore):
+    """
+    Store backed by a SQLite file in WAL mode, so every gunicorn worker on the
+    host reads and writes the same entries without an outside service.
+    Eviction drops expired rows first, then the least recently written ones.
+    """
+
+    # Pruning runs once every this many writes to keep the write path cheap.
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, max_entries=10000, ttl=3600):
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " written_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_written_at ON results (written_at)")
+
+    def _connect(self):
+        """Returns this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set_many(self, items, ttl=None):
+        now = time.time()
+        expires_at = self._expiry(ttl)
+        rows = [(key, json.dumps(value), expires_at, now) for key, value in items]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO results (key, value, expires_at, written_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        with self._writes_lock:
+            self._writes += len(rows)
+            due = self._writes >= self.PRUNE_EVERY
+            if due:
+                self._writes = 0
+        if due:
+            self.prune()
+
+    def prune(self):
+        """Removes expired rows, then the oldest rows beyond `max_entries`."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results WHERE expires_at < ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                " SELECT key FROM results ORDER BY written_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+def create_result_store(backend, path=None, max_entries=10000, ttl=3600):
+    """Builds the result store selected by configuration ('memory' or 'sqlite')."""
+    if backend == "memory":
+        return MemoryResultStore(max_entries=max_entries, ttl=ttl)
+    if backend == "sqlite":
+        return SQLiteResultStore(path, max_entries=max_entries, ttl=ttl)
+    raise ValueError(f"Unknown result store backend: {backend!r}")
@@ -0,0 +1,426 @@
+"""
+Local full-text search for MindWork: an on-disk inverted index ranked with BM25.
+
+Build an index from a JSONL file (one document per line) or a directory of .txt/.md files:
+    python search_index.py build corpus.jsonl index/
+and try it from the command line:
+    python search_index.py query index/ "machine learning" -k 10
+
+Index layout (all arrays in native byte order, memory-mapped at load time):
+    meta.json          document count, average length, BM25 parameters
+    terms.bin          every term, UTF-8, sorted bytewise and concatenated
+    terms.idx          uint64 start offset of each term in terms.bin (+ end sentinel)
+    postings.idx       uint64 start of each term's postings (+ end sentinel)
+    postings_docs.bin  uint32 document ids
+    postings_tfs.bin   uint16 term frequencies
+    doc_norms.bin      float32 k1 * (1 - b + b * doc_len / avg_doc_len) per document
+    docs.bin           one JSON record per document (title, author, year, source, subject, summary)
+    docs.idx           uint64 start offset of each record in docs.bin (+ end sentinel)
+    facets.json        facet values, and facets.bin their bitmaps over the documents (see facets.py)
+
+Each posting list is stored in descending order of its BM25 contribution, so a query can
+stop after the best `postings_budget` entries of a very common term and still return the
+documents that matter most for it. A deeper page reads further, until it has enough hits.
+"""
+import argparse
+import heapq
+import itertools
+import json
+import marshal
+import math
+import mmap
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from operator import itemgetter
+
+from facets import FacetIndex, FacetIndexBuilder, bitmap_from_flags, bitmap_positions, popcount
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+MAX_TOKEN_LENGTH = 64
+MAX_TF = 0xffff
+SUMMARY_LENGTH = 300
+INDEX_VERSION = 1
+
+
+def tokenize(text):
+    """Lowercased word tokens of a text."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if len(token) <= MAX_TOKEN_LENGTH]
+
+
+# -------------------------------------------------------------------------
+# Corpus Readers
+# -------------------------------------------------------------------------
+
+def read_corpus(path):
+    """
+    Yields (record, text) for every document of a corpus.
+    `record` holds the fields shown in search results; `text` is what gets indexed.
+    """
+    if os.path.isdir(path):
+        yield from _read_directory(path)
+    else:
+        yield from _read_jsonl(path)
+
+
+def _read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            doc = json.loads(line)
+            body = doc.get("body") or doc.get("text") or doc.get("content") or ""
+            summary = doc.get("summary") or body[:SUMMARY_LENGTH]
+            record = {
+                "title": doc.get("title") or summary[:80] or "Untitled",
+                "author": doc.get("author") or "Unknown",
+                "year": doc.get("year") or "",
+                "source": doc.get("source") or doc.get("url") or "Local Corpus",
+                "subject": doc.get("subject") or doc.get("category") or "",
+                "summary": summary,
+            }
+            yield record, f"{record['title']} {summary} {body}"
+
+
+def _read_directory(path):
+    for root, _dirs, files in os.walk(path):
+        for name in sorted(files):
+            if not name.endswith((".txt", ".md")):
+                continue
+            file_path = os.path.join(root, name)
+            with open(file_path, encoding="utf-8", errors="replace") as f:
+                body = f.read()
+            lines = body.strip().splitlines()
+            title = lines[0].strip("# ").strip() if lines else os.path.splitext(name)[0]
+            record = {
+                "title": title,
+                "author": "Unknown",
+                "year": "",
+                "source": os.path.relpath(file_path, path),
+                "subject": "",
+                "summary": " ".join(lines[1:])[:SUMMARY_LENGTH],
+            }
+            yield record, body
+
+
+# -------------------------------------------------------------------------
+# Index Builder
+# -------------------------------------------------------------------------
+
+def _write_run(block, run_path):
+    """Writes one in-memory block of postings to disk, sorted by term."""
+    with open(run_path, "wb") as f:
+        for term in sorted(block):
+            docs, tfs = block[term]
+            marshal.dump((term, docs.tobytes(), tfs.tobytes()), f)
+
+
+def _read_run(run_path):
+    with open(run_path, "rb") as f:
+        while True:
+            try:
+                yield marshal.load(f)
+            except EOFError:
+                return
+
+
+def build_index(corpus_path, index_dir, block_docs=200000, k1=1.2, b=0.75):
+    """
+    Builds a BM25 index for a corpus. Postings are collected in blocks of `block_docs`
+    documents, spilled to sorted run files and merged at the end, so memory stays
+    bounded by the block size rather than the corpus size. The facet bitmaps are built
+    alongside, at one bit per document and facet value.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    run_dir = tempfile.mkdtemp(prefix="mindwork-index-", dir=index_dir)
+    run_paths = []
+    doc_lens = array("I")
+    doc_offsets = array("Q", [0])
+    block = {}
+    facets = FacetIndexBuilder()
+
+    with open(os.path.join(index_dir, "docs.bin"), "wb") as docs_file:
+        for doc_id, (record, text) in enumerate(read_corpus(corpus_path)):
+            encoded = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+            docs_file.write(encoded)
+            doc_offsets.append(doc_offsets[-1] + len(encoded))
+            facets.add(record)
+
+            tokens = tokenize(text)
+            doc_lens.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings = block.get(token)
+                if postings is None:
+                    postings = block[token] = (array("I"), array("H"))
+                postings[0].append(doc_id)
+                postings[1].append(min(tf, MAX_TF))
+
+            if (doc_id + 1) % block_docs == 0:
+                run_paths.append(os.path.join(run_dir, f"run-{len(run_paths)}"))
+                _write_run(block, run_paths[-1])
+                block = {}
+    if block:
+        run_paths.append(os.path.join(run_dir, f"run-{len(run_paths)}"))
+        _write_run(block, run_paths[-1])
+
+    doc_count = len(doc_lens)
+    avg_doc_len = (sum(doc_lens) / doc_count) if doc_count else 0.0
+    norms = array("f", (k1 * (1 - b + b * length / avg_doc_len) if avg_doc_len else k1 for length in doc_lens))
+
+    with open(os.path.join(index_dir, "docs.idx"), "wb") as f:
+        doc_offsets.tofile(f)
+    with open(os.path.join(index_dir, "doc_norms.bin"), "wb") as f:
+        norms.tofile(f)
+    facets.build().save(index_dir)
+
+    term_count = _merge_runs(run_paths, index_dir, norms, k1)
+    for run_path in run_paths:
+        os.remove(run_path)
+    os.rmdir(run_dir)
+
+    meta = {
+        "version": INDEX_VERSION,
+        "byteorder": sys.byteorder,
+        "doc_count": doc_count,
+        "term_count": term_count,
+        "avg_doc_len": avg_doc_len,
+        "k1": k1,
+        "b": b,
+    }
+    with open(os.path.join(index_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def _merge_runs(run_paths, index_dir, norms, k1):
+    """Merges sorted run files into the final term dictionary and impact-ordered postings."""
+    term_offsets = array("Q", [0])
+    posting_offsets = array("Q", [0])
+    merged = heapq.merge(*(_read_run(path) for path in run_paths), key=itemgetter(0))
+
+    with open(os.path.join(index_dir, "terms.bin"), "wb") as terms_file, \
+            open(os.path.join(index_dir, "postings_docs.bin"), "wb") as docs_file, \
+            open(os.path.join(index_dir, "postings_tfs.bin"), "wb") as tfs_file:
+        for term, parts in itertools.groupby(merged, key=itemgetter(0)):
+            docs, tfs = array("I"), array("H")
+            for _term, docs_bytes, tfs_bytes in parts:
+                docs.frombytes(docs_bytes)
+                tfs.frombytes(tfs_bytes)
+
+            # Highest BM25 contribution first (idf is the same for every posting of a term)
+            impacts = [tf * (k1 + 1) / (tf + norms[doc]) for doc, tf in zip(docs, tfs)]
+            order = sorted(range(len(docs)), key=impacts.__getitem__, reverse=True)
+            array("I", (docs[i] for i in order)).tofile(docs_file)
+            array("H", (tfs[i] for i in order)).tofile(tfs_file)
+
+            encoded = term.encode("utf-8")
+            terms_file.write(encoded)
+            term_offsets.append(term_offsets[-1] + len(encoded))
+            posting_offsets.append(posting_offsets[-1] + len(docs))
+
+    with open(os.path.join(index_dir, "terms.idx"), "wb") as f:
+        term_offsets.tofile(f)
+    with open(os.path.join(index_dir, "postings.idx"), "wb") as f:
+        posting_offsets.tofile(f)
+    return len(term_offsets) - 1
+
+
+# -------------------------------------------------------------------------
+# Index Reader
+# -------------------------------------------------------------------------
+
+class SearchIndex:
+    """
+    A built index, memory-mapped read-only. Loading is O(1) in corpus size and the
+    pages are shared between every worker process that maps the same files.
+    """
+
+    def __init__(self, index_dir, postings_budget=5000):
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta["version"] != INDEX_VERSION or self.meta["byteorder"] != sys.byteorder:
+            raise ValueError(f"Search index at {index_dir} is incompatible; rebuild it.")
+
+        self.index_dir = index_dir
+        self.doc_count = self.meta["doc_count"]
+        self.avg_doc_len = self.meta["avg_doc_len"]
+        self.k1 = self.meta["k1"]
+        # Postings read per query term; 0 reads every posting (exact BM25)
+        self.postings_budget = postings_budget
+        self._maps = []
+
+        self.terms = self._map("terms.bin")
+        self.term_offsets = self._map("terms.idx", "Q")
+        self.posting_offsets = self._map("postings.idx", "Q")
+        self.posting_docs = self._map("postings_docs.bin", "I")
+        self.posting_tfs = self._map("postings_tfs.bin", "H")
+        self.doc_norms = self._map("doc_norms.bin", "f")
+        self.docs = self._map("docs.bin")
+        self.doc_offsets = self._map("docs.idx", "Q")
+        self._facets = None
+        self._facets_lock = threading.Lock()
+
+    def _map(self, name, typecode=None):
+        with open(os.path.join(self.index_dir, name), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                view = memoryview(b"")
+            else:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps.append(mapped)
+                view = memoryview(mapped)
+        return view.cast(typecode) if typecode else view
+
+    def term_id(self, term):
+        """Binary search of the sorted term dictionary; None if the term is not indexed."""
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self.term_offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            candidate = bytes(self.terms[self.term_offsets[mid]:self.term_offsets[mid + 1]])
+            if candidate < key:
+                lo = mid + 1
+            elif candidate > key:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    @property
+    def facets(self):
+        """
+        The FacetIndex over the documents, read on first use. Indexes built before facets
+        existed don't have one on disk; it is then computed from the stored records.
+        """
+        with self._facets_lock:
+            if self._facets is None:
+                if os.path.exists(os.path.join(self.index_dir, "facets.json")):
+                    self._facets = FacetIndex.load(self.index_dir)
+                else:
+                    print(f"Search index at {self.index_dir} has no facet bitmaps; computing them (rebuild the index to store them).")
+                    self._facets = FacetIndex.from_records(self.document(doc_id) for doc_id in range(self.doc_count))
+            return self._facets
+
+    def search(self, query, top_k=10, allowed=None):
+        """
+        Returns (scored, exact, [(score, doc_id), ...]) with the `top_k` best BM25 scores first,
+        among the documents set in the `allowed` bitmap if one is given. `scored` counts the
+        (allowed) documents scored; it is every match when `exact`, and a lower bound when the
+        postings budget left postings unread.
+        """
+        scores, exact, matched = self.score(query, top_k, allowed)
+        hits = None if allowed is None else allowed & matched
+        return self.count(matched, allowed), exact, self.top(scores, top_k, hits)
+
+    def score(self, query, min_hits=0, allowed=None):
+        """
+        Returns ({doc_id: BM25 score}, exact, matched), `matched` being the bitmap of the scored
+        documents. Each term's postings are read up to the postings budget; while that scores
+        fewer than `min_hits` (allowed) documents and postings are left, the budget is doubled
+        and the next postings are read. `exact` is False when some postings were never read,
+        so some matching documents have no score.
+        """
+        k1_plus_1 = self.k1 + 1
+        norms = self.doc_norms
+        terms = []
+        for term in set(tokenize(query)):
+            term_id = self.term_id(term)
+            if term_id is not None:
+                start, end = self.posting_offsets[term_id], self.posting_offsets[term_id + 1]
+                df = end - start
+                terms.append((start, end, math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))))
+
+        scores = {}
+        get = scores.get
+        # One byte per document, marked as it is scored and packed into a bitmap once per round
+        flags = bytearray((self.doc_count + 7) & ~7)
+        read = 0  # postings read per term so far
+        budget = self.postings_budget
+        while True:
+            exact = True
+            for start, end, idf in terms:
+                stop = min(end, start + budget) if budget else end
+                exact = exact and stop == end
+                for doc, tf in zip(self.posting_docs[start + read:stop], self.posting_tfs[start + read:stop]):
+                    scores[doc] = get(doc, 0.0) + idf * tf * k1_plus_1 / (tf + norms[doc])
+                    flags[doc] = 1
+            if exact or allowed is None and len(scores) >= min_hits:
+                return scores, exact, bitmap_from_flags(flags)
+            if allowed is not None:
+                matched = bitmap_from_flags(flags)
+                if self.count(matched, allowed) >= min_hits:
+                    return scores, exact, matched
+            read, budget = budget, budget * 2
+
+    def count(self, matched, allowed=None):
+        """How many documents of score()'s `matched` bitmap are set in the `allowed` bitmap (all of them without one)."""
+        return popcount(matched if allowed is None else matched & allowed)
+
+    def top(self, scores, top_k, hits=None):
+        """
+        The `top_k` best of score()'s scores as [(score, doc_id), ...]. Given a `hits` bitmap
+        (`allowed & matched`), only the documents set in it are ranked, read from its set bits
+        rather than by testing every scored document.
+        """
+        if hits is None:
+            items = scores.items()
+        else:
+            items = [(doc, scores[doc]) for doc in bitmap_positions(hits, self.doc_count)]
+        top = heapq.nlargest(top_k, items, key=itemgetter(1))
+        return [(score, doc) for doc, score in top]
+
+    def document(self, doc_id):
+        """The stored record (title, author, year, source, subject, summary) of a document, or None."""
+        if not 0 <= doc_id < self.doc_count:
+            return None
+        return json.loads(bytes(self.docs[self.doc_offsets[doc_id]:self.doc_offsets[doc_id + 1]]))
+
+
+def load_search_index(index_dir, postings_budget=5000):
+    """Opens a built index, or returns None (with a warning) if there is none at `index_dir`."""
+    if not os.path.exists(os.path.join(index_dir, "meta.json")):
+        print(f"Warning: no search index found at {index_dir}. Search will use mock results.")
+        return None
+    index = SearchIndex(index_dir, postings_budget=postings_budget)
+    print(f"Search index loaded: {index.doc_count} documents, {index.meta['term_count']} terms.")
+    return index
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build or query a MindWork BM25 search index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="Index a JSONL file or a directory of .txt/.md files.")
+    build_parser.add_argument("corpus")
+    build_parser.add_argument("index_dir")
+    build_parser.add_argument("--block-docs", type=int, default=200000, help="Documents per in-memory block.")
+    build_parser.add_argument("--k1", type=float, default=1.2)
+    build_parser.add_argument("--b", type=float, default=0.75)
+
+    query_parser = commands.add_parser("query", help="Run a query and print the top documents.")
+    query_parser.add_argument("index_dir")
+    query_parser.add_argument("query")
+    query_parser.add_argument("-k", type=int, default=10)
+    query_parser.add_argument("--budget", type=int, default=5000, help="Postings read per term (0 = all).")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        started = time.perf_counter()
+        meta = build_index(args.corpus, args.index_dir, block_docs=args.block_docs, k1=args.k1, b=args.b)
+        print(f"Indexed {meta['doc_count']} documents, {meta['term_count']} terms "
+              f"in {time.perf_counter() - started:.1f}s.")
+    else:
+        index = SearchIndex(args.index_dir, postings_budget=args.budget)
+        started = time.perf_counter()
+        scored, exact, hits = index.search(args.query, top_k=args.k)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"{scored}{'' if exact else '+'} matching documents, top {len(hits)} in {elapsed_ms:.2f} ms")
+        for score, doc_id in hits:
+            print(f"  {score:7.3f}  {index.document(doc_id)['title']}")
@@ -0,0 +1,131 @@
+"""
+Startup-time profile for MindWork: what a cold-started instance spends before it can answer.
+
+Every measurement runs in a fresh interpreter, as a cold start does:
+
+  * import breakdown: `python -X importtime -c "import app"`, the slowest modules and the
+    time per top-level package;
+  * time to first response: importing the app, then its first GET / and first search
+    (in-process, Gemini replaced by an instant fake client), median of --runs;
+  * deferred: what the lazily imported Gemini SDK costs when it is first needed;
+  * with --server, the wall time from launching gunicorn/waitress until / answers.
+
+Run from the project root, for example:
+    python startup_profile.py
+    python startup_profile.py --server gunicorn --budget-ms 1500
+The command exits 1 when time to first response exceeds --budget-ms.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from loadtest import free_port, start_server, stop_server
+
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in the child interpreter; prints one JSON line of timings (ms) at the end.
+FIRST_RESPONSE_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+test_client = app.app.test_client()
+test_client.get("/")
+first_page = time.perf_counter()
+test_client.get("/search?query=startup+profile")
+first_search = time.perf_counter()
+deferred = time.perf_counter()
+import google.genai
+sdk = time.perf_counter()
+print(json.dumps({
+    "import app": (imported - started) * 1000,
+    "first GET /": (first_page - imported) * 1000,
+    "first search": (first_search - first_page) * 1000,
+    "time to first response": (first_page - started) * 1000,
+    "deferred: google.genai import": (sdk - deferred) * 1000,
+}))
+"""
+
+
+def child_env():
+    """Environment for the child processes: an instant fake Gemini client, no warm-up thread."""
+    return dict(os.environ, GEMINI_FAKE="1", FAKE_GEMINI_LATENCY_MS="0", FAKE_GEMINI_JITTER_MS="0",
+                WARMUP_ENABLED="0", PREWARM_ENABLED="0")
+
+
+def import_breakdown(top):
+    """
+    Parses -X importtime output. Returns (slowest modules by cumulative time, self time per
+    top-level package), both as [(name, ms)] sorted slowest first.
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=PROJECT_DIR,
+                               env=child_env(), capture_output=True, text=True, check=True)
+    modules = []
+    packages = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        modules.append((name, int(cumulative_us) / 1000))
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1000
+    modules.sort(key=lambda item: item[1], reverse=True)
+    return modules[:top], sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def first_response_timings(runs):
+    """Median of each timing in FIRST_RESPONSE_SCRIPT over `runs` fresh interpreters."""
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, "-c", FIRST_RESPONSE_SCRIPT], cwd=PROJECT_DIR,
+                                   env=child_env(), capture_output=True, text=True, check=True)
+        samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return {name: statistics.median(sample[name] for sample in samples) for name in samples[0]}
+
+
+def server_start_time(kind, runs):
+    """Median ms from launching the server process until / answers with 200."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        process = start_server(kind, free_port(), workers=1, threads=4, env=child_env())
+        timings.append((time.perf_counter() - started) * 1000)
+        stop_server(process)
+    return statistics.median(timings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Profile MindWork's cold start.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement (median is reported).")
+    parser.add_argument("--top", type=int, default=12, help="Modules and packages to list.")
+    parser.add_argument("--server", choices=("gunicorn", "waitress"), help="Also time a real server start.")
+    parser.add_argument("--budget-ms", type=float, help="Fail if time to first response exceeds this.")
+    args = parser.parse_args()
+
+    modules, packages = import_breakdown(args.top)
+    print("Slowest imports (cumulative ms)")
+    for name, ms in modules:
+        print(f"  {name:<48} {ms:8.1f}")
+    print("Import time by package (self ms)")
+    for name, ms in packages:
+        print(f"  {name:<48} {ms:8.1f}")
+
+    timings = first_response_timings(args.runs)
+    print(f"Startup (median of {args.runs} runs, ms)")
+    for name, ms in timings.items():
+        print(f"  {name:<48} {ms:8.1f}")
+    if args.server:
+        print(f"  {args.server + ' start until / answers':<48} {server_start_time(args.server, args.runs):8.1f}")
+
+    if args.budget_ms is not None:
+        spent = timings["time to first response"]
+        if spent > args.budget_ms:
+            print(f"Over budget: time to first response {spent:.1f} ms > {args.budget_ms:g} ms")
+            sys.exit(1)
+        print(f"Within budget: time to first response {spent:.1f} ms <= {args.budget_ms:g} ms")
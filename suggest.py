@@ -0,0 +1,280 @@
+"""
+Search-box autocomplete: a compressed prefix trie (radix tree) of popular queries.
+
+Every node keeps its own top-N completions, so a lookup is a walk down the prefix
+and never a subtree scan. Counts only grow, which lets an insert fix up the
+top-N lists along a single path and keep the trie current incrementally; when
+too many queries are tracked, the least searched are dropped and the trie is
+rebuilt from the rest.
+
+A query is only suggested once it has been searched `min_count` times, so text
+a single visitor typed once never shows up in anyone else's search box.
+"""
+import contextlib
+import heapq
+import os
+import re
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: log compaction runs without the inter-process lock
+    fcntl = None
+
+
+WHITESPACE = re.compile(r"\s+")
+MAX_QUERY_LENGTH = 100
+
+
+def normalize_query(query):
+    """The key a query is counted and completed under: lowercase, single-spaced."""
+    return WHITESPACE.sub(" ", query).strip().lower()
+
+
+class _Node:
+    __slots__ = ("edges", "top")
+
+    def __init__(self, top=()):
+        self.edges = {}  # first character -> (label, child node)
+        self.top = list(top)  # [(count, query)], highest count first
+
+
+class SuggestionTrie:
+    """
+    Radix tree of queries weighted by how often they were searched; only queries
+    searched at least `min_count` times are in it. At most 2 * `max_queries` queries
+    are counted: past that, the `max_queries` most searched are kept.
+    Writers take a lock; readers don't, because nodes and top-N lists are
+    only ever replaced whole, never modified in place.
+    """
+
+    def __init__(self, top_n=10, min_count=1, max_queries=50000):
+        self.top_n = top_n
+        self.min_count = min_count
+        self.max_queries = max_queries
+        self.root = _Node()
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, query, increment=1):
+        """Counts `increment` more searches for a query and updates the completions along its path."""
+        query = normalize_query(query)
+        if not query or len(query) > MAX_QUERY_LENGTH:
+            return
+        with self._lock:
+            count = self.counts.get(query, 0) + increment
+            self.counts[query] = count
+            if len(self.counts) > 2 * self.max_queries:
+                self._prune()
+            elif count >= self.min_count:
+                self._insert(self.root, query, count)
+
+    def _prune(self):
+        """Keeps the `max_queries` most searched queries and rebuilds the trie from them."""
+        self.counts = dict(heapq.nlargest(self.max_queries, self.counts.items(), key=lambda item: item[1]))
+        root = _Node()
+        for query, count in self.counts.items():
+            if count >= self.min_count:
+                self._insert(root, query, count)
+        self.root = root
+
+    def snapshot(self):
+        """[(query, count)] of every counted query."""
+        with self._lock:
+            return list(self.counts.items())
+
+    def _insert(self, node, query, count):
+        """Puts a query with its new count into the top-N lists along its path below `node`."""
+        self._offer(node, count, query)
+        rest = query
+        while rest:
+            edge = node.edges.get(rest[0])
+            if edge is None:
+                leaf = _Node()
+                self._offer(leaf, count, query)
+                node.edges[rest[0]] = (rest, leaf)
+                return
+            label, child = edge
+            shared = _common_prefix_length(label, rest)
+            if shared < len(label):
+                # Split the edge; the new middle node starts with the child's completions
+                middle = _Node(child.top)
+                middle.edges[label[shared]] = (label[shared:], child)
+                node.edges[rest[0]] = (label[:shared], middle)
+                child = middle
+            node = child
+            self._offer(node, count, query)
+            rest = rest[shared:]
+
+    def _offer(self, node, count, query):
+        """Puts (count, query) into a node's top-N if it belongs there."""
+        top = [entry for entry in node.top if entry[1] != query]
+        if len(top) >= self.top_n and _rank_key((count, query)) > _rank_key(top[-1]):
+            return
+        top.append((count, query))
+        top.sort(key=_rank_key)
+        node.top = top[:self.top_n]
+
+    def complete(self, prefix, limit=None):
+        """Most searched queries starting with `prefix`, most popular first."""
+        # A trailing space is kept: "machine " only completes to multi-word queries
+        prefix = WHITESPACE.sub(" ", prefix).lstrip().lower()
+        node = self.root
+        rest = prefix
+        while rest:
+            edge = node.edges.get(rest[0])
+            if edge is None:
+                return []
+            label, child = edge
+            if rest.startswith(label):
+                rest = rest[len(label):]
+            elif label.startswith(rest):
+                rest = ""
+            else:
+                return []
+            node = child
+        return [query for _count, query in node.top[:limit or self.top_n]]
+
+    def __len__(self):
+        return len(self.counts)
+
+
+def _rank_key(entry):
+    """Orders completions by count, most searched first, then alphabetically."""
+    count, query = entry
+    return -count, query
+
+
+def _common_prefix_length(a, b):
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+
+class SearchLog:
+    """
+    Append-only file of searched queries (one per line), shared by all worker processes.
+    Each process tails the file into its own trie, so every worker suggests from all traffic.
+
+    With `max_bytes`, the log is compacted once it grows past that size: the worker that
+    notices writes its trie's counts to `<path>.snapshot` ("count<TAB>query" lines) and
+    the log starts over. A starting worker reads the snapshot and then the log, so a cold
+    start reads at most 2 * the trie's max_queries counts and about max_bytes of log.
+    """
+
+    def __init__(self, path, trie, refresh_seconds=5.0, max_bytes=None):
+        self.path = path
+        self.snapshot_path = path + ".snapshot"
+        self.trie = trie
+        self.refresh_seconds = refresh_seconds
+        self.max_bytes = max_bytes
+        self._file = None  # the log as this process last opened it; still readable after a compaction
+        self._started = False
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, query):
+        query = normalize_query(query)
+        if not query or len(query) > MAX_QUERY_LENGTH:
+            return
+        # A single short O_APPEND write, so concurrent workers never interleave lines
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, (query + "\n").encode("utf-8"))
+        finally:
+            os.close(fd)
+
+    def refresh(self, force=False):
+        """Adds queries logged since the last refresh to the trie (at most once per refresh_seconds)."""
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_seconds:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._last_refresh = now
+            if not self._started:
+                self._started = True
+                if self.max_bytes:
+                    self._load_snapshot()
+            self._follow()
+            if self.max_bytes and self._file is not None and self._file.tell() > self.max_bytes:
+                self._compact()
+        finally:
+            self._lock.release()
+
+    def _follow(self):
+        """Reads new lines; after another process compacted the log, finishes the old file and opens the new one."""
+        if self._file is not None:
+            # Checked before reading, so lines written just before a move are still read
+            try:
+                moved = os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+            except FileNotFoundError:
+                moved = True
+            self._drain()
+            if not moved:
+                return
+            self._file.close()
+            self._file = None
+        try:
+            self._file = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        self._drain()
+
+    def _drain(self):
+        data = self._file.read()
+        # Leave a partially written last line for the next refresh
+        complete = data[:data.rfind(b"\n") + 1]
+        self._file.seek(len(complete) - len(data), os.SEEK_CUR)
+        for line in complete.decode("utf-8", errors="replace").splitlines():
+            self.trie.add(line)
+
+    def _load_snapshot(self):
+        try:
+            snapshot = open(self.snapshot_path, encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with snapshot:
+            for line in snapshot:
+                count, _tab, query = line.rstrip("\n").partition("\t")
+                if query and count.isdigit():
+                    self.trie.add(query, int(count))
+
+    def _compact(self):
+        """Moves the log aside, writes the snapshot (this trie has read all of it) and deletes the old log."""
+        with _exclusive_lock(self.path + ".lock") as locked:
+            if not locked or os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino:
+                return  # another process is compacting, or just did
+            rotated = self.path + ".compacting"
+            os.replace(self.path, rotated)
+            self._drain()  # lines appended until the move
+            temporary = self.snapshot_path + ".tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                for query, count in self.trie.snapshot():
+                    f.write(f"{count}\t{query}\n")
+            os.replace(temporary, self.snapshot_path)
+            os.remove(rotated)
+        print(f"Compacted the search log into {self.snapshot_path}.")
+
+
+@contextlib.contextmanager
+def _exclusive_lock(path):
+    """A non-blocking inter-process lock on a file; yields whether it was acquired."""
+    if fcntl is None:
+        yield True
+        return
+    with open(path, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
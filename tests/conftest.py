@@ -0,0 +1,17 @@
+"""
+Test setup: the app is imported with mock Gemini results (no API key), no warm-up thread,
+and a result store and search log of its own, so tests never touch a deployment's files.
+"""
+import os
+import sys
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+TEST_DATA_DIR = tempfile.mkdtemp(prefix="mindwork-tests-")
+os.environ.pop("GEMINI_API_KEY", None)
+os.environ.setdefault("WARMUP_ENABLED", "0")
+os.environ.setdefault("PREWARM_ENABLED", "0")
+os.environ.setdefault("RESULT_STORE_PATH", os.path.join(TEST_DATA_DIR, "results.sqlite3"))
@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+
+import pytest
+
+import app as mindwork
+from gemini_cache import GeminiResultCache
+from result_store import MemoryResultStore
+
+BATCH_AUTH = {"Authorization": "Bearer batch-secret"}
+
+
+@pytest.fixture
+def batch_client(monkeypatch):
+    monkeypatch.setattr(mindwork, "BATCH_TOKEN", "batch-secret")
+    return mindwork.app.test_client()
+
+
+def test_api_search_normalizes_the_query_like_search():
+    client = mindwork.app.test_client()
+    spaced = client.get("/api/search", query_string={"query": "  machine \t learning  "}).get_json()
+    plain = client.get("/api/search", query_string={"query": "machine learning"}).get_json()
+    assert spaced["query"] == "machine learning"
+    assert spaced["results"] == plain["results"]
+
+
+@pytest.mark.parametrize("filters", [
+    {"tier": [1]},
+    {"tier": {"top": True}},
+    {"ai": "yes"},
+    {"year_from": "x"},
+    {"year_to": True},
+    {"colour": "red"},
+])
+def test_batch_rejects_malformed_filters(batch_client, filters):
+    response = batch_client.post("/api/search/batch", json={"queries": ["python"], "filters": filters}, headers=BATCH_AUTH)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_batch_applies_json_filters(batch_client):
+    lines = batch_client.post("/api/search/batch", headers=BATCH_AUTH, json={
+        "queries": ["python"], "per_page": 50,
+        "filters": {"ai": False, "year_from": "2020", "tier": "top"},
+    }).get_data(as_text=True).splitlines()
+    data = json.loads(lines[0])
+    assert data["filters"] == {"ai": "0", "year_from": 2020, "tier": ["top"]}
+    assert data["results"]
+    assert all(int(result["year"]) >= 2020 and result["source"].startswith("Top-Tier Site") for result in data["results"])
+
+
+def test_batch_needs_its_token(batch_client, monkeypatch):
+    body = {"queries": ["python"]}
+    assert batch_client.post("/api/search/batch", json=body).status_code == 403
+    assert batch_client.post("/api/search/batch", json=body, headers={"Authorization": "Bearer nope"}).status_code == 403
+    assert batch_client.post("/api/search/batch", json=body, headers=BATCH_AUTH).status_code == 200
+    monkeypatch.setattr(mindwork, "BATCH_TOKEN", None)
+    assert batch_client.post("/api/search/batch", json=body, headers=BATCH_AUTH).status_code == 404
+
+
+def test_batch_lookups_are_bounded_and_dropped_when_abandoned(monkeypatch):
+    release = threading.Event()
+    fetched = []
+
+    def fetch(query):
+        fetched.append(query)
+        release.wait(5)
+        return {"title": query}
+
+    monkeypatch.setattr(mindwork, "GEMINI_CACHE", GeminiResultCache(fetch, MemoryResultStore()))
+    monkeypatch.setattr(mindwork, "GEMINI_CLIENT_READY", True)
+    cancelled = threading.Event()
+    lookups = [mindwork.start_batch_lookup(f"query {n}", 1, cancelled) for n in range(6)]
+    time.sleep(0.1)
+    assert len(fetched) == mindwork.BATCH_GEMINI_WORKERS
+
+    # The client goes away: queued lookups never call the API
+    cancelled.set()
+    release.set()
+    for future, _deadline in lookups:
+        future.result(timeout=5)
+    assert len(fetched) == mindwork.BATCH_GEMINI_WORKERS
+
+
+def test_batch_lookups_past_the_deadline_make_no_call(monkeypatch):
+    fetched = []
+    cache = GeminiResultCache(lambda query: fetched.append(query) or {"title": query}, MemoryResultStore())
+    monkeypatch.setattr(mindwork, "GEMINI_CACHE", cache)
+    assert mindwork.batch_gemini_lookup("late", time.monotonic() - 1, threading.Event()) is None
+    assert mindwork.batch_gemini_lookup("on time", time.monotonic() + 5, threading.Event()) == {"title": "on time"}
+    assert fetched == ["on time"]
@@ -0,0 +1,37 @@
+import pytest
+
+import app as mindwork
+
+
+@pytest.mark.parametrize("seed", [0, 1, 42, 0xFFFF])
+@pytest.mark.parametrize("index", [0, 5, 57, mindwork.MOCK_RESULT_TOTAL - 1])
+def test_a_slug_rebuilds_its_record(index, seed):
+    result = mindwork.generate_general_result("machine learning", index, seed)
+    assert mindwork.rebuild_general_result(result["slug"], "machine learning") == result
+
+
+def test_slugs_are_the_same_in_every_listing():
+    shown = list(mindwork.generate_general_results("python"))
+    assert [result["slug"] for result in shown] == [result["slug"] for result in mindwork.generate_general_results("python")]
+    assert len({result["slug"] for result in shown}) == mindwork.MOCK_RESULT_TOTAL
+
+
+def test_article_page_shows_the_rebuilt_result():
+    result = mindwork.generate_general_result("python", 1)
+    response = mindwork.app.test_client().get(f"/article/{result['slug']}", query_string={"query": "python"})
+    assert response.status_code == 200
+    assert result["title"] in response.get_data(as_text=True)
+
+
+def test_slug_of_another_query_is_not_found():
+    slug = mindwork.generate_general_result("python", 1)["slug"]
+    assert mindwork.rebuild_general_result(slug, "rust") is None
+    response = mindwork.app.test_client().get(f"/article/{slug}", query_string={"query": "rust"})
+    assert response.status_code == 404
+    assert "Article Not Found" in response.get_data(as_text=True)
+
+
+def test_slug_past_the_last_result_is_not_found():
+    slug = mindwork.generate_general_result("python", mindwork.MOCK_RESULT_TOTAL)["slug"]
+    assert mindwork.rebuild_general_result(slug, "python") is None
+    assert mindwork.app.test_client().get(f"/article/{slug}", query_string={"query": "python"}).status_code == 404
@@ -0,0 +1,30 @@
+import pytest
+
+from canonical import NEAR_DUPLICATE_THRESHOLD, QueryCanonicalizer
+
+DIFFERENT_MEANINGS = [
+    ("history of world war 1", "history of world war 2"),
+    ("symptoms of type 1 diabetes in adults", "symptoms of type 2 diabetes in adults"),
+    ("vitamin d deficiency symptoms", "vitamin b deficiency symptoms"),
+    ("how to install windows 10", "how to install windows 11"),
+]
+
+
+def test_exact_canonicalization_is_on_by_default():
+    keys = QueryCanonicalizer()
+    assert keys("What is  Machine Learning?") == keys("machine learning")
+    assert keys("introduction quantum computings") != keys("introduction to quantum computing")
+
+
+@pytest.mark.parametrize("threshold", [None, NEAR_DUPLICATE_THRESHOLD, 0.8, 0.5])
+@pytest.mark.parametrize("first, second", DIFFERENT_MEANINGS)
+def test_numbers_and_single_letters_are_never_merged(first, second, threshold):
+    keys = QueryCanonicalizer(threshold=threshold)
+    assert keys(first) != keys(second)
+
+
+def test_near_duplicates_merge_when_enabled():
+    keys = QueryCanonicalizer(threshold=NEAR_DUPLICATE_THRESHOLD)
+    first = keys("introduction to quantum computing")
+    assert keys("introduction quantum computings") == first
+    assert keys.stats == {"new_keys": 1, "near_duplicates": 1}
@@ -0,0 +1,49 @@
+import app as mindwork
+
+
+def precompressed_requests(endpoint):
+    """How many GET / 200 responses REQUEST_SECONDS has recorded for the endpoint."""
+    series = mindwork.REQUEST_SECONDS._series.get((endpoint, "GET", "200"))
+    return series[-1] if series else 0
+
+
+def test_precompressed_pages_drop_per_request_headers():
+    client = mindwork.app.test_client()
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Server-Timing" not in response.headers
+    assert "Date" not in response.headers
+
+
+def test_precompressed_pages_are_counted_in_request_metrics():
+    endpoint = mindwork.PRECOMPRESSED_ENDPOINTS["/"]
+    before = precompressed_requests(endpoint)
+    client = mindwork.app.test_client()
+    client.get("/")
+    client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert precompressed_requests(endpoint) == before + 2
+
+
+def test_not_modified_matches_the_compressed_response():
+    client = mindwork.app.test_client()
+    url = "/api/search?query=python&per_page=50"
+    first = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert first.headers["ETag"].endswith('-gzip"')
+
+    again = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == first.headers["ETag"]
+    assert again.headers["Vary"] == "Accept-Encoding"
+
+
+def test_not_modified_of_an_uncompressed_response_keeps_its_etag():
+    client = mindwork.app.test_client()
+    url = "/api/search?query=python&per_page=50"
+    first = client.get(url)
+    assert "Content-Encoding" not in first.headers
+
+    again = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == first.headers["ETag"]
+    assert "Accept-Encoding" in again.headers["Vary"]
@@ -0,0 +1,40 @@
+from facets import MAX_VALUES, OTHER_VALUES, FacetIndex, FacetIndexBuilder, filter_predicates
+
+
+def subject_records(count):
+    """Subject i appears count - i times, so subject 0 is the most frequent."""
+    return [{"title": f"Record {i}", "subject": f"Subject {i}"} for i in range(count) for _ in range(count - i)]
+
+
+def test_rare_subjects_share_one_bitmap():
+    records = subject_records(MAX_VALUES["subject"] + 20)
+    index = FacetIndex.from_records(records)
+    subjects = index.bitmaps["subject"]
+    assert len(subjects) == MAX_VALUES["subject"]
+    assert "Subject 0" in subjects and "Subject 69" not in subjects
+
+    other = filter_predicates({"subject": (OTHER_VALUES["subject"],)})
+    rare = sum(1 for record in records if int(record["subject"].split()[1]) >= MAX_VALUES["subject"] - 1)
+    assert index.counts({})["subject"][OTHER_VALUES["subject"]] == rare
+    assert bin(index.filter(other)).count("1") == rare
+
+
+def test_loading_an_uncapped_index_caps_it(tmp_path):
+    builder = FacetIndexBuilder(max_values={})
+    for record in subject_records(80):
+        builder.add(record)
+    builder.build().save(tmp_path)
+
+    loaded = FacetIndex.load(tmp_path)
+    capped = FacetIndexBuilder()
+    for record in subject_records(80):
+        capped.add(record)
+    assert loaded.bitmaps == capped.build().bitmaps
+
+
+def test_filter_intersects_facet_bitmaps_without_candidates():
+    records = [{"title": str(i), "year": 2000 + i % 3, "subject": "Physics" if i % 2 else "History"} for i in range(12)]
+    index = FacetIndex.from_records(records)
+    allowed = index.filter(filter_predicates({"year": (2001, 2001), "subject": ("Physics",)}))
+    assert [i for i in range(12) if allowed >> i & 1] == [1, 7]
+    assert index.filter({}) == index.everything
@@ -0,0 +1,35 @@
+import app as mindwork
+from fragment_cache import FragmentCache
+
+
+def test_hits_misses_and_lru_eviction():
+    cache = FragmentCache(max_entries=2)
+    renders = []
+
+    def render(key):
+        return lambda: renders.append(key) or f"<li>{key}</li>"
+
+    assert cache.get_or_render("a", render("a")) == "<li>a</li>"
+    assert cache.get_or_render("b", render("b")) == "<li>b</li>"
+    assert cache.get_or_render("a", render("a")) == "<li>a</li>"  # hit; "b" is now least recent
+    cache.get_or_render("c", render("c"))
+    assert cache.get_or_render("a", render("a")) == "<li>a</li>"
+    cache.get_or_render("b", render("b"))
+    assert renders == ["a", "b", "c", "b"]
+    assert cache.stats == {"hits": 2, "misses": 4, "evictions": 2}
+    assert len(cache) == 2
+
+
+def test_a_new_card_version_misses_instead_of_serving_old_markup(monkeypatch):
+    cache = FragmentCache()
+    monkeypatch.setattr(mindwork, "FRAGMENT_CACHE", cache)
+    result = mindwork.generate_general_result("python", 0)
+    with mindwork.app.test_request_context("/search"):
+        first = mindwork.render_result_card(result, "python")
+        assert mindwork.render_result_card(result, "python") == first
+        assert cache.stats["misses"] == 1
+
+        monkeypatch.setattr(mindwork, "RESULT_CARD_VERSION", "changed")
+        monkeypatch.setattr(mindwork, "RESULT_CARD_MACRO", lambda result, query, extra_class: "<li>new card</li>")
+        assert mindwork.render_result_card(result, "python") == "<li>new card</li>"
+    assert cache.stats == {"hits": 1, "misses": 2, "evictions": 0}
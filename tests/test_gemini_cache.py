@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+from event_loop import EventLoopThread
+from gemini_cache import GeminiResultCache
+from result_store import MemoryResultStore
+
+
+def test_refresh_and_async_search_share_one_fetch():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch(query):
+        calls.append(("sync", query))
+        started.set()
+        release.wait()
+        return {"title": query}
+
+    async def fetch_async(query):
+        calls.append(("async", query))
+        return {"title": query}
+
+    cache = GeminiResultCache(fetch, MemoryResultStore(), fetch_async=fetch_async)
+    loop = EventLoopThread("test-loop")
+    refresh = threading.Thread(target=cache.refresh, args=("python",))
+    refresh.start()
+    assert started.wait(1)
+
+    search = loop.submit(cache.get_async("python"))
+    asyncio.run(asyncio.sleep(0.05))
+    assert not search.done()  # waiting on the refresh's call, not making its own
+    release.set()
+    assert search.result(timeout=1) == {"title": "python"}
+    refresh.join()
+    assert calls == [("sync", "python")]
+    assert cache.stats["coalesced"] == 1
+
+
+def test_sync_search_waits_for_an_async_fetch():
+    release = threading.Event()
+    calls = []
+
+    async def fetch_async(query):
+        calls.append(query)
+        await asyncio.get_running_loop().run_in_executor(None, release.wait)
+        return {"title": query}
+
+    cache = GeminiResultCache(lambda query: calls.append(query), MemoryResultStore(), fetch_async=fetch_async)
+    loop = EventLoopThread("test-loop")
+    search = loop.submit(cache.get_async("python"))
+    while not calls:
+        threading.Event().wait(0.01)
+
+    waiter = threading.Thread(target=lambda: calls.append(cache.get("python")))
+    waiter.start()
+    waiter.join(0.05)
+    release.set()
+    waiter.join(1)
+    assert search.result(timeout=1) == {"title": "python"}
+    assert calls == ["python", {"title": "python"}]
+    assert cache.stats["coalesced"] == 1
@@ -0,0 +1,25 @@
+import time
+
+import pytest
+
+import app as mindwork
+from metrics import SamplingProfiler
+
+
+def test_profiler_stops_when_the_view_raises(tmp_path, monkeypatch):
+    profiler = SamplingProfiler(interval=0.001, output_dir=str(tmp_path))
+    monkeypatch.setattr(mindwork, "PROFILER", profiler)
+    monkeypatch.setattr(mindwork, "PROFILE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(mindwork, "PROFILE_SLOW_MS", 0)
+
+    def broken_view():
+        time.sleep(0.05)  # long enough to be sampled
+        raise RuntimeError("view failed")
+
+    monkeypatch.setitem(mindwork.app.view_functions, "api_search", broken_view)
+    monkeypatch.setitem(mindwork.app.config, "PROPAGATE_EXCEPTIONS", True)
+    with pytest.raises(RuntimeError):
+        mindwork.app.test_client().get("/api/search?query=python")
+
+    assert profiler._stacks == {}
+    assert list(tmp_path.iterdir()), "the slow request's profile was not written"
@@ -0,0 +1,123 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app as mindwork
+from page_cache import PageCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class HeldExecutor:
+    """Keeps submitted calls until run() is called."""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, func, *args):
+        self.calls.append((func, args))
+
+    def run(self):
+        calls, self.calls = self.calls, []
+        for func, args in calls:
+            func(*args)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def test_entries_go_fresh_stale_then_missing(clock):
+    cache = PageCache(HeldExecutor(), ttl=60, stale_ttl=600, clock=clock)
+    assert cache.get("python") == (None, False)
+
+    entry = cache.put("python", "<p>Python</p>")
+    assert cache.get("python") == (entry, True)
+    clock.now += 60
+    assert cache.get("python") == (entry, False)
+    clock.now += 599
+    assert cache.get("python") == (entry, False)
+    clock.now += 1
+    assert cache.get("python") == (None, False)
+    assert len(cache) == 0
+    assert {name: cache.stats[name] for name in ("hits", "stale_hits", "misses")} == {"hits": 1, "stale_hits": 2, "misses": 2}
+
+
+def test_a_stale_entry_is_refreshed_once(clock):
+    executor = HeldExecutor()
+    cache = PageCache(executor, ttl=60, stale_ttl=600, clock=clock)
+    cache.put("python", "<p>old</p>")
+    clock.now += 61
+    renders = []
+
+    def render():
+        renders.append(clock.now)
+        return "<p>new</p>"
+
+    for _ in range(3):
+        entry, fresh = cache.get("python")
+        assert not fresh
+        cache.refresh("python", render)
+    assert len(executor.calls) == 1
+
+    executor.run()
+    entry, fresh = cache.get("python")
+    assert fresh and entry["bodies"][None] == b"<p>new</p>"
+    assert len(renders) == 1
+    assert cache.stats["refreshes"] == 1
+
+    # Once done, the key can be refreshed again; a failed render keeps the old entry
+    cache.refresh("python", lambda: 1 / 0)
+    executor.run()
+    assert cache.get("python")[0]["bodies"][None] == b"<p>new</p>"
+    assert cache.stats["refresh_failures"] == 1
+
+
+def test_concurrent_refreshes_are_all_counted():
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        cache = PageCache(executor)
+        start = threading.Barrier(8)
+
+        def render():
+            start.wait(5)
+            return "<p>page</p>"
+
+        for key in range(200):
+            cache.refresh(key, render if key < 8 else lambda: "<p>page</p>")
+    assert cache.stats["refreshes"] == 200
+
+
+@pytest.fixture
+def cached_pages(monkeypatch):
+    cache = PageCache(HeldExecutor())
+    monkeypatch.setattr(mindwork, "PAGE_CACHE", cache)
+    client = mindwork.app.test_client()
+    for query in ("python", "rust"):
+        client.get("/search", query_string={"query": query, "stream": "0"})
+    assert len(cache) == 2
+    return cache
+
+
+def test_invalidation_needs_the_token(cached_pages, monkeypatch):
+    client = mindwork.app.test_client()
+    monkeypatch.setattr(mindwork, "PAGE_CACHE_PURGE_TOKEN", None)
+    assert client.post("/api/page-cache/invalidate").status_code == 404
+
+    monkeypatch.setattr(mindwork, "PAGE_CACHE_PURGE_TOKEN", "purge-secret")
+    assert client.post("/api/page-cache/invalidate").status_code == 403
+    assert client.post("/api/page-cache/invalidate", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    assert len(cached_pages) == 2
+
+    auth = {"Authorization": "Bearer purge-secret"}
+    response = client.post("/api/page-cache/invalidate?query=%20python%20", headers=auth)
+    assert response.get_json()["invalidated"] == 1
+    assert client.post("/api/page-cache/invalidate", headers=auth).get_json()["invalidated"] == 1
+    assert len(cached_pages) == 0
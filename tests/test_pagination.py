@@ -0,0 +1,67 @@
+import pytest
+
+import app as mindwork
+
+
+def page_slugs(client, query, page, per_page, **params):
+    data = client.get("/api/search", query_string=dict(query=query, page=page, per_page=per_page, **params)).get_json()
+    return data, [result["slug"] for result in data["results"]]
+
+
+@pytest.mark.parametrize("ordering", ["relevance", "shuffle"])
+@pytest.mark.parametrize("per_page", [10, 7, 100])
+def test_pages_are_disjoint_and_cover_every_result_once(ordering, per_page, monkeypatch):
+    monkeypatch.setattr(mindwork, "RESULT_ORDERING", ordering)
+    client = mindwork.app.test_client()
+    first, slugs = page_slugs(client, "python", 1, per_page)
+    assert first["total"] == mindwork.MOCK_RESULT_TOTAL
+    pages = [slugs] + [page_slugs(client, "python", page, per_page)[1] for page in range(2, first["page_count"] + 1)]
+
+    assert all(len(slugs) == per_page for slugs in pages[:-1])
+    every = [slug for slugs in pages for slug in slugs]
+    assert len(every) == len(set(every)) == mindwork.MOCK_RESULT_TOTAL
+    assert set(every) == {result["slug"] for result in mindwork.generate_general_results("python")}
+
+
+@pytest.mark.parametrize("params, page, per_page", [
+    ({"page": 0}, 1, mindwork.SEARCH_PER_PAGE),
+    ({"page": -3}, 1, mindwork.SEARCH_PER_PAGE),
+    ({"page": "x"}, 1, mindwork.SEARCH_PER_PAGE),
+    ({"per_page": 0}, 1, 1),
+    ({"per_page": 1000}, 1, mindwork.SEARCH_MAX_PER_PAGE),
+    ({"page": 999}, 11, 10),
+    ({"page": 3, "per_page": 1000}, 2, mindwork.SEARCH_MAX_PER_PAGE),
+])
+def test_out_of_range_pages_are_clamped(params, page, per_page):
+    data = mindwork.app.test_client().get("/api/search", query_string=dict(query="python", **params)).get_json()
+    assert (data["page"], data["per_page"]) == (page, per_page)
+    assert data["results"]
+
+
+@pytest.mark.parametrize("stream", ["0", "1"])
+def test_search_page_past_the_end_shows_the_last_page(stream):
+    client = mindwork.app.test_client()
+    _data, last = page_slugs(client, "python", 11, 10)
+    html = client.get(f"/search?query=python&page=40&stream={stream}").get_data(as_text=True)
+    assert "No results found" not in html
+    assert all(slug in html for slug in last)
+
+
+def test_relevance_ranking_is_cached_per_query(monkeypatch):
+    monkeypatch.setattr(mindwork, "RESULT_ORDERING", "relevance")
+    mindwork.ranked_order.cache_clear()
+    mindwork.result_facets("python")  # facet bitmaps are cached on their own
+    generated = []
+    generate = mindwork.generate_general_result
+    monkeypatch.setattr(mindwork, "generate_general_result",
+                        lambda query, index, *args: generated.append(index) or generate(query, index, *args))
+
+    _total, first, _facets, _approximate = mindwork.find_general_results("python", 0, 10)
+    assert len(generated) == mindwork.MOCK_RESULT_TOTAL + 10
+    del generated[:]
+    _total, second, _facets, _approximate = mindwork.find_general_results("python", 10, 20)
+    assert len(generated) == 10
+
+    score = mindwork.make_scorer("python", mindwork.RANKING_WEIGHTS)
+    scores = [score(result) for result in first + second]
+    assert scores == sorted(scores, reverse=True)
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from prewarm import Prewarmer, TrendingQueries
+from resilience import CLOSED, OPEN, CircuitBreaker, CircuitOpenError, ResilientCaller
+
+
+class HangingClient:
+    """A Gemini-like client whose calls never answer until released."""
+
+    def __init__(self):
+        self.released = threading.Event()
+        self.calls = 0
+        self.models = self
+        self.aio = self
+
+    def generate_content(self, **kwargs):
+        self.calls += 1
+        self.released.wait()
+
+    async def generate_content_async(self, **kwargs):
+        self.calls += 1
+        await asyncio.Event().wait()
+
+
+def hanging_caller(client, executor):
+    return ResilientCaller(
+        lambda client, **kwargs: client.models.generate_content(**kwargs),
+        async_func=lambda client, **kwargs: client.aio.generate_content_async(**kwargs),
+        breaker=CircuitBreaker("test", failure_threshold=2, reset_timeout=60),
+        retries=1,
+        base_delay=0,
+        max_delay=0,
+        executor=executor,
+        timeout=0.05,
+    )
+
+
+def test_hung_calls_time_out_and_open_the_breaker():
+    client = HangingClient()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        caller = hanging_caller(client, executor)
+        try:
+            for _ in range(2):
+                with pytest.raises(TimeoutError):
+                    caller(client, model="m", contents="q")
+            assert caller.breaker.state == OPEN
+            assert caller.stats["timeouts"] == 4  # two calls, each retried once
+            with pytest.raises(CircuitOpenError):
+                caller(client, model="m", contents="q")
+            assert client.calls == 4
+        finally:
+            client.released.set()
+
+
+def test_hung_async_calls_time_out_and_open_the_breaker():
+    client = HangingClient()
+    caller = hanging_caller(client, None)
+
+    async def search():
+        for _ in range(2):
+            with pytest.raises(TimeoutError):
+                await caller.call_async(client, model="m", contents="q")
+        with pytest.raises(CircuitOpenError):
+            await caller.call_async(client, model="m", contents="q")
+        # Timed-out attempts are cancelled, not left running on the loop
+        assert len(asyncio.all_tasks()) == 1
+
+    asyncio.run(search())
+    assert caller.breaker.state == OPEN
+    assert caller.stats["timeouts"] == 4
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ProbingCache:
+    """A GeminiResultCache stand-in whose refreshes go through the breaker and succeed."""
+
+    def __init__(self, breaker):
+        self.breaker = breaker
+
+    def needs_refresh(self, query, margin):
+        return True
+
+    def refresh(self, query):
+        if not self.breaker.allow():
+            return None
+        self.breaker.record_success()
+        return {"query": query}
+
+
+def test_prewarmer_probes_the_breaker_once_the_reset_timeout_passes():
+    clock = Clock()
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    trending = TrendingQueries()
+    trending.add("python")
+    warmer = Prewarmer(ProbingCache(breaker), trending, is_available=breaker.available)
+
+    assert warmer.run_once() == 0
+    assert warmer.stats["skipped_cycles"] == 1
+
+    clock.now = 30
+    assert breaker.available()
+    assert breaker.state == OPEN  # asking doesn't move the breaker
+    assert warmer.run_once() == 1
+    assert breaker.state == CLOSED
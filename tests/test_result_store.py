@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from result_store import MemoryResultStore, ResultStore, SQLiteResultStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryResultStore(max_entries=3, ttl=60)
+    return SQLiteResultStore(str(tmp_path / "results.sqlite3"), max_entries=3, ttl=60)
+
+
+def test_result_store_is_abstract():
+    with pytest.raises(TypeError):
+        ResultStore()
+
+
+def test_entries_expire_on_get(store):
+    store.set("short", {"n": 1}, ttl=0.05)
+    store.set("long", {"n": 2})
+    assert store.get("short") == {"n": 1}
+    time.sleep(0.1)
+    assert store.get("short") is None
+    assert store.get("long") == {"n": 2}
+
+
+def test_memory_store_evicts_the_least_recently_used():
+    store = MemoryResultStore(max_entries=3, ttl=60)
+    for key in "abc":
+        store.set(key, key)
+    assert store.get("a") == "a"  # now the most recently used
+    store.set("d", "d")
+    assert store.get("b") is None
+    assert [store.get(key) for key in "acd"] == ["a", "c", "d"]
+    store.set_many([("e", "e"), ("f", "f")])
+    assert len(store) == 3
+    assert [store.get(key) for key in "adef"] == [None, "d", "e", "f"]
+
+
+def test_sqlite_prune_drops_expired_then_oldest_rows(tmp_path):
+    store = SQLiteResultStore(str(tmp_path / "results.sqlite3"), max_entries=3, ttl=60)
+    store.set("expired", 0, ttl=-1)
+    for n in range(5):
+        store.set(f"key {n}", n)
+        time.sleep(0.002)  # distinct written_at
+    assert len(store) == 6
+
+    store.prune()
+    assert len(store) == 3
+    assert [store.get(f"key {n}") for n in range(5)] == [None, None, 2, 3, 4]
+
+
+def test_sqlite_writes_are_seen_by_other_connections(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    writer, reader = SQLiteResultStore(path), SQLiteResultStore(path)
+    writer.set("python", {"title": "Python"})
+    assert reader.get("python") == {"title": "Python"}
+
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(writer.get("python")))  # the thread's own connection
+    thread.start()
+    thread.join()
+    assert seen == [{"title": "Python"}]
+
+    reader.delete("python")
+    assert writer.get("python") is None
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+import app as mindwork
+from facets import filter_predicates
+from search_index import SearchIndex, build_index
+
+
+@pytest.fixture
+def budgeted_index(tmp_path):
+    """300 documents matching "learning", read 20 postings at a time."""
+    corpus = tmp_path / "corpus.jsonl"
+    with open(corpus, "w", encoding="utf-8") as f:
+        for doc in range(300):
+            f.write(json.dumps({"title": f"Document {doc}", "year": 2000 + doc % 25,
+                                "body": "learning " * (1 + doc % 7) + f"filler{doc}"}) + "\n")
+    build_index(str(corpus), str(tmp_path / "index"))
+    return SearchIndex(str(tmp_path / "index"), postings_budget=20)
+
+
+def test_search_reads_past_the_budget_for_deep_pages(budgeted_index):
+    scored, exact, hits = budgeted_index.search("learning", top_k=50)
+    assert len(hits) == 50
+    assert scored >= 50
+    assert not exact
+
+
+def test_search_is_exact_once_every_posting_is_read(budgeted_index):
+    scored, exact, hits = budgeted_index.search("learning", top_k=300)
+    assert (scored, exact, len(hits)) == (300, True, 300)
+
+
+def test_every_page_up_to_the_total_has_results(budgeted_index, monkeypatch):
+    monkeypatch.setattr(mindwork, "SEARCH_INDEX", budgeted_index)
+    client = mindwork.app.test_client()
+
+    first = client.get("/api/search?query=learning&per_page=10").get_json()
+    assert first["total_approximate"]
+    assert first["total"] == 20
+
+    page, page_count = 1, first["page_count"]
+    while page <= page_count:
+        data = client.get(f"/api/search?query=learning&per_page=10&page={page}").get_json()
+        assert data["results"], f"page {page} of {data['page_count']} is empty"
+        page_count = data["page_count"]
+        page += 1
+    assert page_count == 30
+    assert not data["total_approximate"]
+
+
+def test_deep_search_page_is_not_empty(budgeted_index, monkeypatch):
+    monkeypatch.setattr(mindwork, "SEARCH_INDEX", budgeted_index)
+    html = mindwork.app.test_client().get("/search?query=learning&per_page=10&page=3&stream=0").get_data(as_text=True)
+    assert "No results found" not in html
+    assert "At least 40 results in total" in html
+
+
+def test_filtered_pages_are_full(budgeted_index, monkeypatch):
+    """Only 12 documents are from 2024; the first 20 postings hold hardly any of them."""
+    monkeypatch.setattr(mindwork, "SEARCH_INDEX", budgeted_index)
+    client = mindwork.app.test_client()
+
+    first = client.get("/api/search?query=learning&year_from=2024&per_page=10").get_json()
+    assert len(first["results"]) == 10
+    assert all(result["year"] == 2024 for result in first["results"])
+    second = client.get("/api/search?query=learning&year_from=2024&per_page=10&page=2").get_json()
+    assert len(second["results"]) == 2
+    assert second["total"] == 12
+    assert not second["total_approximate"]
+
+
+def test_filtered_top_matches_ranking_every_scored_document(budgeted_index):
+    allowed = budgeted_index.facets.filter(filter_predicates({"year": (2020, None)}))
+    scores, exact, matched = budgeted_index.score("learning", 30, allowed)
+    assert matched == sum(1 << doc for doc in scores)
+
+    in_2020s = {doc: score for doc, score in scores.items() if budgeted_index.document(doc)["year"] >= 2020}
+    assert budgeted_index.count(matched, allowed) == len(in_2020s) >= 30
+    top = budgeted_index.top(scores, 10, allowed & matched)
+    assert [score for score, _doc in top] == sorted(in_2020s.values(), reverse=True)[:10]
+    assert all(in_2020s[doc] == score for score, doc in top)
@@ -0,0 +1,53 @@
+from suggest import SearchLog, SuggestionTrie
+
+
+def test_queries_are_suggested_only_after_min_count_searches():
+    trie = SuggestionTrie(min_count=3)
+    trie.add("my home address 12 elm street")
+    trie.add("machine learning")
+    trie.add("machine learning")
+    assert trie.complete("m") == []
+    trie.add("Machine  Learning")
+    assert trie.complete("m") == ["machine learning"]
+
+
+def test_tracked_queries_are_capped_keeping_the_most_searched():
+    trie = SuggestionTrie(min_count=2, max_queries=10)
+    trie.add("popular query", 50)
+    for number in range(100):
+        trie.add(f"one-off query {number}")
+    assert len(trie) <= 20
+    assert trie.counts["popular query"] == 50
+    assert trie.complete("p") == ["popular query"]
+
+
+def test_compacted_log_restores_counts_on_cold_start(tmp_path):
+    path = str(tmp_path / "searches.log")
+    writer = SearchLog(path, SuggestionTrie(min_count=2), refresh_seconds=0, max_bytes=200)
+    for _ in range(30):
+        writer.record("deep learning")
+    writer.record("rare query")
+    writer.refresh()
+    assert (tmp_path / "searches.log.snapshot").exists()
+    assert not (tmp_path / "searches.log").exists()
+
+    writer.record("deep learning")
+    restarted = SearchLog(path, SuggestionTrie(min_count=2), refresh_seconds=0, max_bytes=200)
+    restarted.refresh(force=True)
+    assert restarted.trie.counts == {"deep learning": 31, "rare query": 1}
+    assert restarted.trie.complete("d") == ["deep learning"]
+
+
+def test_other_workers_follow_the_log_across_a_compaction(tmp_path):
+    path = str(tmp_path / "searches.log")
+    compacting = SearchLog(path, SuggestionTrie(), refresh_seconds=0, max_bytes=100)
+    following = SearchLog(path, SuggestionTrie(), refresh_seconds=0)
+    for _ in range(10):
+        compacting.record("neural networks")
+    following.refresh()
+    compacting.refresh()
+    for _ in range(3):
+        compacting.record("neural networks")
+    following.refresh()
+    compacting.refresh()
+    assert following.trie.counts == compacting.trie.counts == {"neural networks": 13}